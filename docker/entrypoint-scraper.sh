@@ -1,7 +1,22 @@
 #!/bin/sh
+if [ "${HESTIA_DAEMON:-0}" = "1" ]; then
+    # Resident mode: one process schedules every target itself, no cron and no cold starts
+    echo "[$(date -u '+%Y-%m-%d %H:%M:%S UTC')] agency=${HESTIA_TARGET:-all} mode=daemon"
+    exec /usr/local/bin/python3 /scraper/hestia/scraper.py --daemon
+fi
+if [ "${HESTIA_DISPATCHER:-0}" = "1" ]; then
+    # Notification dispatcher: drains hestia.notification_outbox, several can run side by side
+    echo "[$(date -u '+%Y-%m-%d %H:%M:%S UTC')] mode=dispatcher"
+    exec /usr/local/bin/python3 /scraper/hestia/scraper.py --dispatch
+fi
+if [ -z "${HESTIA_TARGET}" ]; then
+    # Maintenance: a resident loop, the daily and weekly jobs are claimed in the database
+    echo "[$(date -u '+%Y-%m-%d %H:%M:%S UTC')] mode=maintenance"
+    exec /usr/local/bin/python3 /scraper/hestia/scraper.py --maintenance
+fi
 DELAY=$(shuf -i 0-300 -n 1)
 SCHEDULE="${HESTIA_CRON_SCHEDULE:-*/5 * * * *}"
-echo "[$(date -u '+%Y-%m-%d %H:%M:%S UTC')] agency=${HESTIA_TARGET:-maintenance} delay=${DELAY}s schedule='${SCHEDULE}'"
+echo "[$(date -u '+%Y-%m-%d %H:%M:%S UTC')] agency=${HESTIA_TARGET} delay=${DELAY}s schedule='${SCHEDULE}'"
 printenv | sed 's/=\(.*\)/="\1"/' > /etc/environment
 # Overwrite a dedicated cron.d file (not >> /etc/crontab) so restarts, which re-run
 # this entrypoint on the same writable layer, can't stack duplicate scrape entries.
@@ -1,12 +1,12 @@
 import re
 import logging
 import telegram
-from time import sleep
-from telegram.error import Forbidden
 from telegram.ext import filters, MessageHandler, ApplicationBuilder, CommandHandler, CallbackQueryHandler, ContextTypes
 
 import hestia_utils.db as db
+import hestia_utils.delivery as delivery
 import hestia_utils.meta as meta
+import hestia_utils.migrations as migrations
 import hestia_utils.secrets as secrets
 import hestia_utils.strings as strings
 
@@ -14,6 +14,9 @@ import hestia_utils.strings as strings
 def initialize():
     logging.warning("Initializing application...")
 
+    # Schema changes ship with the code, set HESTIA_MIGRATE_ON_STARTUP=0 to apply them by hand
+    migrations.apply_on_startup()
+
     if db.get_scraper_halted():
         logging.warning("Scraper is halted")
         
@@ -49,6 +52,17 @@ def parse_argument(text: str, key: str) -> dict:
     return {"text": stripped_text, "key": key, "value": value}
 
 
+def agency_keyboard(enabled_agencies) -> telegram.InlineKeyboardMarkup:
+    """Inline keyboard toggling each enabled target's agency in the agency filter."""
+    reply_keyboard = []
+    for row in db.get_filter_agencies():
+        if row["agency"] in enabled_agencies:
+            reply_keyboard.append([telegram.InlineKeyboardButton(meta.CHECK_EMOJI + " " + row["user_info"]["agency"], callback_data=f"hfa.d.{row['agency']}")])
+        else:
+            reply_keyboard.append([telegram.InlineKeyboardButton(meta.CROSS_EMOJI + " " + row["user_info"]["agency"], callback_data=f"hfa.e.{row['agency']}")])
+    return telegram.InlineKeyboardMarkup(reply_keyboard)
+
+
 async def get_sub_name(update: telegram.Update, context: ContextTypes.DEFAULT_TYPE) -> str:
     if not update.effective_chat: return ""
     if update.effective_chat.username: return update.effective_chat.username
@@ -134,20 +148,18 @@ async def announce(update: telegram.Update, context: ContextTypes.DEFAULT_TYPE)
     else:
         disablepreview['value'] = False
 
-    for sub in subs:
-        sleep(1/29)  # avoid rate limit (broadcasting to max 30 users per second)
-        try:
-            if markdown['value']:
-                await context.bot.send_message(sub["telegram_id"], msg, parse_mode="MarkdownV2", disable_web_page_preview=bool(disablepreview['value']))
-            else:
-                await context.bot.send_message(sub["telegram_id"], msg, disable_web_page_preview=bool(disablepreview['value']))
-        except Forbidden as e:
+    send_kwargs = {"disable_web_page_preview": bool(disablepreview['value'])}
+    if markdown['value']:
+        send_kwargs["parse_mode"] = "MarkdownV2"
+    messages = [delivery.OutgoingMessage(sub["telegram_id"], msg, send_kwargs) for sub in subs]
+
+    for result in await delivery.get_engine(context.bot).send_many(messages):
+        if result.forbidden:
             # This means the user deleted their account or blocked the bot, so disable them
-            db.disable_user(sub["telegram_id"])
-            logging.warning(f"Removed subscriber with Telegram id {str(sub['telegram_id'])} due to announce failure: {repr(e)}")
-        except BaseException as e:
-            logging.warning(f"Exception while broadcasting announcement to {sub['telegram_id']}: {repr(e)}")
-            continue
+            db.disable_user(result.message.chat_id)
+            logging.warning(f"Removed subscriber with Telegram id {str(result.message.chat_id)} due to announce failure: {result.error}")
+        elif not result.ok:
+            logging.warning(f"Exception while broadcasting announcement to {result.message.chat_id}: {result.error}")
 
 
 async def websites(update: telegram.Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -239,6 +251,12 @@ async def status(update: telegram.Update, context: ContextTypes.DEFAULT_TYPE) ->
         count = db.fetch_one("SELECT COUNT(*) FROM hestia.homes WHERE agency = %s AND date_added > now() - '1 week'::interval", [agency])
         message += f"{agency} ({target_id}): {count['count']} listings\n"
 
+    pool = db.get_pool_stats()
+    if pool:
+        message += "\n"
+        message += f"DB pool: {pool['in_use']} in use, {pool['idle']} idle, max {pool['max_size']}\n"
+        message += f"DB pool checkouts: {pool['checkouts']}, waits: {pool['waits']} (avg {pool['avg_wait_ms']} ms, max {round(pool['wait_seconds_max'] * 1000)} ms)\n"
+
     await context.bot.send_message(update.effective_chat.id, message, disable_web_page_preview=True)
 
 
@@ -309,8 +327,7 @@ async def filter(update: telegram.Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     # View city possibilities
     elif len(cmd) == 2 and cmd[1] == "city":
-        all_filter_cities = [c["city"] for c in db.fetch_all("SELECT DISTINCT city FROM hestia.homes")]
-        all_filter_cities.sort()
+        all_filter_cities = db.get_filter_cities()
         
         message = strings.get("filter_city_header", update.effective_chat.id)
         for city in all_filter_cities:
@@ -323,17 +340,8 @@ async def filter(update: telegram.Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     # Modify agency filter
     elif len(cmd) == 2 and cmd[1] in ["agency", "agencies", "website", "websites"]:
-        included, reply_keyboard = [], []
         enabled_agencies = db.fetch_one("SELECT filter_agencies FROM hestia.subscribers WHERE telegram_id = %s", [str(update.effective_chat.id)])["filter_agencies"]
-        for row in db.fetch_all("SELECT agency, user_info FROM hestia.targets WHERE enabled = true"):
-            if row["agency"] not in included:
-                included.append(row["agency"])
-                if row["agency"] in enabled_agencies:
-                    reply_keyboard.append([telegram.InlineKeyboardButton(meta.CHECK_EMOJI + " " + row["user_info"]["agency"], callback_data=f"hfa.d.{row['agency']}")])
-                else:
-                    reply_keyboard.append([telegram.InlineKeyboardButton(meta.CROSS_EMOJI + " " + row["user_info"]["agency"], callback_data=f"hfa.e.{row['agency']}")])
-
-        await update.message.reply_text(strings.get("filter_agency", update.effective_chat.id), reply_markup=telegram.InlineKeyboardMarkup(reply_keyboard))
+        await update.message.reply_text(strings.get("filter_agency", update.effective_chat.id), reply_markup=agency_keyboard(enabled_agencies))
         return
             
     # Modify city filter
@@ -349,8 +357,7 @@ async def filter(update: telegram.Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         if cmd[2] == "add":
             # Get possible cities from database
-            all_filter_cities = [c["city"] for c in db.fetch_all("SELECT DISTINCT city FROM hestia.homes")]
-            all_filter_cities.sort()
+            all_filter_cities = db.get_filter_cities()
             
             # Check if the city is valid
             if city not in [c.lower() for c in all_filter_cities]:
@@ -463,8 +470,6 @@ async def callback_query_handler(update: telegram.Update, _) -> None:
 
     # Agency filter callback
     if cbid == "hfa":
-        included, reply_keyboard = [], []
-
         # Update list of enabled agencies for the user
         enabled_agencies: set[str] = set(db.fetch_one("SELECT filter_agencies FROM hestia.subscribers WHERE telegram_id = %s", [str(query.message.chat.id)])["filter_agencies"])
         if action == "d":
@@ -476,16 +481,8 @@ async def callback_query_handler(update: telegram.Update, _) -> None:
             enabled_agencies.add(agency)
         db.set_filter_agencies(query.message.chat, enabled_agencies)
 
-        # Build inline keyboard
-        for row in db.fetch_all("SELECT agency, user_info FROM hestia.targets WHERE enabled = true"):
-            if row["agency"] not in included:
-                included.append(row["agency"])
-                if row["agency"] in enabled_agencies:
-                    reply_keyboard.append([telegram.InlineKeyboardButton(meta.CHECK_EMOJI + " " + row["user_info"]["agency"], callback_data=f"hfa.d.{row['agency']}")])
-                else:
-                    reply_keyboard.append([telegram.InlineKeyboardButton(meta.CROSS_EMOJI + " " + row["user_info"]["agency"], callback_data=f"hfa.e.{row['agency']}")])
         await query.answer()
-        await query.edit_message_reply_markup(telegram.InlineKeyboardMarkup(reply_keyboard))
+        await query.edit_message_reply_markup(agency_keyboard(enabled_agencies))
 
 
 async def link(update: telegram.Update, context: ContextTypes.DEFAULT_TYPE, code: str = "") -> None:
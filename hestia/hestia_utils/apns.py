@@ -1,4 +1,6 @@
+import os
 import json
+import asyncio
 import logging
 import re
 import time
@@ -19,6 +21,10 @@ import hestia_utils.secrets as secrets
 
 logger = logging.getLogger(__name__)
 
+# APNs multiplexes many streams over one HTTP/2 connection; cap how many are in flight
+MAX_CONCURRENT_STREAMS = int(os.environ.get("HESTIA_APNS_MAX_STREAMS", "100"))
+REQUEST_TIMEOUT_SECONDS = 10
+
 _TRANSIENT_HTTP_STATUSES = {429, 500, 502, 503, 504}
 _PERMANENT_REASONS = {
     "BadDeviceToken",
@@ -47,11 +53,22 @@ def _is_configured() -> bool:
 
 
 class APNsClient:
-    """Minimal APNs HTTP/2 client using token-based auth."""
+    """Minimal async APNs HTTP/2 client using token-based auth.
+
+    One long-lived connection is reused for every push, concurrent sends are
+    multiplexed as HTTP/2 streams over it. The connection and the stream semaphore are
+    created in the event loop that sends, and again when a later loop does.
+    """
 
-    def __init__(self):
+    def __init__(self, max_concurrent_streams: int = MAX_CONCURRENT_STREAMS,
+                 transport: httpx.AsyncBaseTransport | None = None):
         self._bearer_token = ""
         self._bearer_expiry_epoch = 0
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._max_concurrent_streams = max_concurrent_streams
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._streams: asyncio.Semaphore | None = None
 
     @property
     def enabled(self) -> bool:
@@ -88,7 +105,24 @@ class APNsClient:
     def _base_url(self) -> str:
         return "https://api.sandbox.push.apple.com" if secrets.APNS["use_sandbox"] else "https://api.push.apple.com"
 
-    def send(self, apns_token: str, payload: dict) -> APNsSendResult:
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._client = None
+            self._streams = asyncio.Semaphore(self._max_concurrent_streams)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(http2=True, timeout=REQUEST_TIMEOUT_SECONDS, transport=self._transport)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+            self._client = None
+
+    async def send(self, apns_token: str, payload: dict | bytes) -> APNsSendResult:
         if not self.enabled:
             return APNsSendResult(ok=False, reason="APNS disabled")
 
@@ -99,9 +133,11 @@ class APNsClient:
             "content-type": "application/json",
         }
         url = f"{self._base_url()}/3/device/{apns_token}"
+        content = payload if isinstance(payload, bytes) else json.dumps(payload)
+        self._bind_loop()
         try:
-            with httpx.Client(http2=True, timeout=10) as client:
-                r = client.post(url, headers=headers, content=json.dumps(payload))
+            async with self._streams:
+                r = await self._get_client().post(url, headers=headers, content=content)
         except httpx.RequestError as e:
             logger.warning("APNs request failed: %r", e)
             return APNsSendResult(ok=False, should_retry=True, reason=repr(e))
@@ -126,6 +162,31 @@ class APNsClient:
             status_code=r.status_code,
         )
 
+    async def send_with_retries(self, apns_token: str, payload: dict | bytes, max_retries: int = 3,
+                                retry_base_seconds: float = 0.5) -> APNsSendResult:
+        result = None
+        for attempt in range(1, max_retries + 1):
+            result = await self.send(apns_token, payload)
+            if result.ok or not result.should_retry or attempt == max_retries:
+                break
+            await asyncio.sleep(retry_base_seconds * (2 ** (attempt - 1)))
+        return result
+
+    async def send_batch(self, notifications: list[tuple[str, dict | bytes]], max_retries: int = 3,
+                         retry_base_seconds: float = 0.5) -> list[APNsSendResult]:
+        """Send (apns_token, payload) pairs concurrently, results are in the same order.
+
+        Payloads may be passed pre-serialized, so a payload shared by many tokens is only
+        encoded once.
+        """
+        return list(await asyncio.gather(*(
+            self.send_with_retries(apns_token, payload, max_retries, retry_base_seconds)
+            for apns_token, payload in notifications
+        )))
+
+
+CLIENT = APNsClient()
+
 
 def build_home_notification_payload(home, agency_name: str) -> dict:
     if home.sqm > 0:
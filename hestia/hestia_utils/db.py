@@ -1,11 +1,23 @@
 import os
+import re
+import gzip
+import time
+import threading
 import psycopg2
 import logging
 import json
+from collections import deque
+from contextlib import contextmanager
 from telegram import Chat
-from typing import Literal
-from datetime import datetime
-from psycopg2.extras import RealDictCursor, RealDictRow
+from typing import Literal, TYPE_CHECKING
+from datetime import date, datetime
+from psycopg2.extras import RealDictCursor, RealDictRow, execute_values
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+
+if TYPE_CHECKING:
+    from hestia_utils.parser import Home
+    from hestia_utils.delivery import Notification
 
 from hestia_utils.secrets import DB
 
@@ -24,8 +36,15 @@ logging.basicConfig(
 
 LANG_CACHE = {}
 
+# Process-wide connection pool, shared by everything in the scraper or bot process
+POOL_MIN_SIZE = int(os.environ.get("HESTIA_DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.environ.get("HESTIA_DB_POOL_MAX", "8"))
+POOL_WAIT_TIMEOUT = float(os.environ.get("HESTIA_DB_POOL_TIMEOUT", "30"))
+# Idle connections are pinged before reuse, the server or a NAT may have dropped them
+POOL_HEALTHCHECK_IDLE_SECONDS = float(os.environ.get("HESTIA_DB_POOL_HEALTHCHECK_IDLE", "30"))
 
-def get_connection():
+
+def _connect():
     return psycopg2.connect(database=DB["database"],
                             host=DB["host"],
                             user=DB["user"],
@@ -33,6 +52,195 @@ def get_connection():
                             port=DB["port"])
 
 
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Unlike psycopg2's ThreadedConnectionPool, a checkout blocks until a connection is
+    free instead of raising, idle connections are health checked before reuse and
+    broken ones are replaced. Checkout and wait statistics are kept for sizing.
+    """
+
+    def __init__(self, min_size: int = POOL_MIN_SIZE, max_size: int = POOL_MAX_SIZE,
+                 wait_timeout: float = POOL_WAIT_TIMEOUT, connect=_connect):
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle: deque[tuple[object, float]] = deque()
+        self._in_use: set[int] = set()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "timeouts": 0,
+            "connects": 0,
+            "reconnects": 0,
+        }
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._lock:
+            self._stats["connects"] += 1
+        return conn
+
+    def _is_healthy(self, conn, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < POOL_HEALTHCHECK_IDLE_SECONDS:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.wait_timeout):
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise PoolError(f"No database connection available after {self.wait_timeout}s")
+            waited = time.monotonic() - started
+            with self._lock:
+                self._stats["waits"] += 1
+                self._stats["wait_seconds_total"] += waited
+                self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+        try:
+            conn = None
+            while conn is None:
+                with self._lock:
+                    idle = self._idle.popleft() if self._idle else None
+                if idle is None:
+                    conn = self._new_connection()
+                elif self._is_healthy(*idle):
+                    conn = idle[0]
+                else:
+                    self._close(idle[0])
+                    with self._lock:
+                        self._stats["reconnects"] += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use.add(id(conn))
+            self._stats["checkouts"] += 1
+        return conn
+
+    def owns(self, conn) -> bool:
+        with self._lock:
+            return id(conn) in self._in_use
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        with self._lock:
+            if id(conn) not in self._in_use:
+                return
+            self._in_use.discard(id(conn))
+        try:
+            if not discard and not conn.closed:
+                # Never hand out a connection that is still inside a transaction
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+                return
+            self._close(conn)
+        except psycopg2.Error:
+            self._close(conn)
+        finally:
+            self._slots.release()
+
+    def prefill(self) -> None:
+        while True:
+            with self._lock:
+                if len(self._idle) + len(self._in_use) >= self.min_size:
+                    return
+            conn = self._new_connection()
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+
+    @staticmethod
+    def _close(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def closeall(self) -> None:
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = len(self._in_use)
+        stats["max_size"] = self.max_size
+        stats["avg_wait_ms"] = round(1000 * stats["wait_seconds_total"] / stats["checkouts"], 2) if stats["checkouts"] else 0.0
+        return stats
+
+
+_POOL: ConnectionPool | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                pool = ConnectionPool()
+                try:
+                    pool.prefill()
+                except psycopg2.Error as e:
+                    logging.warning(f"Could not prefill database pool: {repr(e)}")
+                _POOL = pool
+    return _POOL
+
+
+def get_pool_stats() -> dict:
+    """Checkout and wait statistics of the connection pool, for sizing HESTIA_DB_POOL_MAX."""
+    return get_pool().stats() if _POOL is not None else {}
+
+
+def get_connection():
+    """Check out a connection from the process-wide pool, hand it back with release_connection()."""
+    return get_pool().getconn()
+
+
+def release_connection(conn) -> None:
+    """Return a connection to the pool. Connections psycopg2 marked as closed after a
+    failure are dropped, the next checkout opens a fresh one."""
+    if _POOL is not None and _POOL.owns(conn):
+        _POOL.putconn(conn)
+    else:
+        conn.close()
+
+
+@contextmanager
+def transaction():
+    """A pooled connection whose writes commit together when the block exits, and roll back
+    together when it raises."""
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+
 ### Read actions
 
 def fetch_one(query: str, params: list[str] = []) -> dict:
@@ -45,7 +253,7 @@ def fetch_one(query: str, params: list[str] = []) -> dict:
         logging.error(f"Database read error: {repr(e)}\nQuery: {query}\nParams: {params}")
         result = {}
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
     if not result:
         return {}
     return result
@@ -60,9 +268,16 @@ def fetch_all(query: str, params: list[str] = []) -> list[RealDictRow]:
         logging.error(f"Database read error: {repr(e)}\nQuery: {query}\nParams: {params}")
         result = []
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
     return result
 
+def fetch_all_or_raise(query: str, params: list = []) -> list[RealDictRow]:
+    """fetch_all for callers that must tell a failed read from no rows: errors are raised."""
+    with transaction() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
 def get_dev_mode() -> bool:
     result = fetch_one("SELECT devmode_enabled FROM hestia.meta WHERE id = 'default'")
     if result and "devmode_enabled" in result:
@@ -133,6 +348,34 @@ def get_user_lang(telegram_id: int) -> Literal["en", "nl"]:
         return result["lang"]
     return "en"
 
+# Cities and agencies for the filter commands, reloaded when meta.version changes. Triggers
+# bump it when a city appears or disappears and on every change to hestia.targets.
+FILTER_CATALOG = {}
+
+def _get_filter_catalog() -> dict:
+    global FILTER_CATALOG
+    version = fetch_one("SELECT version FROM hestia.meta WHERE id = 'default'").get("version")
+    if version is not None and FILTER_CATALOG.get("version") == version:
+        return FILTER_CATALOG
+
+    catalog = {
+        "version": version,
+        "cities": sorted(row["city"] for row in fetch_all("SELECT city FROM hestia.cities")),
+        "agencies": fetch_all("SELECT DISTINCT ON (agency) agency, user_info FROM hestia.targets WHERE enabled = true ORDER BY agency"),
+    }
+    # A failed read returns nothing, don't keep that until the next version bump
+    if catalog["cities"] and catalog["agencies"]:
+        FILTER_CATALOG = catalog
+    return catalog
+
+def get_filter_cities() -> list[str]:
+    """Every city that has homes, sorted."""
+    return _get_filter_catalog()["cities"]
+
+def get_filter_agencies() -> list[RealDictRow]:
+    """One enabled target (agency, user_info) per agency, sorted by agency."""
+    return _get_filter_catalog()["agencies"]
+
 
 ### Write actions
 
@@ -145,10 +388,273 @@ def _write(query: str, params: list[str] = []) -> None:
     except Exception as e:
         logging.error(f"Database write error: {repr(e)}\nQuery: {query}\nParams: {params}")
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
+
+def _write_returning(query: str, params: list = []) -> list[RealDictRow]:
+    conn = get_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            result = cur.fetchall()
+            conn.commit()
+    except Exception as e:
+        logging.error(f"Database write error: {repr(e)}\nQuery: {query}\nParams: {params}")
+        result = []
+    finally:
+        if conn: release_connection(conn)
+    return result
+
+def _write_values(query: str, rows: list[tuple], template: str | None = None, fetch: bool = False) -> list[RealDictRow]:
+    """Run a VALUES %s query for a batch of rows in one round trip."""
+    if not rows:
+        return []
+    conn = get_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            result = execute_values(cur, query, rows, template=template, page_size=len(rows), fetch=fetch)
+            conn.commit()
+    except Exception as e:
+        logging.error(f"Database write error: {repr(e)}\nQuery: {query}\nRows: {len(rows)}")
+        result = []
+    finally:
+        if conn: release_connection(conn)
+    return result or []
+
+def _insert_values(conn, query: str, rows: list[tuple], template: str | None = None, fetch: bool = False) -> list[RealDictRow]:
+    """Run a VALUES %s query for a batch of rows in the caller's transaction. Errors are
+    raised, the caller decides what rolls back with them."""
+    if not rows:
+        return []
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        return execute_values(cur, query, rows, template=template, page_size=len(rows), fetch=fetch) or []
+
+# Must stay in sync with the backfill in migrations/0001_homes_dedup_key.sql
+HOME_DEDUP_KEY_SQL = "lower(address) || '|' || lower(city)"
+
+# hestia.homes is partitioned by month, so the unique dedup keys live in home_dedup_keys.
+# A home already seen within the past 180 days is skipped; a relisting after that window
+# takes over the key and gets a new row, so it is reported as new again.
+def _insert_homes_sql(values: str) -> str:
+    return f"""
+        WITH home AS (
+            SELECT DISTINCT ON (dedup_key) *
+            FROM (
+                SELECT batch.*, {HOME_DEDUP_KEY_SQL} AS dedup_key
+                FROM ({values}) AS batch(url, address, city, price, agency, date_added, sqm)
+            ) AS keyed
+        ), claimed AS (
+            INSERT INTO hestia.home_dedup_keys (dedup_key, date_added)
+            SELECT dedup_key, date_added FROM home
+            ON CONFLICT (dedup_key) DO UPDATE SET date_added = EXCLUDED.date_added
+            WHERE hestia.home_dedup_keys.date_added < now() - interval '180 day'
+            RETURNING dedup_key
+        )
+        INSERT INTO hestia.homes (url, address, city, price, agency, date_added, sqm, dedup_key)
+        SELECT home.url, home.address, home.city, home.price, home.agency, home.date_added, home.sqm, home.dedup_key
+        FROM home JOIN claimed USING (dedup_key)
+        RETURNING address, city
+    """
 
 def add_home(url: str, address: str, city: str, price: int, agency: str, date_added: str, sqm: int = -1) -> None:
-    _write("INSERT INTO hestia.homes (url, address, city, price, agency, date_added, sqm) VALUES (%s, %s, %s, %s, %s, %s, %s)", [url, address, city, str(price), agency, date_added, str(sqm)])
+    _write(
+        _insert_homes_sql("VALUES (%s, %s, %s, %s::int, %s, %s::timestamp, %s::int)"),
+        [url, address, city, str(price), agency, date_added, str(sqm)],
+    )
+
+def add_homes(homes: list["Home"], date_added: str, conn=None) -> list[RealDictRow]:
+    """Insert a batch of scraped homes in one round trip.
+
+    Returns the address and city of the rows that were really inserted (or relisted),
+    i.e. the homes that are new. A failed insert raises, rather than passing for a batch
+    without new homes. With conn the insert is part of the caller's transaction.
+    """
+    if not homes:
+        return []
+    if conn is None:
+        with transaction() as conn:
+            return add_homes(homes, date_added, conn)
+    return _insert_values(
+        conn,
+        _insert_homes_sql("VALUES %s"),
+        [(h.url, h.address, h.city, h.price, h.agency, date_added, h.sqm) for h in homes],
+        template="(%s, %s, %s, %s::int, %s, %s::timestamp, %s::int)",
+        fetch=True,
+    )
+
+def prune_home_dedup_keys() -> None:
+    """Drop keys past the 180 day window, a relisting would take them over anyway."""
+    _write("DELETE FROM hestia.home_dedup_keys WHERE date_added < now() - interval '180 day'")
+
+### Homes partitions
+
+HOMES_PARTITION_RE = re.compile(r"^homes_y(\d{4})m(\d{2})$")
+
+def get_homes_partitions() -> list[tuple[str, date]]:
+    """(name, first day of month) of the monthly partitions attached to hestia.homes, oldest first."""
+    rows = fetch_all(
+        """
+        SELECT c.relname AS name
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'hestia.homes'::regclass
+        """
+    )
+    partitions = []
+    for row in rows:
+        match = HOMES_PARTITION_RE.match(row["name"])
+        if match:
+            partitions.append((row["name"], date(int(match.group(1)), int(match.group(2)), 1)))
+    partitions.sort(key=lambda p: p[1])
+    return partitions
+
+def ensure_homes_partitions(months_ahead: int = 3) -> list[str]:
+    """Create the partitions for this month and the next months_ahead months. Returns the
+    months (YYYY-MM) that were created. Errors are raised, a failed create must not look
+    like there was nothing to create."""
+    with transaction() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT to_char(month, 'YYYY-MM') AS month
+                FROM generate_series(date_trunc('month', now()), date_trunc('month', now()) + %s * interval '1 month', interval '1 month') AS month
+                WHERE hestia.create_homes_partition(month::date)
+                """,
+                [months_ahead],
+            )
+            rows = cur.fetchall()
+    return [row["month"] for row in rows]
+
+def archive_homes_partition(name: str, archive_dir: str | None) -> str | None:
+    """Detach a monthly partition from hestia.homes.
+
+    With an archive_dir its rows are written to <archive_dir>/<name>.csv.gz first and the
+    table is dropped, all in one transaction: if writing the archive fails the partition
+    stays attached. Without one the detached table is kept. Returns the archive path.
+    """
+    if not HOMES_PARTITION_RE.match(name):
+        raise ValueError(f"Not a monthly homes partition: {name}")
+
+    path = None
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            if archive_dir:
+                os.makedirs(archive_dir, exist_ok=True)
+                path = os.path.join(archive_dir, f"{name}.csv.gz")
+                with gzip.open(f"{path}.tmp", "wt", encoding="utf-8") as f:
+                    cur.copy_expert(f"COPY hestia.{name} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+                os.replace(f"{path}.tmp", path)
+            # Detaching locks hestia.homes until commit, so it comes after the slow part
+            cur.execute(f"ALTER TABLE hestia.homes DETACH PARTITION hestia.{name}")
+            if archive_dir:
+                cur.execute(f"DROP TABLE hestia.{name}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+    return path
+
+### Notification outbox
+
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETRY_BASE_SECONDS = 30
+
+def enqueue_notifications(notifications: list["Notification"], conn=None) -> int:
+    """Queue notifications for the dispatcher, skipping ones whose idempotency key is already queued.
+
+    A failed insert raises. With conn the notifications commit together with the caller's
+    other writes, i.e. the homes they are about.
+    """
+    if not notifications:
+        return 0
+    if conn is None:
+        with transaction() as conn:
+            return enqueue_notifications(notifications, conn)
+    # Notifications for the same home share one payload, serialize each only once
+    encoded: dict[int, str] = {}
+    for n in notifications:
+        if id(n.payload) not in encoded:
+            encoded[id(n.payload)] = json.dumps(n.payload)
+    rows = _insert_values(
+        conn,
+        """
+        INSERT INTO hestia.notification_outbox (idempotency_key, channel, target, subscriber_id, device_id, payload)
+        VALUES %s
+        ON CONFLICT (idempotency_key) DO NOTHING
+        RETURNING id
+        """,
+        [(n.idempotency_key, n.channel, str(n.target), n.subscriber_id, n.device_id, encoded[id(n.payload)]) for n in notifications],
+        template="(%s, %s, %s, %s, %s, %s::jsonb)",
+        fetch=True,
+    )
+    return len(rows)
+
+def claim_notifications(limit: int, lease_seconds: int) -> list[RealDictRow]:
+    """Lease a batch of due notifications to this dispatcher.
+
+    SKIP LOCKED lets several dispatchers claim disjoint batches. A claimed row is leased
+    rather than locked for the whole delivery, so it becomes due again if the dispatcher
+    dies before reporting back. A row whose lease ran out NOTIFICATION_MAX_ATTEMPTS times
+    never got that far, it is marked failed rather than leased again.
+    """
+    return _write_returning(
+        f"""
+        WITH exhausted AS (
+            UPDATE hestia.notification_outbox
+            SET status = 'failed', last_error = 'Lease expired {NOTIFICATION_MAX_ATTEMPTS} times', locked_until = NULL
+            WHERE status = 'sending' AND locked_until < now() AND attempts >= {NOTIFICATION_MAX_ATTEMPTS}
+        ), due AS (
+            SELECT id FROM hestia.notification_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= now())
+               OR (status = 'sending' AND locked_until < now() AND attempts < {NOTIFICATION_MAX_ATTEMPTS})
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE hestia.notification_outbox o
+        SET status = 'sending', attempts = o.attempts + 1, locked_until = now() + %s * interval '1 second'
+        FROM due
+        WHERE o.id = due.id
+        RETURNING o.id, o.idempotency_key, o.channel, o.target, o.subscriber_id, o.device_id, o.payload, o.attempts
+        """,
+        [limit, lease_seconds],
+    )
+
+def finish_notifications(results: list[tuple[int, str, str]]) -> None:
+    """Record (id, outcome, error) per claimed notification; outcome is sent, retry or failed.
+
+    Errors are raised: rows left in 'sending' are claimed and delivered again once their
+    lease runs out, so the caller has to know the outcomes were not recorded.
+    """
+    with transaction() as conn:
+        _insert_values(
+            conn,
+            f"""
+            UPDATE hestia.notification_outbox o
+            SET status = CASE
+                    WHEN r.outcome = 'retry' AND o.attempts < {NOTIFICATION_MAX_ATTEMPTS} THEN 'pending'
+                    WHEN r.outcome = 'retry' THEN 'failed'
+                    ELSE r.outcome
+                END,
+                next_attempt_at = now() + {NOTIFICATION_RETRY_BASE_SECONDS} * power(2, o.attempts - 1) * interval '1 second',
+                sent_at = CASE WHEN r.outcome = 'sent' THEN now() ELSE NULL END,
+                last_error = NULLIF(r.error, ''),
+                locked_until = NULL
+            FROM (VALUES %s) AS r(id, outcome, error)
+            WHERE o.id = r.id
+            """,
+            results,
+            template="(%s::bigint, %s, %s)",
+        )
+
+def prune_notifications(retention_days: int = 7) -> None:
+    _write(
+        "DELETE FROM hestia.notification_outbox WHERE status IN ('sent', 'failed') AND created_at < now() - %s * interval '1 day'",
+        [retention_days],
+    )
+
 def add_user(telegram_id: int) -> None:
     # Use an explicit column list so this stays valid when new columns are added to hestia.subscribers.
     _write("INSERT INTO hestia.subscribers (telegram_enabled, telegram_id) VALUES (true, %s)", [str(telegram_id)])
@@ -238,24 +744,54 @@ def cleanup_error_rollups(retention_days: int = 30) -> None:
     )
 
 
+def claim_maintenance_slot(task: str, slot: str) -> bool:
+    """Whether this process runs task for slot (e.g. a date). Exactly one caller gets True,
+    however many processes run maintenance. Errors are raised, so nobody runs it then."""
+    with transaction() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO hestia.maintenance_runs (task, slot) VALUES (%s, %s) ON CONFLICT DO NOTHING RETURNING task",
+                [task, slot],
+            )
+            return cur.fetchone() is not None
+
+
+def prune_maintenance_runs(retention_days: int = 30) -> None:
+    _write(
+        "DELETE FROM hestia.maintenance_runs WHERE claimed_at < now() - %s * interval '1 day'",
+        [retention_days],
+    )
+
+
+def prune_cities() -> None:
+    """Drop cities whose homes were all archived, hestia.cities only grows on insert."""
+    _write("DELETE FROM hestia.cities c WHERE NOT EXISTS (SELECT 1 FROM hestia.homes h WHERE h.city = c.city)")
+
+
+def refresh_stats() -> None:
+    """Recompute hestia.stats, which triggers keep current in between except for dropped partitions."""
+    _write("SELECT hestia.refresh_stats()")
+
+
 def get_enabled_targets_without_recent_homes(default_days: int = 7) -> list[RealDictRow]:
     # Each target may override the alert window via alert_threshold_days;
     # NULL falls back to default_days. The interval references the per-row
     # value so every target is evaluated against its own threshold.
+    # NOT EXISTS stops at the first recent home in homes_agency_date_added_idx
+    # instead of joining every home of the agency.
     return fetch_all(
         """
         SELECT
             t.id,
             t.agency,
-            COALESCE(t.alert_threshold_days, %s)::int AS threshold_days,
-            COUNT(h.url) AS homes_count
+            COALESCE(t.alert_threshold_days, %s)::int AS threshold_days
         FROM hestia.targets t
-        LEFT JOIN hestia.homes h
-            ON h.agency = t.agency
-           AND h.date_added >= now() - (COALESCE(t.alert_threshold_days, %s)::int * interval '1 day')
         WHERE t.enabled = true
-        GROUP BY t.id, t.agency, threshold_days
-        HAVING COUNT(h.url) = 0
+          AND NOT EXISTS (
+            SELECT 1 FROM hestia.homes h
+            WHERE h.agency = t.agency
+              AND h.date_added >= now() - (COALESCE(t.alert_threshold_days, %s)::int * interval '1 day')
+          )
         ORDER BY t.id
         """,
         [default_days, default_days],
@@ -389,4 +925,4 @@ def link_account(telegram_id: int, code: str) -> Literal["success", "invalid_cod
         logging.error(f"Database error in link_account: {repr(e)}")
         return "invalid_code"
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
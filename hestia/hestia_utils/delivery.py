@@ -0,0 +1,184 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+
+from dataclasses import dataclass, field
+from typing import Literal
+from telegram.error import Forbidden, RetryAfter
+
+# Telegram allows about 30 messages per second to different chats and about one per
+# second to the same chat; stay just under both.
+GLOBAL_RATE = float(os.environ.get("HESTIA_TELEGRAM_RATE", "29"))
+PER_CHAT_INTERVAL_SECONDS = float(os.environ.get("HESTIA_TELEGRAM_PER_CHAT_INTERVAL", "1"))
+MAX_IN_FLIGHT = int(os.environ.get("HESTIA_TELEGRAM_MAX_IN_FLIGHT", "30"))
+# send_many works through a batch with this many coroutines, whatever its size. More than
+# MAX_IN_FLIGHT, so sends waiting on their chat's spacing don't starve the others.
+SEND_WORKERS = int(os.environ.get("HESTIA_TELEGRAM_SEND_WORKERS", "64"))
+MAX_RETRY_AFTER_ATTEMPTS = 3
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int | str
+    text: str
+    kwargs: dict = field(default_factory=dict)
+
+
+@dataclass
+class Notification:
+    """One message for one subscriber on one channel, delivered inline or through the outbox.
+
+    For Telegram the target is the chat id and the payload holds the text and send options,
+    for APNs the target is the device token and the payload is the APNs payload.
+    """
+    channel: Literal["telegram", "apns"]
+    target: int | str
+    payload: dict
+    idempotency_key: str
+    subscriber_id: int | None = None
+    device_id: str | None = None
+    outbox_id: int | None = None
+
+    @staticmethod
+    def make_idempotency_key(channel: str, target: int | str, home_key: str) -> str:
+        return hashlib.sha256(f"{channel}|{target}|{home_key}".encode()).hexdigest()
+
+
+@dataclass
+class DeliveryResult:
+    message: OutgoingMessage
+    ok: bool
+    forbidden: bool = False
+    error: str = ""
+
+
+class TokenBucket:
+    """Async token bucket; a RetryAfter from Telegram pauses it for every sender."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class TelegramDelivery:
+    """Sends Telegram messages concurrently within Telegram's rate limits.
+
+    All sends share one token bucket, messages to the same chat are sent in order and
+    spaced out, and a RetryAfter pauses every sender for the requested time before the
+    message is retried.
+    """
+
+    def __init__(self, bot, rate: float = GLOBAL_RATE, per_chat_interval: float = PER_CHAT_INTERVAL_SECONDS,
+                 max_in_flight: int = MAX_IN_FLIGHT, workers: int = SEND_WORKERS):
+        self.bot = bot
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self._bucket = TokenBucket(rate)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        # chat id -> [lock, number of queued sends]
+        self._chat_locks: dict[int | str, list] = {}
+        self._chat_next_send: dict[int | str, float] = {}
+
+    async def send(self, message: OutgoingMessage) -> DeliveryResult:
+        chat_id = message.chat_id
+        if chat_id not in self._chat_locks:
+            self._chat_locks[chat_id] = [asyncio.Lock(), 0]
+        chat = self._chat_locks[chat_id]
+        chat[1] += 1
+        try:
+            async with chat[0]:
+                wait = self._chat_next_send.get(chat_id, 0) - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    return await self._send(message)
+                finally:
+                    self._chat_next_send[chat_id] = time.monotonic() + self.per_chat_interval
+        finally:
+            # Drop the lock once nobody is queued for this chat anymore
+            chat[1] -= 1
+            if chat[1] == 0:
+                del self._chat_locks[chat_id]
+
+    async def _send(self, message: OutgoingMessage) -> DeliveryResult:
+        for attempt in range(1, MAX_RETRY_AFTER_ATTEMPTS + 1):
+            await self._bucket.acquire()
+            try:
+                async with self._in_flight:
+                    await self.bot.send_message(chat_id=message.chat_id, text=message.text, **message.kwargs)
+                return DeliveryResult(message, ok=True)
+            except RetryAfter as e:
+                # An int today, a timedelta once PTB_TIMEDELTA becomes the default
+                retry_after = e.retry_after
+                retry_after = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+                logger.warning(f"Telegram rate limit hit, pausing all sends for {retry_after}s (attempt {attempt})")
+                self._bucket.pause(retry_after)
+                error = repr(e)
+            except Forbidden as e:
+                return DeliveryResult(message, ok=False, forbidden=True, error=repr(e))
+            except Exception as e:
+                return DeliveryResult(message, ok=False, error=repr(e))
+        return DeliveryResult(message, ok=False, error=error)
+
+    async def send_many(self, messages: list[OutgoingMessage]) -> list[DeliveryResult]:
+        """Send all messages concurrently, results are in the same order as messages.
+
+        A fixed number of workers take the messages in turn, so a broadcast to every
+        subscriber doesn't create a coroutine per message up front.
+        """
+        if not messages:
+            return []
+        started = time.monotonic()
+        self._chat_next_send = {chat_id: t for chat_id, t in self._chat_next_send.items() if t > started}
+        results: list[DeliveryResult | None] = [None] * len(messages)
+        todo = iter(range(len(messages)))
+
+        async def worker() -> None:
+            for index in todo:
+                results[index] = await self.send(messages[index])
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(messages)))))
+        failed = sum(1 for result in results if not result.ok)
+        logger.info(f"Delivered {len(results) - failed}/{len(results)} Telegram messages in {time.monotonic() - started:.1f}s")
+        return list(results)
+
+
+_ENGINE: TelegramDelivery | None = None
+_ENGINE_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+def get_engine(bot) -> TelegramDelivery:
+    """Process-wide delivery engine for bot, so concurrent broadcasts share one rate budget."""
+    global _ENGINE, _ENGINE_LOOP
+    loop = asyncio.get_running_loop()
+    if _ENGINE is None or _ENGINE.bot is not bot or _ENGINE_LOOP is not loop:
+        _ENGINE = TelegramDelivery(bot)
+        _ENGINE_LOOP = loop
+    return _ENGINE
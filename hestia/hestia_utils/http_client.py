@@ -0,0 +1,82 @@
+import os
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+import httpx
+
+# Limits for the shared scrape client; the per-host cap keeps us polite towards
+# agencies that have several targets or share a backend (e.g. Hexia, Woningnet).
+MAX_CONCURRENCY = int(os.environ.get("HESTIA_HTTP_MAX_CONCURRENCY", "16"))
+MAX_PER_HOST = int(os.environ.get("HESTIA_HTTP_MAX_PER_HOST", "2"))
+TIMEOUT_SECONDS = float(os.environ.get("HESTIA_HTTP_TIMEOUT", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeClient:
+    """Shared async HTTP client with keep-alive, HTTP/2 and concurrency limits.
+
+    The semaphores and the connection pool belong to the event loop they are used on, so
+    they are created on first use in the running loop and again when a later loop (the
+    next asyncio.run) picks the client up.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, max_per_host: int = MAX_PER_HOST,
+                 timeout: float = TIMEOUT_SECONDS, transport: httpx.AsyncBaseTransport | None = None):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._global_limit: asyncio.Semaphore | None = None
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Whatever the previous loop left behind can't be used, or closed, from this one
+            self._loop = loop
+            self._client = None
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+            self._host_limits = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).hostname or ""
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        self._bind_loop()
+        async with self._global_limit, self._host_limit(url):
+            return await self._get_client().request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+            self._client = None
+
+
+CLIENT = ScrapeClient()
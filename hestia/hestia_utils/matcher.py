@@ -0,0 +1,48 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from hestia_utils.parser import Home
+
+
+class SubscriberMatcher:
+    """Inverted index over subscriber filters, built once per broadcast.
+
+    Subscribers are indexed by every city in their filters, and each city bucket is kept
+    sorted by minimum price. For a home a binary search cuts its city bucket down to the
+    subscribers that can afford it, and only those are checked against the maximum
+    price, sqm and agency filters. The filter semantics are the same as checking every
+    subscriber one by one.
+    """
+
+    def __init__(self, subs: list[dict]):
+        self.subs = list(subs)
+        min_prices = [sub["filter_min_price"] for sub in self.subs]
+
+        # Filling the buckets in order of minimum price keeps every bucket sorted
+        by_city: dict[str, list[int]] = defaultdict(list)
+        for index in sorted(range(len(self.subs)), key=min_prices.__getitem__):
+            # A city listed twice must not put the subscriber in its bucket twice
+            for city in set(self.subs[index]["filter_cities"] or []):
+                by_city[city].append(index)
+        self._by_city = {
+            city: (indices, [min_prices[index] for index in indices])
+            for city, indices in by_city.items()
+        }
+
+    def match(self, home: Home) -> list[dict]:
+        """Subscribers whose filters match home, in their original order."""
+        indices, min_prices = self._by_city.get(home.city.lower(), ([], []))
+
+        matched = []
+        for index in indices[:bisect_right(min_prices, home.price)]:
+            sub = self.subs[index]
+            if home.price > sub["filter_max_price"]:
+                continue
+            min_sqm = sub["filter_min_sqm"]
+            if min_sqm != 0 and home.sqm != -1 and home.sqm < min_sqm:
+                continue
+            if home.agency in (sub["filter_agencies"] or []):
+                matched.append(index)
+
+        matched.sort()
+        return [self.subs[index] for index in matched]
@@ -3,16 +3,10 @@ import telegram
 
 from hestia_utils.secrets import TOKEN
 
+_MARKDOWNV2_ESCAPES = str.maketrans({char: "\\" + char for char in ".!+-*|()"})
+
 def escape_markdownv2(text: str) -> str:
-    text = text.replace('.', r'\.')
-    text = text.replace('!', r'\!')
-    text = text.replace('+', r'\+')
-    text = text.replace('-', r'\-')
-    text = text.replace('*', r'\*')
-    text = text.replace('|', r'\|')
-    text = text.replace('(', r'\(')
-    text = text.replace(')', r'\)')
-    return text
+    return text.translate(_MARKDOWNV2_ESCAPES)
 
 logging.basicConfig(
     format="%(asctime)s [%(levelname)s] [%(name)s]: %(message)s",
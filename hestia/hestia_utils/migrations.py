@@ -0,0 +1,147 @@
+import os
+import re
+import sys
+import hashlib
+import logging
+
+from dataclasses import dataclass
+
+import hestia_utils.db as db
+
+# Numbered SQL files, applied in order: hestia/migrations/0004_homes_indexes.sql
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+MIGRATION_FILE_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# Serializes runners when the bot, scraper and a manual run start at the same time
+ADVISORY_LOCK_KEY = 0x68657374  # "hest"
+
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS hestia.schema_migrations (
+      version int4 NOT NULL,
+      name varchar NOT NULL,
+      checksum varchar(64) NOT NULL,
+      applied_at timestamptz DEFAULT CURRENT_TIMESTAMP NOT NULL,
+      CONSTRAINT schema_migrations_pkey PRIMARY KEY (version)
+    )
+"""
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> list[Migration]:
+    """All migration files in directory, ordered by version."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE_RE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            migrations.append(Migration(int(match.group(1)), match.group(2), f.read()))
+    migrations.sort(key=lambda m: m.version)
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def _applied(conn) -> dict[int, str]:
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_MIGRATIONS_DDL)
+        cur.execute("SELECT version, checksum FROM hestia.schema_migrations")
+        applied = {version: checksum for version, checksum in cur.fetchall()}
+    conn.commit()
+    return applied
+
+
+def pending(conn, migrations: list[Migration]) -> list[Migration]:
+    applied = _applied(conn)
+    for migration in migrations:
+        if migration.version in applied and applied[migration.version] != migration.checksum:
+            logger.warning(f"Migration {migration.version}_{migration.name} was changed after it was applied")
+    return [m for m in migrations if m.version not in applied]
+
+
+def apply_pending(directory: str = MIGRATIONS_DIR) -> list[Migration]:
+    """Apply every migration that is not recorded in hestia.schema_migrations yet.
+
+    Each migration runs in its own transaction together with its bookkeeping row, so a
+    failing migration leaves the schema at the previous version. Migrations written
+    before the runner existed are idempotent and are simply recorded on their first run.
+    """
+    migrations = discover(directory)
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", [ADVISORY_LOCK_KEY])
+        conn.commit()
+        try:
+            todo = pending(conn, migrations)
+            for migration in todo:
+                logger.warning(f"Applying migration {migration.version}_{migration.name}")
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(migration.sql)
+                        cur.execute(
+                            "INSERT INTO hestia.schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                            [migration.version, migration.name, migration.checksum],
+                        )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    logger.error(f"Migration {migration.version}_{migration.name} failed, rolled back")
+                    raise
+            return todo
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", [ADVISORY_LOCK_KEY])
+            conn.commit()
+    finally:
+        db.release_connection(conn)
+
+
+def apply_on_startup() -> list[Migration]:
+    """apply_pending, unless HESTIA_MIGRATE_ON_STARTUP=0 leaves migrations to be applied by hand.
+
+    Every service calls this before it touches the database, so whichever starts first
+    brings the schema up to date and the others wait on the advisory lock meanwhile.
+    """
+    if os.environ.get("HESTIA_MIGRATE_ON_STARTUP", "1") != "1":
+        return []
+    return apply_pending()
+
+
+def status(directory: str = MIGRATIONS_DIR) -> list[tuple[Migration, bool]]:
+    """(migration, applied) for every migration file."""
+    migrations = discover(directory)
+    conn = db.get_connection()
+    try:
+        todo = {m.version for m in pending(conn, migrations)}
+    finally:
+        db.release_connection(conn)
+    return [(m, m.version not in todo) for m in migrations]
+
+
+if __name__ == '__main__':
+    # python3 -m hestia_utils.migrations [status|apply]
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "apply":
+        applied = apply_pending()
+        print(f"Applied {len(applied)} migration(s)")
+        for migration in applied:
+            print(f"  {migration.version:04d}_{migration.name}")
+    elif command == "status":
+        for migration, applied in status():
+            print(f"{'applied' if applied else 'pending'}  {migration.version:04d}_{migration.name}")
+    else:
+        sys.exit(f"Unknown command {command!r}, use status or apply")
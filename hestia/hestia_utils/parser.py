@@ -3,7 +3,7 @@ import csv
 import json
 import chompjs
 import logging
-import requests
+import httpx
 from urllib import parse
 from bs4 import BeautifulSoup, NavigableString
 
@@ -24,10 +24,22 @@ class Home:
         return f"{self.address}, {self.city} ({self.agency.title()})"
         
     def __eq__(self, other) -> bool:
-        if self.address.lower() == other.address.lower():
-            if self.city.lower() == other.city.lower():
-                return True
-        return False
+        if not isinstance(other, Home):
+            return NotImplemented
+        return self.dedup_key == other.dedup_key
+
+    def __hash__(self) -> int:
+        return hash(self.dedup_key)
+
+    @staticmethod
+    def make_dedup_key(address: str, city: str) -> tuple[str, str]:
+        # Keys for rows read back from the database are built without going through
+        # the city setter, the stored city is already normalized
+        return (address.lower(), city.lower())
+
+    @property
+    def dedup_key(self) -> tuple[str, str]:
+        return Home.make_dedup_key(self.address, self.city)
     
     @property
     def address(self) -> str:
@@ -91,7 +103,7 @@ class HomeResults:
     def __repr__(self):
         return str([home for home in self.homes])
     
-    def __init__(self, source: str, raw: requests.models.Response):
+    def __init__(self, source: str, raw: httpx.Response, pages: list[httpx.Response] | None = None):
         self.homes: list[Home] = []
         if source == "vesteda":
             self.parse_vesteda(raw)
@@ -130,7 +142,7 @@ class HomeResults:
         elif source == "123wonen":
             self.parse_123wonen(raw)
         elif source == "roofz":
-            self.parse_roofz(raw)
+            self.parse_roofz(raw, pages or [])
         elif source == "vanderlinden":
             self.parse_vanderlinden(raw)
         elif source == "wooove":
@@ -162,7 +174,19 @@ class HomeResults:
         else:
             raise ValueError(f"Unknown source: {source}")
 
-    def parse_hexia(self, r: requests.models.Response, corp: str):
+    @staticmethod
+    def page_urls(source: str, raw: httpx.Response) -> list[str]:
+        """URLs of the further result pages the parser of source needs besides raw.
+
+        The caller fetches them and passes the responses to HomeResults as pages.
+        """
+        if source == "roofz":
+            last_page = raw.json().get("meta", {}).get("last_page", 1)
+            base_url = str(raw.url).split("?")[0]
+            return [f"{base_url}?page={page}" for page in range(2, last_page + 1)]
+        return []
+
+    def parse_hexia(self, r: httpx.Response, corp: str):
         results = json.loads(r.content)["data"]
 
         for res in results:
@@ -236,7 +260,7 @@ class HomeResults:
 
             self.homes.append(home)
 
-    def parse_woonnet_rijnmond(self, r: requests.models.Response):
+    def parse_woonnet_rijnmond(self, r: httpx.Response):
         results = json.loads(r.content)["data"]["housingPublications"]["nodes"]["edges"]
         for res in results:
             home = Home(agency="woonnet_rijnmond")
@@ -246,7 +270,7 @@ class HomeResults:
             home.price = int(res["node"]["unit"]["basicRent"]["exact"])
             self.homes.append(home)
         
-    def parse_woonin(self, r: requests.models.Response):
+    def parse_woonin(self, r: httpx.Response):
         results = json.loads(r.content)['objects']
         for res in results:
             if res.get("type") != "huur":
@@ -288,7 +312,7 @@ class HomeResults:
             home.price = int(digits)
             self.homes.append(home)
     
-    def parse_vesteda(self, r: requests.models.Response):
+    def parse_vesteda(self, r: httpx.Response):
         results = json.loads(r.content)["results"]["objects"]
             
         for res in results:
@@ -319,7 +343,7 @@ class HomeResults:
                 pass
             self.homes.append(home)
         
-    def parse_vbt(self, r: requests.models.Response):
+    def parse_vbt(self, r: httpx.Response):
         results = json.loads(r.content)["houses"]
         
         for res in results:
@@ -334,7 +358,7 @@ class HomeResults:
             home.price = int(res["prices"]["rental"]["price"])
             self.homes.append(home)
             
-    def parse_alliantie(self, r: requests.models.Response):
+    def parse_alliantie(self, r: httpx.Response):
         results = json.loads(r.content)["data"]
         
         for res in results:
@@ -362,7 +386,7 @@ class HomeResults:
                 pass
             self.homes.append(home)
             
-    def parse_woningnet_dak(self, r: requests.models.Response, regio: str):
+    def parse_woningnet_dak(self, r: httpx.Response, regio: str):
         results = json.loads(r.content)["data"]["PublicatieLijst"]["List"]
         
         for res in results:
@@ -392,7 +416,7 @@ class HomeResults:
             home.sqm = sqm
             self.homes.append(home)
             
-    def parse_krk(self, r: requests.models.Response):
+    def parse_krk(self, r: httpx.Response):
         results = json.loads(r.content)["objects"]
     
         for res in results:
@@ -407,7 +431,7 @@ class HomeResults:
             home.price = int(res["rent_price"])
             self.homes.append(home)
             
-    def parse_funda(self, r: requests.models.Response):
+    def parse_funda(self, r: httpx.Response):
         response = json.loads(r.content)["responses"][0]
         # Funda's Elasticsearch _msearch endpoint returns HTTP 200 even when the
         # individual query fails: the failing sub-response carries an `error`
@@ -462,7 +486,7 @@ class HomeResults:
             self.homes.append(home)
             
     # I love websites with (accidental) public API endpoints and proper JSON
-    def parse_rebo(self, r: requests.models.Response):
+    def parse_rebo(self, r: httpx.Response):
         results = json.loads(r.content)["hits"]
         for res in results:
             home = Home(agency="rebo")
@@ -480,7 +504,7 @@ class HomeResults:
                 pass
             self.homes.append(home)
 
-    def parse_nmg(self, r: requests.models.Response):
+    def parse_nmg(self, r: httpx.Response):
         results = BeautifulSoup(r.content, "html.parser").find_all("article", class_="house huur")
         for res in results:
             home = Home(agency="nmg")
@@ -498,7 +522,7 @@ class HomeResults:
             if (home.address and home.city and home.url and home.price):
                 self.homes.append(home)
 
-    def parse_vbo(self, r: requests.models.Response):
+    def parse_vbo(self, r: httpx.Response):
         results = BeautifulSoup(r.content, "html.parser").find_all("a", class_="propertyLink")
         for res in results:
             home = Home(agency="vbo")
@@ -531,7 +555,7 @@ class HomeResults:
             if (home.address and home.city and home.url and home.price):
                 self.homes.append(home)
 
-    def parse_atta(self, r: requests.models.Response):
+    def parse_atta(self, r: httpx.Response):
         results = BeautifulSoup(r.content, "html.parser").find_all("div", class_="list__object")
         for res in results:
             home = Home(agency="atta")
@@ -546,7 +570,7 @@ class HomeResults:
             if (home.address and home.city and home.url and home.price):
                 self.homes.append(home)
 
-    def parse_ooms(self, r: requests.models.Response):
+    def parse_ooms(self, r: httpx.Response):
         results = json.loads(r.content)["objects"]
         rentals = filter(lambda res: res["filters"]["buy_rent"] == "rent", results)
         for res in rentals:
@@ -564,7 +588,7 @@ class HomeResults:
             home.price = res["rent_price"]
             self.homes.append(home)
 
-    def parse_woonmatchwaterland(self, r: requests.models.Response):
+    def parse_woonmatchwaterland(self, r: httpx.Response):
         soup = BeautifulSoup(r.content, "html.parser")
         script = soup.find("script", id="__NEXT_DATA__", type="application/json")
         if script is not None and script.string:
@@ -579,7 +603,7 @@ class HomeResults:
                     home.price = int(float(res["details"]["grossrent"]))
                     self.homes.append(home)
 
-    def parse_entree(self, r: requests.models.Response):
+    def parse_entree(self, r: httpx.Response):
         results = json.loads(r.content)["d"]["aanbod"]
         for res in results:
             skip_prop = ["Garage", "Parkeerplaats"]
@@ -607,7 +631,7 @@ class HomeResults:
     in a JSON object on page load and then afterwards fill in the rest of the HTML
     with that data.
     """
-    def parse_woonzeker(self, r: requests.models.Response):
+    def parse_woonzeker(self, r: httpx.Response):
         # As of 2026-02, Woonzeker exposes a JSON endpoint:
         #   /api/ms/listing/properties?...&filter[import_type]=RentResident
         # Prefer this when the response is JSON.
@@ -781,7 +805,7 @@ class HomeResults:
             return
 
 
-    def parse_123wonen(self, r: requests.models.Response):
+    def parse_123wonen(self, r: httpx.Response):
         results = json.loads(r.content)['pointers']
         for res in results:
             if res['transaction'] == 'Verhuur':
@@ -795,19 +819,13 @@ class HomeResults:
                 home.price = int(res['price'])
                 self.homes.append(home)
 
-    def parse_roofz(self, r: requests.models.Response):
-        data = r.json()
-        results = data.get("data", [])
+    def parse_roofz(self, r: httpx.Response, pages: list[httpx.Response]):
+        results = r.json().get("data", [])
 
-        # Fetch remaining pages
-        meta = data.get("meta", {})
-        last_page = meta.get("last_page", 1)
-        if last_page > 1:
-            for page in range(2, last_page + 1):
-                url = r.url.split("?")[0] + f"?page={page}"
-                page_r = requests.get(url, headers=dict(r.request.headers))
-                if page_r.status_code == 200:
-                    results.extend(page_r.json().get("data", []))
+        # The remaining pages, see page_urls
+        for page_r in pages:
+            if page_r.status_code == 200:
+                results.extend(page_r.json().get("data", []))
 
         for res in results:
             addr = res.get("address", {})
@@ -844,7 +862,7 @@ class HomeResults:
                 home.sqm = int(living_area)
             self.homes.append(home)
 
-    def parse_vanderlinden(self, r: requests.models.Response):
+    def parse_vanderlinden(self, r: httpx.Response):
         results = BeautifulSoup(r.content, "html.parser").find_all("div", class_="woninginfo")
         for res in results:
             # Filter "Onder optie" listings (already taken)
@@ -898,7 +916,7 @@ class HomeResults:
                 pass
             self.homes.append(home)
 
-    def parse_wooove(self, r: requests.models.Response):
+    def parse_wooove(self, r: httpx.Response):
         soup = BeautifulSoup(r.content, "html.parser")
         results = soup.select(".woningList > a[href]")
 
@@ -945,7 +963,7 @@ class HomeResults:
             home.price = int(price_digits)
             self.homes.append(home)
 
-    def parse_ikwilhuren(self, r: requests.models.Response):
+    def parse_ikwilhuren(self, r: httpx.Response):
         soup = BeautifulSoup(r.content, "html.parser")
         results = soup.select(".card.card-woning")
 
@@ -1007,7 +1025,7 @@ class HomeResults:
             home.price = int(price_digits)
             self.homes.append(home)
 
-    def parse_easylease(self, r: requests.models.Response):
+    def parse_easylease(self, r: httpx.Response):
         results = json.loads(r.content)
         for res in results["values"]:
             if res["data"]["label"] == "Nieuw":
@@ -1019,7 +1037,7 @@ class HomeResults:
                 home.sqm = int(res["data"]["surface"])
                 self.homes.append(home)
 
-    def parse_beumer(self, r: requests.models.Response):
+    def parse_beumer(self, r: httpx.Response):
         soup = BeautifulSoup(r.content, "html.parser")
         results = soup.select("a.card-house")
         for res in results:
@@ -1058,7 +1076,7 @@ class HomeResults:
                             home.sqm = sqm_i
             self.homes.append(home)
 
-    def parse_nederwoon(self, r: requests.models.Response):
+    def parse_nederwoon(self, r: httpx.Response):
         results = BeautifulSoup(r.content, "html.parser").select(".location")
         for res in results:
             link_tag = res.select_one("a.see-page-button[href]")
@@ -1101,7 +1119,7 @@ class HomeResults:
 
             self.homes.append(home)
 
-    def parse_huurportaal(self, r: requests.models.Response):
+    def parse_huurportaal(self, r: httpx.Response):
         # The listing page embeds a schema.org ItemList in a JSON-LD script,
         # which is more stable than the rendered Next.js HTML.
         soup = BeautifulSoup(r.content, "html.parser")
@@ -1166,7 +1184,7 @@ class HomeResults:
             seen.add(key)
             self.homes.append(home)
 
-    def parse_grunoverhuur(self, r: requests.models.Response):
+    def parse_grunoverhuur(self, r: httpx.Response):
         soup = BeautifulSoup(r.content, "html.parser")
         base_url = "https://www.grunoverhuur.nl"
 
@@ -1242,7 +1260,7 @@ class HomeResults:
 
             self.homes.append(home)
 
-    def parse_athome(self, r: requests.models.Response):
+    def parse_athome(self, r: httpx.Response):
         base_url = "https://www.athomevastgoed.nl"
 
         # Listings are server-rendered into a Vuex store commit as a Laravel
@@ -1315,7 +1333,7 @@ class HomeResults:
 
             self.homes.append(home)
 
-    def parse_interhouse(self, r: requests.models.Response):
+    def parse_interhouse(self, r: httpx.Response):
         soup = BeautifulSoup(r.content, "html.parser")
 
         unavailable_keywords = [
@@ -1381,7 +1399,7 @@ class HomeResults:
 
             self.homes.append(home)
 
-    def parse_maxxhuren(self, r: requests.models.Response):
+    def parse_maxxhuren(self, r: httpx.Response):
         soup = BeautifulSoup(r.content, "html.parser")
         results = soup.select("a.object[href]")
 
@@ -1441,7 +1459,7 @@ class HomeResults:
                 pass
             self.homes.append(home)
 
-    def parse_livresidential(self, r: requests.models.Response):
+    def parse_livresidential(self, r: httpx.Response):
         # Listings are server-rendered; only available homes appear on the
         # overview page, so there is no rented status to filter out.
         soup = BeautifulSoup(r.content, "html.parser")
@@ -1496,7 +1514,7 @@ class HomeResults:
             seen.add(key)
             self.homes.append(home)
 
-    def parse_hoekstra(self, r: requests.models.Response):
+    def parse_hoekstra(self, r: httpx.Response):
         soup = BeautifulSoup(r.content, "html.parser")
         seen: set[tuple[str, str]] = set()
 
@@ -1732,7 +1750,7 @@ class HomeResults:
 
                     add_home(address, city, link.get("href", ""), price_match.group(1), card_text)
 
-    def parse_yourhouse(self, r: requests.models.Response):
+    def parse_yourhouse(self, r: httpx.Response):
         soup = BeautifulSoup(r.content, "html.parser")
 
         for res in soup.select("article.object"):
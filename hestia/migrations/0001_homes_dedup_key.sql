@@ -0,0 +1,21 @@
+-- Stored dedup key for hestia.homes, so the scraper can let Postgres decide which
+-- parsed homes are new (INSERT ... ON CONFLICT) instead of pulling 180 days of history.
+
+ALTER TABLE hestia.homes ADD COLUMN IF NOT EXISTS dedup_key varchar NULL;
+
+-- Homes that were relisted after the 180 day window exist more than once; only the
+-- most recent row per key gets the key, older rows keep NULL.
+UPDATE hestia.homes h
+SET dedup_key = k.dedup_key
+FROM (
+  SELECT
+    ctid,
+    lower(address) || '|' || lower(city) AS dedup_key,
+    row_number() OVER (PARTITION BY lower(address), lower(city) ORDER BY date_added DESC) AS rn
+  FROM hestia.homes
+) k
+WHERE h.ctid = k.ctid
+  AND k.rn = 1
+  AND h.dedup_key IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS homes_dedup_key_idx ON hestia.homes USING btree (dedup_key);
@@ -0,0 +1,24 @@
+-- Durable queue of notifications between the scraper and the dispatcher.
+-- The scraper inserts one row per (home, subscriber, channel), dispatchers lease due rows
+-- with FOR UPDATE SKIP LOCKED and report back sent, retry or failed.
+
+CREATE TABLE IF NOT EXISTS hestia.notification_outbox (
+  id bigint GENERATED ALWAYS AS IDENTITY NOT NULL,
+  idempotency_key varchar(64) NOT NULL,
+  channel varchar NOT NULL,
+  target varchar NOT NULL,
+  subscriber_id int4 NULL,
+  device_id varchar(36) NULL,
+  payload jsonb NOT NULL,
+  status varchar DEFAULT 'pending' NOT NULL,
+  attempts int4 DEFAULT 0 NOT NULL,
+  next_attempt_at timestamptz DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  locked_until timestamptz NULL,
+  last_error text NULL,
+  created_at timestamptz DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  sent_at timestamptz NULL,
+  CONSTRAINT notification_outbox_pkey PRIMARY KEY (id),
+  CONSTRAINT notification_outbox_idempotency_key_key UNIQUE (idempotency_key)
+);
+CREATE INDEX IF NOT EXISTS notification_outbox_due_idx ON hestia.notification_outbox USING btree (next_attempt_at) WHERE status IN ('pending', 'sending');
+CREATE INDEX IF NOT EXISTS notification_outbox_created_idx ON hestia.notification_outbox USING btree (created_at);
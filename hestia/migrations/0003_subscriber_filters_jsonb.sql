@@ -0,0 +1,13 @@
+-- Store subscriber city and agency filters as jsonb with GIN indexes, so broadcasts can
+-- let Postgres select the subscribers matching a batch of homes (filter_cities ?| ...).
+
+ALTER TABLE hestia.subscribers ALTER COLUMN filter_cities DROP DEFAULT;
+ALTER TABLE hestia.subscribers ALTER COLUMN filter_cities TYPE jsonb USING filter_cities::jsonb;
+ALTER TABLE hestia.subscribers ALTER COLUMN filter_cities SET DEFAULT '["amsterdam"]'::jsonb;
+
+ALTER TABLE hestia.subscribers ALTER COLUMN filter_agencies DROP DEFAULT;
+ALTER TABLE hestia.subscribers ALTER COLUMN filter_agencies TYPE jsonb USING filter_agencies::jsonb;
+ALTER TABLE hestia.subscribers ALTER COLUMN filter_agencies SET DEFAULT '["woningnet_amsterdam", "woningnet_huiswaarts", "woningnet_bovengroningen", "woningnet_eemvallei", "rebo", "woningnet_groningen", "woningnet_middenholland", "woningnet_woonkeus", "woningnet_woongaard", "krk", "alliantie", "woningnet_utrecht", "nmg", "bouwinvest", "vesteda", "vbt", "woningnet_almere", "woningnet_gooienvecht", "funda", "pararius", "woningnet_mijnwoonservice"]'::jsonb;
+
+CREATE INDEX IF NOT EXISTS idx_subscribers_filter_cities ON hestia.subscribers USING gin (filter_cities);
+CREATE INDEX IF NOT EXISTS idx_subscribers_filter_agencies ON hestia.subscribers USING gin (filter_agencies);
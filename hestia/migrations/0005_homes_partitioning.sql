@@ -0,0 +1,86 @@
+-- Monthly range partitions on hestia.homes.date_added, so readers of recent windows only
+-- touch recent partitions and old months can be archived by dropping a partition.
+
+-- A unique index on a partitioned table must include the partition key, so the dedup
+-- keys move to their own table. Keys older than the 180 day window are pruned.
+CREATE TABLE IF NOT EXISTS hestia.home_dedup_keys (
+  dedup_key varchar NOT NULL,
+  date_added timestamp NOT NULL,
+  CONSTRAINT home_dedup_keys_pkey PRIMARY KEY (dedup_key)
+);
+CREATE INDEX IF NOT EXISTS home_dedup_keys_date_added_idx ON hestia.home_dedup_keys USING btree (date_added);
+
+INSERT INTO hestia.home_dedup_keys (dedup_key, date_added)
+SELECT dedup_key, max(date_added) FROM hestia.homes WHERE dedup_key IS NOT NULL GROUP BY dedup_key
+ON CONFLICT (dedup_key) DO NOTHING;
+
+-- Creates the partition holding the month of the given date, unless it exists.
+-- Called by the scraper's daily maintenance to stay a few months ahead.
+CREATE OR REPLACE FUNCTION hestia.create_homes_partition(month date) RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+  lower_bound date := date_trunc('month', month)::date;
+  partition_name text := 'homes_' || to_char(lower_bound, '"y"YYYY"m"MM');
+BEGIN
+  IF to_regclass('hestia.' || partition_name) IS NOT NULL THEN
+    RETURN false;
+  END IF;
+  EXECUTE format(
+    'CREATE TABLE hestia.%I PARTITION OF hestia.homes FOR VALUES FROM (%L) TO (%L)',
+    partition_name, lower_bound, (lower_bound + interval '1 month')::date
+  );
+  RETURN true;
+END $$;
+
+DO $$
+DECLARE
+  first_month date;
+  month date;
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'hestia.homes'::regclass) = 'p' THEN
+    RETURN;
+  END IF;
+
+  ALTER TABLE hestia.homes RENAME TO homes_unpartitioned;
+
+  -- Postgres 15 has no identity columns on partitioned tables, id gets a plain sequence
+  CREATE TABLE hestia.homes (
+    url varchar NOT NULL,
+    address varchar NOT NULL,
+    city varchar NOT NULL,
+    price int4 DEFAULT '-1'::integer NOT NULL,
+    sqm int4 DEFAULT '-1'::integer NOT NULL,
+    agency varchar NULL,
+    date_added timestamp NOT NULL,
+    dedup_key varchar NULL,
+    id int8 NOT NULL
+  ) PARTITION BY RANGE (date_added);
+
+  -- Catches rows outside the monthly partitions instead of failing the insert
+  CREATE TABLE hestia.homes_default PARTITION OF hestia.homes DEFAULT;
+
+  SELECT date_trunc('month', coalesce(min(date_added), now()))::date INTO first_month FROM hestia.homes_unpartitioned;
+  FOR month IN
+    SELECT generate_series(first_month, date_trunc('month', now()) + interval '3 months', interval '1 month')::date
+  LOOP
+    PERFORM hestia.create_homes_partition(month);
+  END LOOP;
+
+  INSERT INTO hestia.homes (url, address, city, price, sqm, agency, date_added, dedup_key, id)
+  SELECT url, address, city, price, sqm, agency, date_added, dedup_key, id FROM hestia.homes_unpartitioned;
+
+  DROP TABLE hestia.homes_unpartitioned;
+
+  CREATE SEQUENCE hestia.homes_id_seq AS bigint OWNED BY hestia.homes.id;
+  PERFORM setval('hestia.homes_id_seq', coalesce(max(id), 0) + 1, false) FROM hestia.homes;
+  ALTER TABLE hestia.homes ALTER COLUMN id SET DEFAULT nextval('hestia.homes_id_seq');
+  ALTER TABLE hestia.homes ADD CONSTRAINT homes_pkey PRIMARY KEY (id, date_added);
+END $$;
+
+-- The indexes of 0004, now created on every partition. homes_dedup_key_idx is replaced
+-- by home_dedup_keys.
+CREATE INDEX IF NOT EXISTS homes_date_added_idx ON hestia.homes USING btree (date_added DESC);
+CREATE INDEX IF NOT EXISTS homes_agency_date_added_idx ON hestia.homes USING btree (agency, date_added);
+CREATE INDEX IF NOT EXISTS homes_agency_idx ON hestia.homes USING btree (agency);
+CREATE INDEX IF NOT EXISTS homes_city_date_added_idx ON hestia.homes USING btree (lower(city), date_added DESC) INCLUDE (price, sqm, agency);
+CREATE INDEX IF NOT EXISTS homes_city_idx ON hestia.homes USING btree (city);
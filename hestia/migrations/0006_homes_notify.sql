@@ -0,0 +1,16 @@
+-- Wakes up the live feed of the web tier (/api/homes/stream) when homes are inserted.
+-- One notification per statement that inserted rows; the listener fetches the new rows
+-- itself, so the payload stays empty and identical notifications of a transaction merge.
+CREATE OR REPLACE FUNCTION hestia.notify_homes_inserted() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM inserted) THEN
+    PERFORM pg_notify('hestia_homes', '');
+  END IF;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS homes_notify_inserted ON hestia.homes;
+CREATE TRIGGER homes_notify_inserted AFTER INSERT ON hestia.homes
+  REFERENCING NEW TABLE AS inserted
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.notify_homes_inserted();
@@ -0,0 +1,39 @@
+-- Version of the slowly changing data behind the JSON APIs: targets, affiliate links and
+-- meta itself (donation link). The web tier derives ETags from it, so every change to
+-- those tables bumps it, including edits made by hand.
+ALTER TABLE hestia.meta ADD COLUMN IF NOT EXISTS "version" int8 DEFAULT 0 NOT NULL;
+
+CREATE OR REPLACE FUNCTION hestia.meta_version_on_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF NEW.version = OLD.version THEN
+    NEW.version := OLD.version + 1;
+  END IF;
+  RETURN NEW;
+END $$;
+
+CREATE OR REPLACE FUNCTION hestia.bump_meta_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  UPDATE hestia.meta SET "version" = "version" + 1 WHERE id = 'default';
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS meta_version ON hestia.meta;
+CREATE TRIGGER meta_version BEFORE UPDATE ON hestia.meta
+  FOR EACH ROW EXECUTE FUNCTION hestia.meta_version_on_update();
+
+DROP TRIGGER IF EXISTS targets_bump_meta_version ON hestia.targets;
+CREATE TRIGGER targets_bump_meta_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON hestia.targets
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.bump_meta_version();
+
+DROP TRIGGER IF EXISTS affiliate_categories_bump_meta_version ON hestia.affiliate_categories;
+CREATE TRIGGER affiliate_categories_bump_meta_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON hestia.affiliate_categories
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.bump_meta_version();
+
+-- Not on click_count, which /go/<id> updates on every click
+DROP TRIGGER IF EXISTS affiliate_links_bump_meta_version ON hestia.affiliate_links;
+CREATE TRIGGER affiliate_links_bump_meta_version
+  AFTER INSERT OR DELETE OR TRUNCATE OR UPDATE OF category_id, provider, url, title_en, title_nl, blurb_en, blurb_nl, logo, slug, sort_order, enabled
+  ON hestia.affiliate_links
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.bump_meta_version();
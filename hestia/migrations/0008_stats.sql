@@ -0,0 +1,93 @@
+-- Aggregates behind /api/statistics, so the public landing page never scans hestia.homes.
+-- Triggers keep them current on every insert and delete. Dropped partitions fire no
+-- triggers, so hestia.refresh_stats() recomputes everything in the scraper's daily
+-- maintenance, right after old partitions are archived.
+CREATE TABLE IF NOT EXISTS hestia.stats (
+  kind varchar NOT NULL,
+  "key" varchar NOT NULL,
+  count int8 DEFAULT 0 NOT NULL,
+  CONSTRAINT stats_pkey PRIMARY KEY (kind, "key")
+);
+
+-- kind            key
+-- homes           ''                   every home
+-- homes_city      city                 homes per city
+-- homes_agency    agency               homes per agency
+-- homes_hour      YYYY-MM-DDTHH (UTC)  homes added per hour, for "today"
+-- subscribers     ''                   every subscriber
+-- subscribers_month  YYYY-MM (UTC)     subscribers by month they joined
+
+CREATE OR REPLACE FUNCTION hestia.count_homes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  -- Sorted, so concurrent inserts lock the counter rows in the same order
+  INSERT INTO hestia.stats (kind, "key", count)
+  SELECT kind, "key", CASE WHEN TG_OP = 'INSERT' THEN count(*) ELSE -count(*) END
+  FROM (
+    SELECT 'homes' AS kind, '' AS "key" FROM changed
+    UNION ALL SELECT 'homes_city', city FROM changed
+    UNION ALL SELECT 'homes_agency', agency FROM changed WHERE agency IS NOT NULL
+    UNION ALL SELECT 'homes_hour', to_char(date_trunc('hour', date_added), 'YYYY-MM-DD"T"HH24') FROM changed
+  ) AS c
+  GROUP BY kind, "key"
+  ORDER BY kind, "key"
+  ON CONFLICT (kind, "key") DO UPDATE SET count = hestia.stats.count + excluded.count;
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION hestia.count_subscribers() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO hestia.stats (kind, "key", count)
+  SELECT kind, "key", CASE WHEN TG_OP = 'INSERT' THEN count(*) ELSE -count(*) END
+  FROM (
+    SELECT 'subscribers' AS kind, '' AS "key" FROM changed
+    UNION ALL SELECT 'subscribers_month', to_char(date_added AT TIME ZONE 'UTC', 'YYYY-MM') FROM changed
+  ) AS c
+  GROUP BY kind, "key"
+  ORDER BY kind, "key"
+  ON CONFLICT (kind, "key") DO UPDATE SET count = hestia.stats.count + excluded.count;
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION hestia.refresh_stats() RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+  DELETE FROM hestia.stats;
+  INSERT INTO hestia.stats (kind, "key", count)
+  SELECT 'homes', '', count(*) FROM hestia.homes
+  UNION ALL
+  SELECT 'homes_city', city, count(*) FROM hestia.homes GROUP BY city
+  UNION ALL
+  SELECT 'homes_agency', agency, count(*) FROM hestia.homes WHERE agency IS NOT NULL GROUP BY agency
+  UNION ALL
+  -- Only the hours "today" can still look at
+  SELECT 'homes_hour', to_char(date_trunc('hour', date_added), 'YYYY-MM-DD"T"HH24'), count(*)
+  FROM hestia.homes WHERE date_added >= (now() AT TIME ZONE 'UTC') - interval '2 days' GROUP BY 2
+  UNION ALL
+  SELECT 'subscribers', '', count(*) FROM hestia.subscribers
+  UNION ALL
+  SELECT 'subscribers_month', to_char(date_added AT TIME ZONE 'UTC', 'YYYY-MM'), count(*) FROM hestia.subscribers GROUP BY 2;
+END $$;
+
+DROP TRIGGER IF EXISTS homes_count_inserted ON hestia.homes;
+CREATE TRIGGER homes_count_inserted AFTER INSERT ON hestia.homes
+  REFERENCING NEW TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.count_homes();
+
+DROP TRIGGER IF EXISTS homes_count_deleted ON hestia.homes;
+CREATE TRIGGER homes_count_deleted AFTER DELETE ON hestia.homes
+  REFERENCING OLD TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.count_homes();
+
+DROP TRIGGER IF EXISTS subscribers_count_inserted ON hestia.subscribers;
+CREATE TRIGGER subscribers_count_inserted AFTER INSERT ON hestia.subscribers
+  REFERENCING NEW TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.count_subscribers();
+
+DROP TRIGGER IF EXISTS subscribers_count_deleted ON hestia.subscribers;
+CREATE TRIGGER subscribers_count_deleted AFTER DELETE ON hestia.subscribers
+  REFERENCING OLD TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.count_subscribers();
+
+SELECT hestia.refresh_stats();
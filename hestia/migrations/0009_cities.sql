@@ -0,0 +1,47 @@
+-- Every city that has homes, so the filter screens of the web and the bot stop running
+-- SELECT DISTINCT city over hestia.homes. Inserts into homes add new cities, the daily
+-- maintenance prunes cities whose homes are all archived. Adding or removing a city bumps
+-- meta's version, which the filter option caches of the web and the bot check.
+CREATE TABLE IF NOT EXISTS hestia.cities (
+  city varchar NOT NULL,
+  first_seen timestamp DEFAULT (now() AT TIME ZONE 'UTC') NOT NULL,
+  CONSTRAINT cities_pkey PRIMARY KEY (city)
+);
+
+INSERT INTO hestia.cities (city)
+SELECT DISTINCT city FROM hestia.homes
+ON CONFLICT (city) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION hestia.add_home_cities() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO hestia.cities (city)
+  SELECT DISTINCT city FROM changed ORDER BY city
+  ON CONFLICT (city) DO NOTHING;
+  RETURN NULL;
+END $$;
+
+-- Only statements that really added or removed a city bump the version
+CREATE OR REPLACE FUNCTION hestia.bump_meta_version_if_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM changed) THEN
+    UPDATE hestia.meta SET "version" = "version" + 1 WHERE id = 'default';
+  END IF;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS homes_add_cities ON hestia.homes;
+CREATE TRIGGER homes_add_cities AFTER INSERT ON hestia.homes
+  REFERENCING NEW TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.add_home_cities();
+
+DROP TRIGGER IF EXISTS cities_inserted_bump_meta_version ON hestia.cities;
+CREATE TRIGGER cities_inserted_bump_meta_version AFTER INSERT ON hestia.cities
+  REFERENCING NEW TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.bump_meta_version_if_changed();
+
+DROP TRIGGER IF EXISTS cities_deleted_bump_meta_version ON hestia.cities;
+CREATE TRIGGER cities_deleted_bump_meta_version AFTER DELETE ON hestia.cities
+  REFERENCING OLD TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.bump_meta_version_if_changed();
@@ -0,0 +1,16 @@
+-- Preview images move out of the database into a content addressed store on the web
+-- container's disk (PREVIEW_BLOB_DIR). Rows keep the sha256 of their blob instead of the
+-- bytes, so several listings using the same photo share one file.
+ALTER TABLE hestia.preview_cache ADD COLUMN IF NOT EXISTS image_sha256 varchar(64) NULL;
+
+-- Cached bytes are not carried over, those previews are fetched again on their next view
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'hestia' AND table_name = 'preview_cache' AND column_name = 'image_bytes'
+  ) THEN
+    DELETE FROM hestia.preview_cache WHERE image_bytes IS NOT NULL;
+    ALTER TABLE hestia.preview_cache DROP COLUMN image_bytes;
+  END IF;
+END $$;
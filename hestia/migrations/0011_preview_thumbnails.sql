@@ -0,0 +1,7 @@
+-- Card sized renditions of preview images, content type to the sha256 of their blob:
+-- {"image/avif": "...", "image/webp": "..."}. image_sha256 holds the JPEG rendition, or
+-- the original when it could not be decoded.
+ALTER TABLE hestia.preview_cache ADD COLUMN IF NOT EXISTS thumbnails jsonb NULL;
+
+-- Previews stored as full size originals are fetched again and shrunk
+DELETE FROM hestia.preview_cache WHERE image_sha256 IS NOT NULL AND thumbnails IS NULL;
@@ -0,0 +1,26 @@
+-- Queue of listing pages whose preview image the web app warms in the background, so the
+-- first dashboard or iOS view is a preview_cache hit. A trigger queues every inserted
+-- home; the web workers lease jobs with FOR UPDATE SKIP LOCKED and delete them when done.
+CREATE TABLE IF NOT EXISTS hestia.preview_jobs (
+  url varchar NOT NULL,
+  attempts int4 DEFAULT 0 NOT NULL,
+  locked_until timestamptz NULL,
+  created_at timestamptz DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  CONSTRAINT preview_jobs_pkey PRIMARY KEY (url)
+);
+
+CREATE OR REPLACE FUNCTION hestia.enqueue_preview_jobs() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO hestia.preview_jobs (url)
+  SELECT DISTINCT url FROM changed ORDER BY url
+  ON CONFLICT (url) DO NOTHING;
+  RETURN NULL;
+END $$;
+
+-- Workers wake up on the hestia_homes notification of 0006, which is delivered on commit
+-- together with these rows
+DROP TRIGGER IF EXISTS homes_enqueue_preview_jobs ON hestia.homes;
+CREATE TRIGGER homes_enqueue_preview_jobs AFTER INSERT ON hestia.homes
+  REFERENCING NEW TABLE AS changed
+  FOR EACH STATEMENT EXECUTE FUNCTION hestia.enqueue_preview_jobs();
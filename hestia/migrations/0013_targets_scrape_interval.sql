@@ -0,0 +1,2 @@
+-- Per-target scrape interval of the resident scraper daemon, NULL uses HESTIA_SCRAPE_INTERVAL
+ALTER TABLE hestia.targets ADD COLUMN IF NOT EXISTS scrape_interval_seconds int4;
@@ -0,0 +1,39 @@
+-- Homes dated in a month without a partition land in hestia.homes_default, and Postgres
+-- refuses to create that month's partition while the default still holds them. Such a
+-- month gets a standalone table instead: the rows move over from the default partition
+-- and the table is attached, all in the caller's transaction.
+CREATE OR REPLACE FUNCTION hestia.create_homes_partition(month date) RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+  lower_bound date := date_trunc('month', month)::date;
+  upper_bound date := (date_trunc('month', month) + interval '1 month')::date;
+  partition_name text := 'homes_' || to_char(lower_bound, '"y"YYYY"m"MM');
+BEGIN
+  IF to_regclass('hestia.' || partition_name) IS NOT NULL THEN
+    RETURN false;
+  END IF;
+  -- Keeps inserts out of the default partition until the new one is attached
+  LOCK TABLE hestia.homes_default IN EXCLUSIVE MODE;
+  IF NOT EXISTS (SELECT 1 FROM hestia.homes_default WHERE date_added >= lower_bound AND date_added < upper_bound) THEN
+    EXECUTE format(
+      'CREATE TABLE hestia.%I PARTITION OF hestia.homes FOR VALUES FROM (%L) TO (%L)',
+      partition_name, lower_bound, upper_bound
+    );
+    RETURN true;
+  END IF;
+  EXECUTE format(
+    'CREATE TABLE hestia.%I (LIKE hestia.homes INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+    partition_name
+  );
+  EXECUTE format(
+    'WITH moved AS (DELETE FROM hestia.homes_default WHERE date_added >= %L AND date_added < %L RETURNING *)
+     INSERT INTO hestia.%I SELECT * FROM moved',
+    lower_bound, upper_bound, partition_name
+  );
+  -- The parent's indexes and triggers are attached along with the partition
+  EXECUTE format(
+    'ALTER TABLE hestia.homes ATTACH PARTITION hestia.%I FOR VALUES FROM (%L) TO (%L)',
+    partition_name, lower_bound, upper_bound
+  );
+  RETURN true;
+END $$;
@@ -0,0 +1,8 @@
+-- Daily and weekly maintenance jobs, claimed by whichever scraper process gets there first
+-- so the admin digest and the thanks reminder go out once however many processes run them
+CREATE TABLE IF NOT EXISTS hestia.maintenance_runs (
+  task varchar NOT NULL,
+  slot varchar NOT NULL,
+  claimed_at timestamptz DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  CONSTRAINT maintenance_runs_pkey PRIMARY KEY (task, slot)
+);
@@ -2,13 +2,14 @@ import json
 import logging
 import hashlib
 import os
+import sys
+import time
+import random
+import asyncio
 import traceback
-import requests
-from time import sleep
 from asyncio import run
 from collections import Counter
 from functools import lru_cache
-from telegram.error import Forbidden
 from datetime import datetime, timedelta, timezone
 
 try:
@@ -36,7 +37,11 @@ import hestia_utils.meta as meta
 import hestia_utils.secrets as secrets
 import hestia_utils.apns as apns
 import hestia_utils.strings as strings
+import hestia_utils.http_client as http_client
+import hestia_utils.delivery as delivery
+import hestia_utils.migrations as migrations
 from hestia_utils.parser import Home, HomeResults
+from hestia_utils.matcher import SubscriberMatcher
 
 HESTIA_TARGET = os.environ.get("HESTIA_TARGET", "")
 
@@ -48,6 +53,38 @@ APNS_RETRY_BASE_SECONDS = 0.5
 APNS_INVALID_TOKEN_THRESHOLD = 1
 SCRAPER_METRICS = Counter()
 
+# Daemon mode: one resident process scrapes every enabled target on its own interval
+# instead of cron starting a fresh interpreter per agency every five minutes.
+DAEMON_DEFAULT_INTERVAL_SECONDS = int(os.environ.get("HESTIA_SCRAPE_INTERVAL", "300"))
+DAEMON_TARGET_RELOAD_SECONDS = 300
+DAEMON_MAINTENANCE_INTERVAL_SECONDS = 60
+DAEMON_EXCLUDED_AGENCIES = {a for a in os.environ.get("HESTIA_DAEMON_EXCLUDE", "").split(",") if a}
+
+# Only what matching and delivery need, not every column of every subscriber
+BROADCAST_SUBSCRIBER_COLUMNS = (
+    "id, telegram_id, telegram_enabled, apns_token, device_id, "
+    "filter_min_price, filter_max_price, filter_min_sqm, filter_cities, filter_agencies"
+)
+
+# With the outbox enabled, new homes and their notifications are written in one
+# transaction and a separate dispatcher (scraper.py --dispatch) delivers them.
+NOTIFICATION_OUTBOX = os.environ.get("HESTIA_NOTIFICATION_OUTBOX", "0") == "1"
+DISPATCH_BATCH_SIZE = int(os.environ.get("HESTIA_DISPATCH_BATCH_SIZE", "500"))
+DISPATCH_POLL_SECONDS = float(os.environ.get("HESTIA_DISPATCH_POLL_SECONDS", "2"))
+DISPATCH_LEASE_SECONDS = 300
+DISPATCH_PRUNE_INTERVAL_SECONDS = 3600
+# Recording outcomes is retried well within the lease, a row left in 'sending' is delivered again
+DISPATCH_FINISH_ATTEMPTS = 3
+DISPATCH_FINISH_RETRY_SECONDS = 2
+
+# hestia.homes is partitioned by month. The daily maintenance keeps partitions created
+# ahead of time and, with a retention set, archives months older than that and drops them.
+HOMES_PARTITIONS_AHEAD = int(os.environ.get("HESTIA_HOMES_PARTITIONS_AHEAD", "3"))
+HOMES_RETENTION_MONTHS = int(os.environ.get("HESTIA_HOMES_RETENTION_MONTHS", "0"))  # 0 keeps everything
+# Empty to only detach old partitions and keep them as tables
+HOMES_ARCHIVE_DIR = os.environ.get("HESTIA_HOMES_ARCHIVE_DIR", "/data/archive/homes")
+_DAEMON_TARGETS: dict[int, dict] = {}
+
 
 def _increment_scraper_metric(metric_name: str, outcome: str) -> int:
     key = f"{metric_name}:{outcome}"
@@ -100,6 +137,37 @@ def _build_zero_results_digest() -> str:
     return message
 
 
+def _maintain_homes_partitions() -> str:
+    message = ""
+    try:
+        created = db.ensure_homes_partitions(months_ahead=HOMES_PARTITIONS_AHEAD)
+        if created:
+            logger.info(f"Created homes partitions for {', '.join(created)}")
+    except Exception as e:
+        logger.error(f"Creating homes partitions failed: {repr(e)}")
+        message += f"\n\nCreating homes partitions failed: {repr(e)}"
+
+    db.prune_home_dedup_keys()
+
+    if HOMES_RETENTION_MONTHS <= 0:
+        return message
+    today = datetime.now().date()
+    # Months are kept whole: a partition goes once all of it is older than the retention
+    month_index = today.year * 12 + today.month - 1 - HOMES_RETENTION_MONTHS
+    cutoff = datetime(month_index // 12, month_index % 12 + 1, 1).date()
+    for name, month in db.get_homes_partitions():
+        if month >= cutoff:
+            break
+        try:
+            path = db.archive_homes_partition(name, HOMES_ARCHIVE_DIR)
+            logger.info(f"Archived homes partition {name} to {path}" if path else f"Detached homes partition {name}")
+        except Exception as e:
+            logger.error(f"Archiving homes partition {name} failed: {repr(e)}")
+            message += f"\n\nArchiving homes partition {name} failed: {repr(e)}"
+            break
+    return message
+
+
 async def _record_target_error(target: dict, exc: BaseException) -> None:
     try:
         db.upsert_error_rollup(
@@ -118,59 +186,73 @@ async def _record_target_error(target: dict, exc: BaseException) -> None:
         await meta.BOT.send_message(text=fallback_error, chat_id=secrets.OWN_CHAT_ID)
 
 
-@lru_cache(1)
-def _get_agency_pretty_name() -> str:
-    agency = db.fetch_one("SELECT agency, user_info FROM hestia.targets WHERE agency = %s", [HESTIA_TARGET,])
-    return agency.get("user_info", {}).get("agency", HESTIA_TARGET)
+@lru_cache(maxsize=None)
+def _get_agency_pretty_name(agency: str) -> str:
+    row = db.fetch_one("SELECT agency, user_info FROM hestia.targets WHERE agency = %s", [agency,])
+    return row.get("user_info", {}).get("agency", agency)
+
+
+async def run_maintenance() -> None:
+    now = datetime.now()
+
+    # Once a day at exactly 19:00 UTC, check some stuff and send an alert if necessary
+    # The maintenance loop comes round several times within the window, and more than one
+    # process may run it, so the slot is claimed in the database
+    if now.hour == 19 and now.minute < 5 and db.claim_maintenance_slot("daily", now.date().isoformat()):
+        message = ""
+        if db.get_dev_mode():
+            message += "\n\nDev mode is enabled"
+        if db.get_scraper_halted() and 'dev' not in meta.APP_VERSION:
+            message += "\n\nScraper is halted"
+
+        # Check if the donation link is expiring soon
+        # Expiry of Tikkie links is 14 days, start warning after 13
+        last_updated = db.get_donation_link_updated()
+        if datetime.now() - last_updated >= timedelta(days=13):
+            message += "\n\nDonation link expiring soon, use /setdonate"
+
+        message += _build_daily_error_digest()
+        message += _build_zero_results_digest()
+        db.cleanup_error_rollups(retention_days=30)
+        db.prune_maintenance_runs(retention_days=30)
+        message += _maintain_homes_partitions()
+        db.refresh_stats()
+        db.prune_cities()
+
+        if message:
+            await meta.BOT.send_message(text=message[2:], chat_id=secrets.OWN_CHAT_ID)
+
+    # Once a week, Friday 6pm UTC, send all who subscribed three weeks ago a thanks with a donation link reminder
+    if now.weekday() == 4 and now.hour == 18 and now.minute < 4 and db.claim_maintenance_slot("weekly", now.date().isoformat()):
+        if db.get_dev_mode():
+            logger.warning("Dev mode is enabled, not broadcasting thanks messages")
+        else:
+            subs = db.fetch_all("""
+                SELECT * FROM hestia.subscribers
+                WHERE telegram_enabled = true
+                AND date_added BETWEEN NOW() - INTERVAL '4 weeks' AND NOW() - INTERVAL '3 weeks'
+            """)
+
+            donation_link = db.get_donation_link()
+            logger.info(f"Broadcasting thanks message to {len(subs)} subscribers")
+            messages = [
+                delivery.OutgoingMessage(
+                    sub["telegram_id"],
+                    strings.get("weekly_reminder", int(sub["telegram_id"]), [donation_link]),
+                    {"parse_mode": "MarkdownV2", "disable_web_page_preview": True},
+                )
+                for sub in subs
+            ]
+            for result in await delivery.get_engine(meta.BOT).send_many(messages):
+                if not result.ok:
+                    logger.warning(f"Exception while broadcasting thanks message to {result.message.chat_id}: {result.error}")
 
 
 async def main() -> None:
 
     # Maintenance tasks — only run when HESTIA_TARGET is not set
     if not HESTIA_TARGET:
-        # Once a day at exactly 19:00 UTC, check some stuff and send an alert if necessary
-        if datetime.now().hour == 19 and datetime.now().minute < 5:
-            message = ""
-            if db.get_dev_mode():
-                message += "\n\nDev mode is enabled"
-            if db.get_scraper_halted() and 'dev' not in meta.APP_VERSION:
-                message += "\n\nScraper is halted"
-
-            # Check if the donation link is expiring soon
-            # Expiry of Tikkie links is 14 days, start warning after 13
-            last_updated = db.get_donation_link_updated()
-            if datetime.now() - last_updated >= timedelta(days=13):
-                message += "\n\nDonation link expiring soon, use /setdonate"
-
-            message += _build_daily_error_digest()
-            message += _build_zero_results_digest()
-            db.cleanup_error_rollups(retention_days=30)
-
-            if message:
-                await meta.BOT.send_message(text=message[2:], chat_id=secrets.OWN_CHAT_ID)
-
-        # Once a week, Friday 6pm UTC, send all who subscribed three weeks ago a thanks with a donation link reminder
-        if datetime.now().weekday() == 4 and datetime.now().hour == 18 and datetime.now().minute < 4:
-            if db.get_dev_mode():
-                logger.warning("Dev mode is enabled, not broadcasting thanks messages")
-            else:
-                subs = db.fetch_all("""
-                    SELECT * FROM hestia.subscribers
-                    WHERE telegram_enabled = true
-                    AND date_added BETWEEN NOW() - INTERVAL '4 weeks' AND NOW() - INTERVAL '3 weeks'
-                """)
-
-                donation_link = db.get_donation_link()
-                logger.info(f"Broadcasting thanks message to {len(subs)} subscribers")
-                for sub in subs:
-                    sleep(1/29)  # avoid rate limit (broadcasting to max 30 users per second)
-                    message = strings.get("weekly_reminder", int(sub["telegram_id"]), [donation_link])
-                    try:
-                        await meta.BOT.send_message(text=message, chat_id=sub["telegram_id"], parse_mode="MarkdownV2", disable_web_page_preview=True)
-                    except BaseException as e:
-                        logger.warning(f"Exception while broadcasting thanks message to {sub['telegram_id']}: {repr(e)}")
-                        continue
-
+        await run_maintenance()
         return  # maintenance container does not scrape
 
     # Scraping — only run when HESTIA_TARGET is set
@@ -181,13 +263,8 @@ async def main() -> None:
             [HESTIA_TARGET,]
         )
         if targets:
-            for target in targets:
-                try:
-                    await scrape_site(target)
-                except BaseException as e:
-                    error = f"[{target['agency']} ({target['id']})] {repr(e)}"
-                    logger.error(error)
-                    await _record_target_error(target, e)
+            # Targets are fetched concurrently, so wall time follows the slowest one
+            await asyncio.gather(*(_scrape_target(target) for target in targets))
             scrape_duration = datetime.now() - scrape_start_ts
             logger.info(f"Scrape took {scrape_duration.total_seconds():.2f} seconds")
         else:
@@ -195,92 +272,354 @@ async def main() -> None:
     else:
         logger.warning("Scraper is halted")
 
+    await http_client.CLIENT.aclose()
+    await apns.CLIENT.aclose()
 
-async def broadcast(homes: list[Home]) -> None:
-    subs = set()
-    apns_client = apns.APNsClient()
-    apns_invalid_counts: dict[int, int] = {}
-    
-    if db.get_dev_mode():
-        subs = db.fetch_all(
-            "SELECT * FROM hestia.subscribers WHERE (telegram_enabled = true OR apns_token IS NOT NULL) AND user_level > 1"
-        )
+
+async def _scrape_target(target: dict) -> None:
+    try:
+        await scrape_site(target)
+    except Exception as e:
+        error = f"[{target['agency']} ({target['id']})] {repr(e)}"
+        logger.error(error)
+        await _record_target_error(target, e)
+
+
+def _load_daemon_targets() -> dict[int, dict]:
+    # HESTIA_TARGET may hold a comma-separated list of agencies to restrict the daemon to;
+    # agencies that need their own container (e.g. host networking) can be excluded.
+    # Errors are raised, a failed read must not look like every target was disabled.
+    agencies = [a for a in HESTIA_TARGET.split(",") if a]
+    if agencies:
+        rows = db.fetch_all_or_raise("SELECT * FROM hestia.targets WHERE enabled = true AND agency = ANY(%s)", [agencies])
     else:
-        subs = db.fetch_all("SELECT * FROM hestia.subscribers WHERE telegram_enabled = true OR apns_token IS NOT NULL")
-    
+        rows = db.fetch_all_or_raise("SELECT * FROM hestia.targets WHERE enabled = true")
+    return {row["id"]: row for row in rows if row["agency"] not in DAEMON_EXCLUDED_AGENCIES}
+
+
+def _target_interval(target: dict) -> int:
+    return int(target.get("scrape_interval_seconds") or DAEMON_DEFAULT_INTERVAL_SECONDS)
+
+
+async def _run_target_schedule(target_id: int) -> None:
+    # Spread the first runs over one interval so all targets don't fire at once
+    await asyncio.sleep(random.uniform(0, _target_interval(_DAEMON_TARGETS[target_id])))
+    while target_id in _DAEMON_TARGETS:
+        # Always use the latest row, so edits to headers or query URLs apply without a restart
+        target = _DAEMON_TARGETS[target_id]
+        try:
+            halted = db.get_scraper_halted()
+        except Exception as e:
+            # Try again next interval rather than ending this target's schedule
+            logger.error(f"[{target['agency']} ({target_id})] Could not read the halted flag: {repr(e)}")
+        else:
+            if halted:
+                logger.warning(f"Scraper is halted, skipping {target['agency']} ({target_id})")
+            else:
+                scrape_start_ts = datetime.now()
+                await _scrape_target(target)
+                scrape_duration = datetime.now() - scrape_start_ts
+                logger.info(f"[{target['agency']} ({target_id})] Scrape took {scrape_duration.total_seconds():.2f} seconds")
+        await asyncio.sleep(_target_interval(target))
+
+
+async def _run_maintenance_schedule() -> None:
+    while True:
+        try:
+            await run_maintenance()
+        except Exception as e:
+            logger.error(f"Maintenance run failed: {repr(e)}")
+        await asyncio.sleep(DAEMON_MAINTENANCE_INTERVAL_SECONDS)
+
+
+async def run_daemon() -> None:
+    tasks: dict[int, asyncio.Task] = {}
+    # Like main(), only a daemon for every target runs maintenance
+    maintenance_task = None if HESTIA_TARGET else asyncio.create_task(_run_maintenance_schedule())
+    try:
+        while True:
+            try:
+                targets = _load_daemon_targets()
+            except Exception as e:
+                # One failed read is no reason to stop scraping, the next reload tries again
+                logger.error(f"Could not reload targets, keeping the current ones: {repr(e)}")
+            else:
+                _DAEMON_TARGETS.clear()
+                _DAEMON_TARGETS.update(targets)
+
+                for target_id in list(tasks):
+                    if target_id not in targets or tasks[target_id].done():
+                        tasks.pop(target_id).cancel()
+                for target_id in targets:
+                    if target_id not in tasks:
+                        tasks[target_id] = asyncio.create_task(_run_target_schedule(target_id))
+
+                logger.info(f"Daemon scheduling {len(tasks)} targets")
+            await asyncio.sleep(DAEMON_TARGET_RELOAD_SECONDS)
+    finally:
+        if maintenance_task:
+            maintenance_task.cancel()
+        for task in tasks.values():
+            task.cancel()
+        await http_client.CLIENT.aclose()
+        await apns.CLIENT.aclose()
+
+
+def _render_home_message(home: Home, agency_name: str) -> str:
+    display_address = apns.DEDUP_SUFFIX_RE.sub("", home.address)
+    message = f"{meta.HOUSE_EMOJI} {display_address}, {home.city}\n"
+    message += f"{meta.EURO_EMOJI} €{home.price}/m\n"
+    if home.sqm > 0:
+        message += f"{meta.SQM_EMOJI} {home.sqm} m\u00b2\n"
+    message += "\n"
+    message = meta.escape_markdownv2(message)
+    message += f"{meta.LINK_EMOJI} [{agency_name}]({home.url})"
+    return message
+
+
+def _fetch_candidate_subscribers(homes: list[Home]) -> list[dict]:
+    # Let Postgres narrow subscribers down to the batch's cities, agencies and price range
+    # through the GIN indexes on the jsonb filters; the matcher does the exact per-home match.
+    query = f"""
+        SELECT {BROADCAST_SUBSCRIBER_COLUMNS}
+        FROM hestia.subscribers
+        WHERE (telegram_enabled = true OR apns_token IS NOT NULL)
+        AND filter_cities ?| %s
+        AND filter_agencies ?| %s
+        AND filter_min_price <= %s
+        AND filter_max_price >= %s
+    """
+    if db.get_dev_mode():
+        query += " AND user_level > 1"
+    return db.fetch_all(query, [
+        sorted({home.city.lower() for home in homes}),
+        sorted({home.agency for home in homes}),
+        max(home.price for home in homes),
+        min(home.price for home in homes),
+    ])
+
+
+def _build_notifications(homes: list[Home]) -> list[delivery.Notification]:
+    if not homes:
+        return []
+    subs = _fetch_candidate_subscribers(homes)
+
+    # Index subscribers once, so every home only visits the subscribers that can match it
+    matcher = SubscriberMatcher(subs)
+    notifications: list[delivery.Notification] = []
     for home in homes:
-        for sub in subs:
-            # Apply filters
-            price_ok = (home.price >= sub["filter_min_price"] and home.price <= sub["filter_max_price"])
-            sqm_ok = (sub["filter_min_sqm"] == 0) or (home.sqm == -1) or (home.sqm >= sub["filter_min_sqm"])
-            if price_ok and sqm_ok and home.city.lower() in sub["filter_cities"] and home.agency in sub["filter_agencies"]:
-                display_address = apns.DEDUP_SUFFIX_RE.sub("", home.address)
-                message = f"{meta.HOUSE_EMOJI} {display_address}, {home.city}\n"
-                message += f"{meta.EURO_EMOJI} €{home.price}/m\n"
-                if home.sqm > 0:
-                    message += f"{meta.SQM_EMOJI} {home.sqm} m\u00b2\n"
-                message += "\n"
-                message = meta.escape_markdownv2(message)
-                agency_name = _get_agency_pretty_name()
-                message += f"{meta.LINK_EMOJI} [{agency_name}]({home.url})"
-
-                if sub.get("telegram_enabled") and sub.get("telegram_id"):
-                    try:
-                        await meta.BOT.send_message(text=message, chat_id=sub["telegram_id"], parse_mode="MarkdownV2")
-                    except Forbidden as e:
-                        # This means the user deleted their account or blocked the bot, so disable them
-                        db.disable_user(sub["telegram_id"])
-                        logger.info(
-                            f"Removed subscriber with Telegram id {str(sub['telegram_id'])} due to broadcast failure: {repr(e)}"
-                        )
-                    except Exception as e:
-                        # Log any other exceptions
-                        logger.warning(f"Failed to broadcast to {sub['telegram_id']}: {repr(e)}")
-
-                apns_token = sub.get("apns_token")
-                if not apns_token or not apns_client.enabled:
-                    continue
-
-                payload = apns.build_home_notification_payload(home, agency_name)
-                result = None
-                for attempt in range(1, APNS_MAX_RETRIES + 1):
-                    result = apns_client.send(apns_token, payload)
-                    if result.ok:
-                        _increment_scraper_metric("apns", "success")
-                        logger.debug(
-                            "APNs send success subscriber_id=%s device_id=%s",
-                            str(sub.get("id")),
-                            str(sub.get("device_id")),
-                        )
-                        break
-                    if not result.should_retry or attempt == APNS_MAX_RETRIES:
-                        break
-                    backoff_seconds = APNS_RETRY_BASE_SECONDS * (2 ** (attempt - 1))
-                    sleep(backoff_seconds)
-
-                if result is None or result.ok:
-                    continue
-
-                logger.warning(
-                    "APNs send failure subscriber_id=%s device_id=%s status=%s reason=%s retryable=%s",
-                    str(sub.get("id")),
-                    str(sub.get("device_id")),
-                    str(result.status_code),
-                    result.reason,
-                    str(result.should_retry),
+        subs_for_home = matcher.match(home)
+        if not subs_for_home:
+            continue
+
+        # Everything below is the same for every subscriber, so render it once per home.
+        # The Telegram text is not localized, one rendering serves all languages.
+        home_key = f"{home.url}|{'|'.join(home.dedup_key)}"
+        agency_name = _get_agency_pretty_name(home.agency)
+        telegram_payload = {"text": _render_home_message(home, agency_name), "parse_mode": "MarkdownV2"}
+        apns_payload = None
+
+        for sub in subs_for_home:
+            if sub.get("telegram_enabled") and sub.get("telegram_id"):
+                notifications.append(delivery.Notification(
+                    "telegram",
+                    sub["telegram_id"],
+                    telegram_payload,
+                    delivery.Notification.make_idempotency_key("telegram", sub["telegram_id"], home_key),
+                    subscriber_id=sub.get("id"),
+                ))
+
+            if sub.get("apns_token") and apns.CLIENT.enabled:
+                if apns_payload is None:
+                    apns_payload = apns.build_home_notification_payload(home, agency_name)
+                notifications.append(delivery.Notification(
+                    "apns",
+                    sub["apns_token"],
+                    apns_payload,
+                    delivery.Notification.make_idempotency_key("apns", sub["apns_token"], home_key),
+                    subscriber_id=sub.get("id"),
+                    device_id=sub.get("device_id"),
+                ))
+
+    return notifications
+
+
+async def deliver_notifications(notifications: list[delivery.Notification]) -> list[tuple[str, str]]:
+    """Send notifications and handle blocked chats and invalid device tokens.
+
+    Returns an (outcome, error) pair per notification, outcome being sent, retry or failed.
+    """
+    telegram = [(i, n) for i, n in enumerate(notifications) if n.channel == "telegram"]
+    ios = [(i, n) for i, n in enumerate(notifications) if n.channel == "apns"]
+    outcomes: list[tuple[str, str]] = [("failed", "unknown channel")] * len(notifications)
+    apns_invalid_counts: dict[int, int] = {}
+
+    messages = []
+    for _, n in telegram:
+        send_kwargs = {k: v for k, v in n.payload.items() if k != "text"}
+        messages.append(delivery.OutgoingMessage(n.target, n.payload["text"], send_kwargs))
+
+    # Notifications for the same home share one payload, serialize each only once
+    encoded_payloads: dict[int, bytes] = {}
+    for _, n in ios:
+        if id(n.payload) not in encoded_payloads:
+            encoded_payloads[id(n.payload)] = json.dumps(n.payload).encode()
+
+    # Telegram messages and iOS pushes go out concurrently, each within its own limits
+    telegram_results, apns_results = await asyncio.gather(
+        delivery.get_engine(meta.BOT).send_many(messages),
+        apns.CLIENT.send_batch(
+            [(n.target, encoded_payloads[id(n.payload)]) for _, n in ios],
+            max_retries=APNS_MAX_RETRIES,
+            retry_base_seconds=APNS_RETRY_BASE_SECONDS,
+        ),
+    )
+
+    disabled_chats = set()
+    for (i, n), result in zip(telegram, telegram_results):
+        if result.ok:
+            outcomes[i] = ("sent", "")
+        elif result.forbidden:
+            # This means the user deleted their account or blocked the bot, so disable them
+            outcomes[i] = ("failed", result.error)
+            if n.target not in disabled_chats:
+                disabled_chats.add(n.target)
+                db.disable_user(n.target)
+                logger.info(f"Removed subscriber with Telegram id {str(n.target)} due to broadcast failure: {result.error}")
+        else:
+            # Log any other exceptions
+            outcomes[i] = ("retry", result.error)
+            logger.warning(f"Failed to broadcast to {n.target}: {result.error}")
+
+    for (i, n), result in zip(ios, apns_results):
+        if result.ok:
+            outcomes[i] = ("sent", "")
+            _increment_scraper_metric("apns", "success")
+            logger.debug(
+                "APNs send success subscriber_id=%s device_id=%s",
+                str(n.subscriber_id),
+                str(n.device_id),
+            )
+            continue
+
+        outcomes[i] = ("retry" if result.should_retry else "failed", result.reason or str(result.status_code))
+        logger.warning(
+            "APNs send failure subscriber_id=%s device_id=%s status=%s reason=%s retryable=%s",
+            str(n.subscriber_id),
+            str(n.device_id),
+            str(result.status_code),
+            result.reason,
+            str(result.should_retry),
+        )
+        _increment_scraper_metric("apns", "failure")
+
+        if result.permanent_invalid and n.subscriber_id is not None:
+            sub_id = int(n.subscriber_id)
+            apns_invalid_counts[sub_id] = apns_invalid_counts.get(sub_id, 0) + 1
+            if apns_invalid_counts[sub_id] >= APNS_INVALID_TOKEN_THRESHOLD:
+                db.clear_apns_token(sub_id)
+                logger.info(
+                    "Cleared APNs token for subscriber_id=%s after invalid token failures=%s",
+                    str(sub_id),
+                    str(apns_invalid_counts[sub_id]),
+                )
+
+    return outcomes
+
+
+async def broadcast(homes: list[Home]) -> None:
+    await deliver_notifications(_build_notifications(homes))
+
+
+async def store_and_broadcast(homes) -> None:
+    """Write the scraped homes and notify subscribers of the ones that are new."""
+    if not NOTIFICATION_OUTBOX:
+        await broadcast(_store_new_homes(homes))
+        return
+    # The homes and their notifications commit together, so a crash or a failed write
+    # can't leave new homes whose notifications were never queued. The dispatcher
+    # delivers them, the scrape doesn't wait for Telegram or APNs.
+    with db.transaction() as conn:
+        new_homes = _store_new_homes(homes, conn)
+        queued = db.enqueue_notifications(_build_notifications(new_homes), conn)
+    logger.info(f"Queued {queued} notifications for {len(new_homes)} new homes")
+
+
+async def dispatch_once() -> int:
+    """Claim one batch from the notification outbox, deliver it and record the outcomes."""
+    rows = db.claim_notifications(DISPATCH_BATCH_SIZE, DISPATCH_LEASE_SECONDS)
+    if not rows:
+        return 0
+    notifications = [
+        delivery.Notification(
+            row["channel"],
+            row["target"],
+            row["payload"],
+            row["idempotency_key"],
+            subscriber_id=row["subscriber_id"],
+            device_id=row["device_id"],
+            outbox_id=row["id"],
+        )
+        for row in rows
+    ]
+    outcomes = await deliver_notifications(notifications)
+    results = [(n.outbox_id, outcome, error) for n, (outcome, error) in zip(notifications, outcomes)]
+    for attempt in range(1, DISPATCH_FINISH_ATTEMPTS + 1):
+        try:
+            db.finish_notifications(results)
+            break
+        except Exception as e:
+            if attempt == DISPATCH_FINISH_ATTEMPTS:
+                sent = sum(1 for _, outcome, _ in results if outcome == "sent")
+                logger.error(
+                    f"Could not record outcomes of {len(results)} notifications, {sent} already sent "
+                    f"will be delivered again when their lease expires: {repr(e)}"
                 )
-                _increment_scraper_metric("apns", "failure")
+                raise
+            logger.warning(f"Recording notification outcomes failed (attempt {attempt}): {repr(e)}")
+            await asyncio.sleep(DISPATCH_FINISH_RETRY_SECONDS * attempt)
+    return len(rows)
+
+
+async def run_dispatcher() -> None:
+    logger.info("Starting notification dispatcher")
+    last_prune = 0.0
+    try:
+        while True:
+            try:
+                claimed = await dispatch_once()
+            except Exception as e:
+                logger.error(f"Dispatcher error: {repr(e)}")
+                claimed = 0
+
+            if time.monotonic() - last_prune > DISPATCH_PRUNE_INTERVAL_SECONDS:
+                db.prune_notifications(retention_days=7)
+                last_prune = time.monotonic()
+
+            # A full batch means there is probably more waiting, keep draining
+            if claimed < DISPATCH_BATCH_SIZE:
+                await asyncio.sleep(DISPATCH_POLL_SECONDS)
+    finally:
+        await apns.CLIENT.aclose()
+
+
+def _store_new_homes(homes, conn=None) -> list[Home]:
+    # Postgres decides which homes are new through the unique dedup key, so we only
+    # send the parsed batch and get the inserted rows back in one round trip
+    homes = list(homes)
+    date_added = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+    inserted = {(row["address"], row["city"]) for row in db.add_homes(homes, date_added, conn)}
+
+    new_homes, seen_keys = [], set()
+    for home in homes:
+        if (home.address, home.city) in inserted and home.dedup_key not in seen_keys:
+            seen_keys.add(home.dedup_key)
+            new_homes.append(home)
+    return new_homes
 
-                if result.permanent_invalid and sub.get("id") is not None:
-                    sub_id = int(sub["id"])
-                    apns_invalid_counts[sub_id] = apns_invalid_counts.get(sub_id, 0) + 1
-                    if apns_invalid_counts[sub_id] >= APNS_INVALID_TOKEN_THRESHOLD:
-                        db.clear_apns_token(sub_id)
-                        logger.info(
-                            "Cleared APNs token for subscriber_id=%s after invalid token failures=%s",
-                            str(sub_id),
-                            str(apns_invalid_counts[sub_id]),
-                        )
+
+def _collect_homes(scrape, target: dict) -> list[Home]:
+    return list(scrape(target))
 
 
 async def scrape_site(target: dict) -> None:
@@ -288,86 +627,54 @@ async def scrape_site(target: dict) -> None:
         if not HAS_IKWILHUREN_SCRAPER:
             logger.warning("ikwilhuren scraper module not found, skipping")
             return
-        new_homes = []
-        prev_homes = [
-            Home(home["address"], home["city"])
-            for home in db.fetch_all("SELECT address, city FROM hestia.homes WHERE date_added > now() - interval '180 day'")
-        ]
-        for home in scrape_ikwilhuren(target):
-            if home not in prev_homes:
-                new_homes.append(home)
-        for home in new_homes:
-            db.add_home(home.url, home.address, home.city, home.price, home.agency, datetime.now(timezone.utc).replace(tzinfo=None).isoformat(), home.sqm)
-        await broadcast(new_homes)
+        # The private scrapers are blocking, keep them off the event loop
+        await store_and_broadcast(await asyncio.to_thread(_collect_homes, scrape_ikwilhuren, target))
 
     elif target["agency"] == "pararius":
         if not HAS_PARARIUS_SCRAPER:
             logger.warning("Pararius scraper module not found, skipping")
             return
-        new_homes = []
-        prev_homes = [
-            Home(home["address"], home["city"])
-            for home in db.fetch_all("SELECT address, city FROM hestia.homes WHERE date_added > now() - interval '180 day'")
-        ]
-        for home in scrape_pararius(target):
-            if home not in prev_homes:
-                new_homes.append(home)
-        for home in new_homes:
-            db.add_home(home.url, home.address, home.city, home.price, home.agency, datetime.now(timezone.utc).replace(tzinfo=None).isoformat(), home.sqm)
-        await broadcast(new_homes)
+        # The private scrapers are blocking, keep them off the event loop
+        await store_and_broadcast(await asyncio.to_thread(_collect_homes, scrape_pararius, target))
 
     elif target["agency"] == "athome":
         if not HAS_ATHOME_SCRAPER:
             logger.warning("At Home scraper module not found, skipping")
             return
-        new_homes = []
-        prev_homes = [
-            Home(home["address"], home["city"])
-            for home in db.fetch_all("SELECT address, city FROM hestia.homes WHERE date_added > now() - interval '180 day'")
-        ]
-        for home in scrape_athome(target):
-            if home not in prev_homes:
-                new_homes.append(home)
-        for home in new_homes:
-            db.add_home(home.url, home.address, home.city, home.price, home.agency, datetime.now(timezone.utc).replace(tzinfo=None).isoformat(), home.sqm)
-        await broadcast(new_homes)
+        # The private scrapers are blocking, keep them off the event loop
+        await store_and_broadcast(await asyncio.to_thread(_collect_homes, scrape_athome, target))
 
     else:
         if target["method"] == "GET":
-            r = requests.get(target["queryurl"], headers=target["headers"])
+            r = await http_client.CLIENT.get(target["queryurl"], headers=target["headers"])
         elif target["method"] == "POST":
-            r = requests.post(target["queryurl"], json=target["post_data"], headers=target["headers"])
+            r = await http_client.CLIENT.post(target["queryurl"], json=target["post_data"], headers=target["headers"])
         elif target["method"] == "POST_NDJSON":
             post_data = "\n".join(json.dumps(obj, separators=(",", ":")) for obj in target["post_data"]) + "\n"
-            r = requests.post(target["queryurl"], data=post_data, headers=target["headers"])
+            r = await http_client.CLIENT.post(target["queryurl"], content=post_data, headers=target["headers"])
         else:
             raise ValueError(f"Unknown method {target['method']} for target id {target['id']}")
             
         if r.status_code == 200:
-            prev_homes: list[Home] = []
-            new_homes: list[Home] = []
-            
-            # Check retrieved homes against previously scraped homes (of the last 6 months)
-            for home in db.fetch_all("SELECT address, city FROM hestia.homes WHERE date_added > now() - interval '180 day'"):
-                prev_homes.append(Home(home["address"], home["city"]))
-            for home in HomeResults(target["agency"], r):
-                if home not in prev_homes:
-                    new_homes.append(home)
-
-            # Write new homes to database
-            for home in new_homes:
-                db.add_home(home.url,
-                            home.address,
-                            home.city,
-                            home.price,
-                            home.agency,
-                            datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
-                            home.sqm)
-
-            await broadcast(new_homes)
+            # Sources that page their results get the other pages fetched here, not in the parser
+            pages = await asyncio.gather(*(
+                http_client.CLIENT.get(url, headers=target["headers"])
+                for url in HomeResults.page_urls(target["agency"], r)
+            ))
+            # Write retrieved homes to the database, skipping the ones seen in the last 6 months
+            await store_and_broadcast(HomeResults(target["agency"], r, list(pages)))
         else:
             raise ConnectionError(f"Got a non-OK status code: {r.status_code}")
     
 
 if __name__ == '__main__':
-    run(main())
+    # The scrapers may start before the bot, so they bring the schema up to date too
+    migrations.apply_on_startup()
+    if "--daemon" in sys.argv[1:]:
+        run(run_daemon())
+    elif "--dispatch" in sys.argv[1:]:
+        run(run_dispatcher())
+    elif "--maintenance" in sys.argv[1:]:
+        run(_run_maintenance_schedule())
+    else:
+        run(main())
@@ -0,0 +1,37 @@
+# Benchmark for the scraper's dedup of fetched homes against the last 180 days of history.
+# Run from the repo root: python3 misc/bench_dedup.py [history_size]
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "hestia"))
+
+from hestia_utils.parser import Home
+
+CITIES = ["Amsterdam", "Rotterdam", "Den Haag", "Utrecht", "Eindhoven", "Groningen", "Tilburg", "Almere"]
+
+
+def main() -> None:
+    history_size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rows = [{"address": f"Straat {i}", "city": random.choice(CITIES)} for i in range(history_size)]
+    fetched = [Home(f"Straat {random.randrange(history_size * 2)}", random.choice(CITIES)) for _ in range(50)]
+
+    start = time.perf_counter()
+    prev_homes = [Home(row["address"], row["city"]) for row in rows]
+    old_new = [home for home in fetched if home not in prev_homes]
+    old_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    known_keys = {Home.make_dedup_key(row["address"], row["city"]) for row in rows}
+    new_new = [home for home in fetched if home.dedup_key not in known_keys]
+    new_seconds = time.perf_counter() - start
+
+    assert old_new == new_new
+    print(f"history={history_size} fetched={len(fetched)} new={len(new_new)}")
+    print(f"list scan:  {old_seconds * 1000:.1f} ms")
+    print(f"set lookup: {new_seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Benchmark for matching new homes against subscriber filters in broadcast().
+# Run from the repo root: python3 misc/bench_matcher.py [subscriber_count] [home_count]
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "hestia"))
+
+from hestia_utils.parser import Home
+from hestia_utils.matcher import SubscriberMatcher
+
+CITIES = ["amsterdam", "rotterdam", "den haag", "utrecht", "eindhoven", "groningen", "tilburg", "almere",
+          "breda", "nijmegen", "haarlem", "arnhem", "enschede", "amersfoort", "zwolle", "leiden", "delft"]
+AGENCIES = ["rebo", "vesteda", "funda", "pararius", "hexia", "woningnet", "vbt", "ikwilhuren", "athome", "roofz"]
+
+
+def main() -> None:
+    sub_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    home_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    subs = []
+    for i in range(sub_count):
+        low = random.randrange(0, 2000, 50)
+        subs.append({
+            "id": i,
+            "filter_min_price": low,
+            "filter_max_price": low + random.randrange(250, 2500, 50),
+            "filter_cities": random.sample(CITIES, random.randint(1, 4)),
+            "filter_agencies": AGENCIES if random.random() < 0.7 else random.sample(AGENCIES, 3),
+            "filter_min_sqm": random.choice([0, 0, 0, 30, 50, 70]),
+        })
+    homes = [Home(f"Straat {i}", random.choice(CITIES).title(), agency=random.choice(AGENCIES),
+                  price=random.randrange(700, 3000, 25), sqm=random.choice([-1, 35, 60, 90])) for i in range(home_count)]
+
+    start = time.perf_counter()
+    old_matches = []
+    for home in homes:
+        for sub in subs:
+            price_ok = (home.price >= sub["filter_min_price"] and home.price <= sub["filter_max_price"])
+            sqm_ok = (sub["filter_min_sqm"] == 0) or (home.sqm == -1) or (home.sqm >= sub["filter_min_sqm"])
+            if price_ok and sqm_ok and home.city.lower() in sub["filter_cities"] and home.agency in sub["filter_agencies"]:
+                old_matches.append(sub["id"])
+    old_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = SubscriberMatcher(subs)
+    build_seconds = time.perf_counter() - start
+    new_matches = [sub["id"] for home in homes for sub in matcher.match(home)]
+    new_seconds = time.perf_counter() - start
+
+    assert old_matches == new_matches
+    print(f"subscribers={sub_count} homes={len(homes)} matches={len(new_matches)}")
+    print(f"nested loop:   {old_seconds * 1000:.1f} ms")
+    print(f"indexed match: {new_seconds * 1000:.1f} ms ({build_seconds * 1000:.1f} ms building the index, "
+          f"{(new_seconds - build_seconds) * 1000 / len(homes):.1f} ms per home)")
+
+
+if __name__ == "__main__":
+    main()
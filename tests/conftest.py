@@ -36,14 +36,14 @@ import telegram
 telegram.Bot = MagicMock()
 
 import pytest
-import requests
+import httpx
 
 
 @pytest.fixture
 def mock_response():
-    """Factory fixture that creates mock requests.models.Response objects."""
+    """Factory fixture that creates mock httpx.Response objects."""
     def _make(content, status_code=200):
-        r = MagicMock(spec=requests.models.Response)
+        r = MagicMock(spec=httpx.Response)
         # Commonly used by parsers for content-type sniffing.
         r.headers = {}
         if isinstance(content, dict) or isinstance(content, list):
@@ -0,0 +1,92 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from hestia_utils.apns import APNsClient
+
+
+def _run(coro):
+    # Use a private loop so the module-level event loop other tests rely on stays untouched
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def _client(handler) -> APNsClient:
+    client = APNsClient(transport=httpx.MockTransport(handler))
+    client._get_bearer_token = lambda: "test-bearer"
+    client._base_url = lambda: "https://api.sandbox.push.apple.com"
+    return client
+
+
+@patch("hestia_utils.apns.secrets.APNS", {"bundle_id": "nl.hestia.app"}, create=True)
+@patch("hestia_utils.apns._is_configured", return_value=True)
+class TestAPNsClient:
+    def test_send_batch_returns_results_in_order(self, _):
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/bad"):
+                return httpx.Response(410, json={"reason": "Unregistered"})
+            return httpx.Response(200)
+
+        client = _client(handler)
+        results = _run(client.send_batch([("good", {}), ("bad", {}), ("good2", {})]))
+
+        assert [r.ok for r in results] == [True, False, True]
+        assert results[1].permanent_invalid
+        assert not results[1].should_retry
+
+    def test_reuses_one_connection_client(self, _):
+        client = _client(lambda request: httpx.Response(200))
+
+        async def send_twice():
+            await client.send("a", {})
+            first = client._client
+            await client.send("b", {})
+            assert client._client is first
+            await client.aclose()
+
+        _run(send_twice())
+        assert client._client is None
+
+    def test_client_moves_to_a_new_loop(self, _):
+        async def handler(request: httpx.Request) -> httpx.Response:
+            # Yields, so the sends contend for the stream and bind it to the running loop
+            await asyncio.sleep(0.01)
+            return httpx.Response(200)
+
+        client = APNsClient(max_concurrent_streams=1, transport=httpx.MockTransport(handler))
+        client._get_bearer_token = lambda: "test-bearer"
+        client._base_url = lambda: "https://api.sandbox.push.apple.com"
+
+        for _ in range(2):
+            results = _run(client.send_batch([("a", {}), ("b", {}), ("c", {})]))
+            assert all(r.ok for r in results)
+
+    def test_retries_transient_errors_without_blocking(self, _):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            if len(calls) == 1:
+                return httpx.Response(429, json={"reason": "TooManyRequests"})
+            return httpx.Response(200)
+
+        client = _client(handler)
+        with patch("hestia_utils.apns.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            results = _run(client.send_batch([("token", {})], max_retries=3, retry_base_seconds=0.5))
+
+        assert results[0].ok
+        assert len(calls) == 2
+        mock_sleep.assert_awaited_once_with(0.5)
+
+    def test_gives_up_after_max_retries(self, _):
+        client = _client(lambda request: httpx.Response(503))
+
+        results = _run(client.send_batch([("token", {})], max_retries=2, retry_base_seconds=0))
+
+        assert not results[0].ok
+        assert results[0].should_retry
+        assert results[0].status_code == 503
@@ -1,3 +1,4 @@
+import pytest
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 
@@ -145,6 +146,49 @@ class TestGetUserLang:
         assert db.get_user_lang(444) == "en"
 
 
+class TestFilterCatalog:
+    def setup_method(self):
+        db.FILTER_CATALOG = {}
+
+    @staticmethod
+    def _fetch_all(query, params=None):
+        if "hestia.cities" in query:
+            return [{"city": "utrecht"}, {"city": "amsterdam"}]
+        return [{"agency": "agency1", "user_info": {"agency": "Agency One"}}]
+
+    @patch('hestia_utils.db.fetch_all')
+    @patch('hestia_utils.db.fetch_one')
+    def test_loads_sorted_cities_and_agencies(self, mock_fetch_one, mock_fetch_all):
+        mock_fetch_one.return_value = {"version": 1}
+        mock_fetch_all.side_effect = self._fetch_all
+        assert db.get_filter_cities() == ["amsterdam", "utrecht"]
+        assert [row["agency"] for row in db.get_filter_agencies()] == ["agency1"]
+
+    @patch('hestia_utils.db.fetch_all')
+    @patch('hestia_utils.db.fetch_one')
+    def test_reloads_only_when_version_changes(self, mock_fetch_one, mock_fetch_all):
+        mock_fetch_one.return_value = {"version": 1}
+        mock_fetch_all.side_effect = self._fetch_all
+        db.get_filter_cities()
+        db.get_filter_agencies()
+        assert mock_fetch_all.call_count == 2
+
+        mock_fetch_one.return_value = {"version": 2}
+        db.get_filter_cities()
+        assert mock_fetch_all.call_count == 4
+
+    @patch('hestia_utils.db.fetch_all')
+    @patch('hestia_utils.db.fetch_one')
+    def test_does_not_cache_failed_reads(self, mock_fetch_one, mock_fetch_all):
+        mock_fetch_one.return_value = {"version": 1}
+        mock_fetch_all.return_value = []
+        assert db.get_filter_cities() == []
+
+        mock_fetch_all.return_value = None
+        mock_fetch_all.side_effect = self._fetch_all
+        assert db.get_filter_cities() == ["amsterdam", "utrecht"]
+
+
 class TestWriteActions:
     @patch('hestia_utils.db._write')
     def test_add_home(self, mock_write):
@@ -162,6 +206,47 @@ class TestWriteActions:
         args = mock_write.call_args[0]
         assert "-1" in args[1]
 
+    @patch('hestia_utils.db._write')
+    def test_add_home_skips_recent_duplicates(self, mock_write):
+        db.add_home("http://example.com", "Kerkstraat 1", "Amsterdam", 1500, "funda", "2024-01-01")
+        query = mock_write.call_args[0][0]
+        assert "ON CONFLICT (dedup_key)" in query
+
+    @patch('hestia_utils.db.execute_values')
+    @patch('hestia_utils.db.get_connection')
+    def test_add_homes_batches_and_returns_inserted(self, mock_conn, mock_execute_values):
+        from hestia_utils.parser import Home
+        mock_execute_values.return_value = [{"address": "Kerkstraat 1", "city": "Amsterdam"}]
+        homes = [
+            Home(address="Kerkstraat 1", city="Amsterdam", url="http://a", agency="funda", price=1500, sqm=75),
+            Home(address="Dorpsweg 5", city="Rotterdam", url="http://b", agency="funda", price=1200),
+        ]
+
+        rows = db.add_homes(homes, "2024-01-01T00:00:00")
+
+        assert rows == [{"address": "Kerkstraat 1", "city": "Amsterdam"}]
+        mock_execute_values.assert_called_once()
+        query = mock_execute_values.call_args[0][1]
+        assert "ON CONFLICT (dedup_key)" in query
+        assert "RETURNING address, city" in query
+        assert len(mock_execute_values.call_args[0][2]) == 2
+        mock_conn.return_value.commit.assert_called_once()
+
+    @patch('hestia_utils.db.execute_values', side_effect=db.psycopg2.OperationalError("gone"))
+    @patch('hestia_utils.db.get_connection')
+    def test_add_homes_failure_raises_and_rolls_back(self, mock_conn, _mock_execute_values):
+        from hestia_utils.parser import Home
+
+        with pytest.raises(db.psycopg2.OperationalError):
+            db.add_homes([Home(address="Kerkstraat 1", city="Amsterdam", agency="funda")], "2024-01-01T00:00:00")
+        mock_conn.return_value.rollback.assert_called_once()
+        mock_conn.return_value.commit.assert_not_called()
+
+    @patch('hestia_utils.db.get_connection')
+    def test_add_homes_empty_batch_skips_database(self, mock_conn):
+        assert db.add_homes([], "2024-01-01T00:00:00") == []
+        mock_conn.assert_not_called()
+
     @patch('hestia_utils.db._write')
     def test_add_user(self, mock_write):
         db.add_user(12345)
@@ -257,3 +342,182 @@ class TestLinkAccount:
         mock_get_conn.return_value = mock_conn
         result = db.link_account(12345, "ABCD")
         assert result == "already_linked"
+
+
+class TestConnectionPool:
+    def _fake_connect(self):
+        conn = MagicMock()
+        conn.closed = 0
+        conn.get_transaction_status.return_value = db.TRANSACTION_STATUS_IDLE
+        return conn
+
+    def test_reuses_released_connection(self):
+        connect = MagicMock(side_effect=self._fake_connect)
+        pool = db.ConnectionPool(min_size=0, max_size=2, connect=connect)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        assert pool.getconn() is conn
+        assert connect.call_count == 1
+        assert pool.stats()["checkouts"] == 2
+
+    def test_drops_closed_connection(self):
+        connect = MagicMock(side_effect=self._fake_connect)
+        pool = db.ConnectionPool(min_size=0, max_size=2, connect=connect)
+        conn = pool.getconn()
+        conn.closed = 2  # psycopg2 marks the connection closed after losing the server
+        pool.putconn(conn)
+        assert pool.getconn() is not conn
+        assert connect.call_count == 2
+
+    def test_rolls_back_open_transaction_on_release(self):
+        pool = db.ConnectionPool(min_size=0, max_size=1, connect=self._fake_connect)
+        conn = pool.getconn()
+        conn.get_transaction_status.return_value = db.psycopg2.extensions.TRANSACTION_STATUS_INERROR
+        pool.putconn(conn)
+        conn.rollback.assert_called_once()
+
+    @patch('hestia_utils.db.POOL_HEALTHCHECK_IDLE_SECONDS', 0)
+    def test_replaces_connection_failing_health_check(self):
+        pool = db.ConnectionPool(min_size=0, max_size=1, connect=self._fake_connect)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = db.psycopg2.OperationalError()
+        assert pool.getconn() is not conn
+        assert pool.stats()["reconnects"] == 1
+
+    def test_times_out_when_exhausted(self):
+        pool = db.ConnectionPool(min_size=0, max_size=1, wait_timeout=0.01, connect=self._fake_connect)
+        pool.getconn()
+        with pytest.raises(db.PoolError):
+            pool.getconn()
+        stats = pool.stats()
+        assert stats["timeouts"] == 1
+        assert stats["in_use"] == 1
+
+    def test_release_closes_unpooled_connection(self):
+        conn = MagicMock()
+        db.release_connection(conn)
+        conn.close.assert_called_once()
+
+
+class TestNotificationOutbox:
+    @patch('hestia_utils.db._insert_values')
+    @patch('hestia_utils.db.get_connection')
+    def test_enqueue_skips_duplicate_keys(self, mock_conn, mock_insert_values):
+        from hestia_utils.delivery import Notification
+        mock_insert_values.return_value = [{"id": 1}]
+        n = Notification("telegram", 111, {"text": "hi"}, "key", subscriber_id=7)
+
+        assert db.enqueue_notifications([n, n]) == 1
+        query, rows = mock_insert_values.call_args[0][1:3]
+        assert "ON CONFLICT (idempotency_key) DO NOTHING" in query
+        assert rows[0][:4] == ("key", "telegram", "111", 7)
+        mock_conn.return_value.commit.assert_called_once()
+
+    @patch('hestia_utils.db._insert_values')
+    def test_enqueue_joins_the_callers_transaction(self, mock_insert_values):
+        from hestia_utils.delivery import Notification
+        conn = MagicMock()
+
+        db.enqueue_notifications([Notification("telegram", 111, {"text": "hi"}, "key")], conn)
+
+        assert mock_insert_values.call_args[0][0] is conn
+        conn.commit.assert_not_called()
+
+    @patch('hestia_utils.db._write_returning')
+    def test_claim_uses_skip_locked(self, mock_write_returning):
+        db.claim_notifications(100, 300)
+        query, params = mock_write_returning.call_args[0]
+        assert "FOR UPDATE SKIP LOCKED" in query
+        assert params == [100, 300]
+
+    @patch('hestia_utils.db._write_returning')
+    def test_claim_fails_leases_that_keep_expiring(self, mock_write_returning):
+        db.claim_notifications(100, 300)
+        query = mock_write_returning.call_args[0][0]
+        assert f"locked_until < now() AND attempts < {db.NOTIFICATION_MAX_ATTEMPTS}" in query
+        assert "SET status = 'failed'" in query
+
+    @patch('hestia_utils.db._insert_values')
+    @patch('hestia_utils.db.release_connection')
+    @patch('hestia_utils.db.get_connection')
+    def test_finish_caps_retries(self, mock_get_conn, mock_release, mock_insert_values):
+        db.finish_notifications([(1, "retry", "timeout")])
+        query = mock_insert_values.call_args[0][1]
+        assert f"o.attempts < {db.NOTIFICATION_MAX_ATTEMPTS}" in query
+        mock_get_conn.return_value.commit.assert_called_once()
+
+    @patch('hestia_utils.db._insert_values')
+    @patch('hestia_utils.db.release_connection')
+    @patch('hestia_utils.db.get_connection')
+    def test_finish_failure_raises(self, mock_get_conn, mock_release, mock_insert_values):
+        mock_insert_values.side_effect = Exception("connection lost")
+
+        with pytest.raises(Exception, match="connection lost"):
+            db.finish_notifications([(1, "sent", "")])
+        mock_get_conn.return_value.rollback.assert_called_once()
+
+
+
+class TestHomesPartitions:
+    @patch('hestia_utils.db.fetch_all')
+    def test_partitions_sorted_and_default_skipped(self, mock_fetch_all):
+        mock_fetch_all.return_value = [{"name": "homes_y2026m02"}, {"name": "homes_default"}, {"name": "homes_y2025m12"}]
+        assert [name for name, _ in db.get_homes_partitions()] == ["homes_y2025m12", "homes_y2026m02"]
+
+    @patch('hestia_utils.db.release_connection')
+    @patch('hestia_utils.db.get_connection')
+    def test_archive_copies_before_detaching(self, mock_get_conn, mock_release, tmp_path):
+        mock_conn, mock_cursor = _mock_connection()
+        mock_get_conn.return_value = mock_conn
+        mock_cursor.copy_expert.side_effect = lambda query, f: f.write("url,address\n")
+
+        path = db.archive_homes_partition("homes_y2024m01", str(tmp_path))
+
+        assert path == str(tmp_path / "homes_y2024m01.csv.gz")
+        queries = [c[0][0] for c in mock_cursor.execute.call_args_list]
+        assert queries == [
+            "ALTER TABLE hestia.homes DETACH PARTITION hestia.homes_y2024m01",
+            "DROP TABLE hestia.homes_y2024m01",
+        ]
+        mock_conn.commit.assert_called_once()
+
+    @patch('hestia_utils.db.release_connection')
+    @patch('hestia_utils.db.get_connection')
+    def test_archive_failure_keeps_partition(self, mock_get_conn, mock_release, tmp_path):
+        mock_conn, mock_cursor = _mock_connection()
+        mock_get_conn.return_value = mock_conn
+        mock_cursor.copy_expert.side_effect = OSError("disk full")
+
+        with pytest.raises(OSError):
+            db.archive_homes_partition("homes_y2024m01", str(tmp_path))
+
+        mock_cursor.execute.assert_not_called()
+        mock_conn.rollback.assert_called_once()
+        mock_release.assert_called_once_with(mock_conn)
+
+    @patch('hestia_utils.db.release_connection')
+    @patch('hestia_utils.db.get_connection')
+    def test_ensure_partitions_returns_created_months(self, mock_get_conn, mock_release):
+        mock_conn, mock_cursor = _mock_connection(rows=[{"month": "2026-12"}])
+        mock_get_conn.return_value = mock_conn
+
+        assert db.ensure_homes_partitions(months_ahead=3) == ["2026-12"]
+        assert mock_cursor.execute.call_args[0][1] == [3]
+        mock_conn.commit.assert_called_once()
+
+    @patch('hestia_utils.db.release_connection')
+    @patch('hestia_utils.db.get_connection')
+    def test_ensure_partitions_failure_raises(self, mock_get_conn, mock_release):
+        mock_conn, mock_cursor = _mock_connection(side_effect=Exception("permission denied"))
+        mock_get_conn.return_value = mock_conn
+
+        with pytest.raises(Exception, match="permission denied"):
+            db.ensure_homes_partitions()
+
+        mock_conn.rollback.assert_called_once()
+        mock_release.assert_called_once_with(mock_conn)
+
+    def test_archive_rejects_other_tables(self):
+        with pytest.raises(ValueError):
+            db.archive_homes_partition("subscribers", None)
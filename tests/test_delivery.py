@@ -0,0 +1,100 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+from telegram.error import Forbidden, RetryAfter
+
+from hestia_utils.delivery import OutgoingMessage, TelegramDelivery
+
+
+def _run(coro):
+    # Use a private loop so the module-level event loop other tests rely on stays untouched
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class _SlowBot:
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        self.sent.append((chat_id, text, kwargs))
+
+
+class TestTelegramDelivery:
+    def test_sends_concurrently(self):
+        bot = _SlowBot()
+        engine = TelegramDelivery(bot, rate=1000, per_chat_interval=0)
+        messages = [OutgoingMessage(i, "hi", {"parse_mode": "MarkdownV2"}) for i in range(20)]
+
+        started = time.monotonic()
+        results = _run(engine.send_many(messages))
+
+        assert all(r.ok for r in results)
+        assert bot.peak > 1
+        assert time.monotonic() - started < 20 * bot.delay
+        assert bot.sent[0][2] == {"parse_mode": "MarkdownV2"}
+
+    def test_concurrency_bounded_by_workers(self):
+        bot = _SlowBot(delay=0.01)
+        engine = TelegramDelivery(bot, rate=1000, per_chat_interval=0, workers=4)
+        messages = [OutgoingMessage(i, str(i)) for i in range(40)]
+
+        results = _run(engine.send_many(messages))
+
+        assert [r.message for r in results] == messages
+        assert all(r.ok for r in results)
+        assert bot.peak == 4
+
+    def test_global_rate_limit(self):
+        bot = _SlowBot(delay=0)
+        engine = TelegramDelivery(bot, rate=50, per_chat_interval=0)
+        engine._bucket._tokens = 0
+
+        started = time.monotonic()
+        _run(engine.send_many([OutgoingMessage(i, "hi") for i in range(10)]))
+
+        assert time.monotonic() - started >= 9 / 50
+
+    def test_same_chat_in_order_and_spaced(self):
+        bot = _SlowBot(delay=0)
+        engine = TelegramDelivery(bot, rate=1000, per_chat_interval=0.05)
+
+        started = time.monotonic()
+        _run(engine.send_many([OutgoingMessage(1, str(i)) for i in range(3)]))
+
+        assert [text for _, text, _ in bot.sent] == ["0", "1", "2"]
+        assert time.monotonic() - started >= 0.1
+        assert engine._chat_locks == {}
+
+    def test_retry_after_pauses_and_retries(self):
+        bot = AsyncMock()
+        bot.send_message.side_effect = [RetryAfter(0.05), None]
+        engine = TelegramDelivery(bot, rate=1000, per_chat_interval=0)
+
+        started = time.monotonic()
+        results = _run(engine.send_many([OutgoingMessage(1, "hi")]))
+
+        assert results[0].ok
+        assert bot.send_message.call_count == 2
+        assert time.monotonic() - started >= 0.05
+
+    def test_reports_forbidden_and_errors(self):
+        bot = AsyncMock()
+        bot.send_message.side_effect = [Forbidden("blocked"), ValueError("boom")]
+        engine = TelegramDelivery(bot, rate=1000, per_chat_interval=0)
+
+        results = _run(engine.send_many([OutgoingMessage(1, "a"), OutgoingMessage(2, "b")]))
+
+        assert results[0].forbidden and not results[0].ok
+        assert not results[1].forbidden and "boom" in results[1].error
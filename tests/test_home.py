@@ -171,3 +171,22 @@ class TestHomeAddressProperty:
         home = Home()
         home.address = "Nieuwe Straat 5"
         assert home.address == "Nieuwe Straat 5"
+
+
+class TestHomeHashing:
+    def test_hash_matches_for_equal_homes(self):
+        a = Home(address="kerkstraat 1", city="amsterdam")
+        b = Home(address="Kerkstraat 1", city="Amsterdam", price=1500)
+        assert hash(a) == hash(b)
+
+    def test_set_lookup(self):
+        homes = {Home(address="Kerkstraat 1", city="Amsterdam")}
+        assert Home(address="KERKSTRAAT 1", city="amsterdam") in homes
+        assert Home(address="Kerkstraat 2", city="Amsterdam") not in homes
+
+    def test_dedup_key_uses_normalized_city(self):
+        home = Home(address="Plein 1", city="'s-Gravenhage")
+        assert home.dedup_key == Home.make_dedup_key("Plein 1", "Den Haag")
+
+    def test_not_equal_to_other_types(self):
+        assert Home(address="Kerkstraat 1", city="Amsterdam") != ("kerkstraat 1", "amsterdam")
@@ -0,0 +1,81 @@
+import asyncio
+
+import httpx
+
+from hestia_utils.http_client import ScrapeClient
+
+
+def _tracking_transport(delay: float = 0.01):
+    state = {"active": {}, "peak": {}, "total_peak": 0, "active_total": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        state["active"][host] = state["active"].get(host, 0) + 1
+        state["active_total"] += 1
+        state["peak"][host] = max(state["peak"].get(host, 0), state["active"][host])
+        state["total_peak"] = max(state["total_peak"], state["active_total"])
+        await asyncio.sleep(delay)
+        state["active"][host] -= 1
+        state["active_total"] -= 1
+        return httpx.Response(200, json={"host": host})
+
+    return httpx.MockTransport(handler), state
+
+
+def _run(coro):
+    # Use a private loop so the module-level event loop other tests rely on stays untouched
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestScrapeClient:
+    def test_per_host_limit(self):
+        transport, state = _tracking_transport()
+        client = ScrapeClient(max_concurrency=10, max_per_host=2, transport=transport)
+
+        async def scenario():
+            await asyncio.gather(*(client.get("https://a.example/") for _ in range(6)))
+            await client.aclose()
+        _run(scenario())
+
+        assert state["peak"]["a.example"] == 2
+
+    def test_global_limit(self):
+        transport, state = _tracking_transport()
+        client = ScrapeClient(max_concurrency=3, max_per_host=5, transport=transport)
+
+        urls = [f"https://host{i}.example/" for i in range(8)]
+        async def scenario():
+            await asyncio.gather(*(client.get(url) for url in urls))
+            await client.aclose()
+        _run(scenario())
+
+        assert state["total_peak"] == 3
+
+    def test_hosts_fetched_concurrently(self):
+        transport, state = _tracking_transport(delay=0.05)
+        client = ScrapeClient(max_concurrency=10, max_per_host=1, transport=transport)
+
+        async def scenario():
+            responses = await asyncio.gather(client.get("https://a.example/"), client.post("https://b.example/", json={}))
+            await client.aclose()
+            return responses
+        responses = _run(scenario())
+
+        assert [r.json()["host"] for r in responses] == ["a.example", "b.example"]
+        assert state["total_peak"] == 2
+
+    def test_client_moves_to_a_new_loop(self):
+        transport, state = _tracking_transport()
+        client = ScrapeClient(max_concurrency=1, max_per_host=1, transport=transport)
+
+        async def scenario():
+            # Contended, so the semaphores bind to the running loop
+            await asyncio.gather(*(client.get("https://a.example/") for _ in range(3)))
+        _run(scenario())
+        _run(scenario())
+
+        assert state["total_peak"] == 1
@@ -0,0 +1,76 @@
+import random
+
+from hestia_utils.matcher import SubscriberMatcher
+from hestia_utils.parser import Home
+
+
+def _sub(sub_id, min_price=0, max_price=5000, cities=("amsterdam",), agencies=("rebo",), min_sqm=0):
+    return {
+        "id": sub_id,
+        "filter_min_price": min_price,
+        "filter_max_price": max_price,
+        "filter_cities": list(cities),
+        "filter_agencies": list(agencies),
+        "filter_min_sqm": min_sqm,
+    }
+
+
+def _brute_force(subs, home):
+    return [
+        sub for sub in subs
+        if sub["filter_min_price"] <= home.price <= sub["filter_max_price"]
+        and (sub["filter_min_sqm"] == 0 or home.sqm == -1 or home.sqm >= sub["filter_min_sqm"])
+        and home.city.lower() in sub["filter_cities"]
+        and home.agency in sub["filter_agencies"]
+    ]
+
+
+class TestSubscriberMatcher:
+    def test_city_is_case_insensitive(self):
+        matcher = SubscriberMatcher([_sub(1)])
+        home = Home(address="Kerkstraat 1", city="Amsterdam", agency="rebo", price=1500)
+        assert [s["id"] for s in matcher.match(home)] == [1]
+
+    def test_price_bounds_are_inclusive(self):
+        matcher = SubscriberMatcher([_sub(1, min_price=1000, max_price=1500), _sub(2, min_price=1501)])
+        assert [s["id"] for s in matcher.match(Home(city="amsterdam", agency="rebo", price=1000))] == [1]
+        assert [s["id"] for s in matcher.match(Home(city="amsterdam", agency="rebo", price=1500))] == [1]
+        assert [s["id"] for s in matcher.match(Home(city="amsterdam", agency="rebo", price=1501))] == [2]
+
+    def test_unknown_sqm_matches_any_minimum(self):
+        matcher = SubscriberMatcher([_sub(1, min_sqm=50)])
+        assert matcher.match(Home(city="amsterdam", agency="rebo", price=1000, sqm=-1))
+        assert not matcher.match(Home(city="amsterdam", agency="rebo", price=1000, sqm=40))
+
+    def test_requires_city_and_agency(self):
+        matcher = SubscriberMatcher([_sub(1, cities=["utrecht"]), _sub(2, agencies=["vesteda"])])
+        assert matcher.match(Home(city="amsterdam", agency="rebo", price=1000)) == []
+
+    def test_city_listed_twice_matches_once(self):
+        matcher = SubscriberMatcher([_sub(1, cities=["amsterdam", "amsterdam"])])
+        assert [s["id"] for s in matcher.match(Home(city="amsterdam", agency="rebo", price=1000))] == [1]
+
+    def test_empty_filters(self):
+        matcher = SubscriberMatcher([_sub(1, cities=[], agencies=[]), {**_sub(2), "filter_cities": None}])
+        assert matcher.match(Home(city="amsterdam", agency="rebo", price=1000)) == []
+
+    def test_matches_brute_force_in_subscriber_order(self):
+        rng = random.Random(42)
+        cities = ["amsterdam", "rotterdam", "utrecht", "delft"]
+        agencies = ["rebo", "vesteda", "funda", "pararius"]
+        subs = []
+        for i in range(500):
+            low = rng.randrange(0, 2500, 100)
+            subs.append(_sub(
+                i,
+                min_price=low,
+                max_price=low + rng.randrange(0, 2500, 100),
+                cities=rng.sample(cities, rng.randint(0, len(cities))),
+                agencies=rng.sample(agencies, rng.randint(0, len(agencies))),
+                min_sqm=rng.choice([0, 0, 30, 60]),
+            ))
+        matcher = SubscriberMatcher(subs)
+        for _ in range(200):
+            home = Home(city=rng.choice(cities).title(), agency=rng.choice(agencies),
+                        price=rng.randrange(0, 5000, 50), sqm=rng.choice([-1, 25, 45, 80]))
+            assert matcher.match(home) == _brute_force(subs, home)
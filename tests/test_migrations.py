@@ -0,0 +1,474 @@
+import os
+import re
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+import hestia_utils.db as db
+import hestia_utils.migrations as migrations
+
+
+def _write_migrations(directory, files):
+    for filename, sql in files.items():
+        (directory / filename).write_text(sql)
+    return str(directory)
+
+
+def _mock_connection(applied=()):
+    conn = MagicMock()
+    cursor = MagicMock()
+    conn.cursor.return_value.__enter__.return_value = cursor
+    cursor.fetchall.return_value = list(applied)
+    return conn, cursor
+
+
+def _executed(cursor):
+    return [c.args[0] for c in cursor.execute.call_args_list]
+
+
+class TestDiscover:
+    def test_orders_by_version_and_skips_other_files(self, tmp_path):
+        directory = _write_migrations(tmp_path, {
+            "0010_later.sql": "SELECT 10",
+            "0002_first.sql": "SELECT 2",
+            "README.md": "not a migration",
+        })
+        found = migrations.discover(directory)
+        assert [(m.version, m.name) for m in found] == [(2, "first"), (10, "later")]
+
+    def test_rejects_duplicate_versions(self, tmp_path):
+        directory = _write_migrations(tmp_path, {"0001_a.sql": "SELECT 1", "0001_b.sql": "SELECT 1"})
+        with pytest.raises(ValueError):
+            migrations.discover(directory)
+
+    def test_repository_migrations_are_numbered(self):
+        found = migrations.discover()
+        assert [m.version for m in found] == list(range(1, len(found) + 1))
+
+    def test_ddl_records_every_migration(self):
+        # misc/hestia.ddl is the schema after all migrations and marks them as applied
+        with open(DDL_PATH) as f:
+            recorded = re.findall(r"\((\d+), '(\w+)', '([0-9a-f]{64})'\)", f.read())
+        assert [(int(v), n, c) for v, n, c in recorded] == [(m.version, m.name, m.checksum) for m in migrations.discover()]
+
+
+class TestApplyPending:
+    @patch('hestia_utils.migrations.db.release_connection')
+    @patch('hestia_utils.migrations.db.get_connection')
+    def test_applies_only_unrecorded_migrations(self, mock_get_conn, mock_release, tmp_path):
+        directory = _write_migrations(tmp_path, {"0001_a.sql": "SELECT 'a'", "0002_b.sql": "SELECT 'b'"})
+        recorded = migrations.discover(directory)[0]
+        conn, cursor = _mock_connection(applied=[(1, recorded.checksum)])
+        mock_get_conn.return_value = conn
+
+        applied = migrations.apply_pending(directory)
+
+        assert [m.version for m in applied] == [2]
+        executed = _executed(cursor)
+        assert "SELECT 'a'" not in executed
+        assert "SELECT 'b'" in executed
+        insert = next(c for c in cursor.execute.call_args_list if "INSERT INTO hestia.schema_migrations" in c.args[0])
+        assert insert.args[1][:2] == [2, "b"]
+        # Locked before anything is read, unlocked at the end
+        assert "pg_advisory_lock" in executed[0]
+        assert "pg_advisory_unlock" in executed[-1]
+        mock_release.assert_called_once_with(conn)
+
+    @patch('hestia_utils.migrations.db.release_connection')
+    @patch('hestia_utils.migrations.db.get_connection')
+    def test_failed_migration_rolls_back_and_stops(self, mock_get_conn, mock_release, tmp_path):
+        directory = _write_migrations(tmp_path, {"0001_a.sql": "BROKEN", "0002_b.sql": "SELECT 'b'"})
+        conn, cursor = _mock_connection()
+
+        def execute(query, params=None):
+            if query == "BROKEN":
+                raise Exception("syntax error")
+        cursor.execute.side_effect = execute
+        mock_get_conn.return_value = conn
+
+        with pytest.raises(Exception, match="syntax error"):
+            migrations.apply_pending(directory)
+
+        conn.rollback.assert_called_once()
+        executed = _executed(cursor)
+        assert "SELECT 'b'" not in executed
+        assert "pg_advisory_unlock" in executed[-1]
+        mock_release.assert_called_once_with(conn)
+
+    @patch('hestia_utils.migrations.db.release_connection')
+    @patch('hestia_utils.migrations.db.get_connection')
+    def test_status(self, mock_get_conn, mock_release, tmp_path):
+        directory = _write_migrations(tmp_path, {"0001_a.sql": "SELECT 'a'", "0002_b.sql": "SELECT 'b'"})
+        conn, _ = _mock_connection(applied=[(1, "changed since")])
+        mock_get_conn.return_value = conn
+
+        assert [(m.version, applied) for m, applied in migrations.status(directory)] == [(1, True), (2, False)]
+
+
+    @patch('hestia_utils.migrations.apply_pending')
+    def test_apply_on_startup_can_be_disabled(self, mock_apply_pending, monkeypatch):
+        monkeypatch.setenv("HESTIA_MIGRATE_ON_STARTUP", "0")
+        assert migrations.apply_on_startup() == []
+        mock_apply_pending.assert_not_called()
+
+        monkeypatch.delenv("HESTIA_MIGRATE_ON_STARTUP")
+        migrations.apply_on_startup()
+        mock_apply_pending.assert_called_once_with()
+
+
+# The EXPLAIN regression test needs a throwaway Postgres database, which it wipes:
+#   HESTIA_TEST_DATABASE_URL=postgresql://postgres@localhost/hestia_test pytest tests/test_migrations.py
+TEST_DATABASE_URL = os.environ.get("HESTIA_TEST_DATABASE_URL")
+SEED_HOMES = int(os.environ.get("HESTIA_TEST_SEED_HOMES", "1000000"))
+DDL_PATH = os.path.join(os.path.dirname(__file__), "..", "misc", "hestia.ddl")
+
+# hestia.homes as it was before the migrations, so the test also exercises them
+BASELINE_HOMES_DDL = """
+    DELETE FROM hestia.schema_migrations;
+    DROP TABLE hestia.homes;
+    DROP TABLE hestia.home_dedup_keys;
+    DROP FUNCTION hestia.create_homes_partition;
+    CREATE TABLE hestia.homes (
+      url varchar NOT NULL,
+      address varchar NOT NULL,
+      city varchar NOT NULL,
+      price int4 DEFAULT '-1'::integer NOT NULL,
+      sqm int4 DEFAULT '-1'::integer NOT NULL,
+      agency varchar NULL,
+      date_added timestamp NOT NULL
+    );
+"""
+
+SEED_SQL = """
+    SELECT setseed(0.42);
+    INSERT INTO hestia.homes (url, address, city, price, sqm, agency, date_added)
+    SELECT
+      'https://example.org/home/' || g,
+      'Teststraat ' || g,
+      'City' || floor(power(random(), 2) * 250)::int,
+      400 + floor(random() * 3000)::int,
+      CASE WHEN random() < 0.1 THEN -1 ELSE 15 + floor(random() * 150)::int END,
+      'agency' || floor(random() * 40)::int,
+      now() - random() * interval '3 years'
+    FROM generate_series(1, %s) g;
+    INSERT INTO hestia.targets (agency, queryurl, "method", user_info, enabled)
+    SELECT 'agency' || g, 'https://example.org', 'GET', '{}', true FROM generate_series(0, 39) g;
+"""
+
+_API_HOMES_WHERE = (
+    "h.price >= %s AND h.price <= %s AND h.date_added >= %s AND LOWER(h.city) = ANY(%s) "
+    "AND h.agency = ANY(%s) AND (h.sqm = -1 OR h.sqm >= %s)"
+)
+
+
+def _api_homes_params():
+    return [600, 2000, datetime.now(timezone.utc) - timedelta(weeks=4),
+            ["city1", "city7", "city30"], ["agency1", "agency2", "agency3"], 30]
+
+
+# Copies of the read queries on hestia.homes; keep in sync with web/hestia_web/app.py
+# (/api/homes, ETag version markers, cities) and bot.py (/status, /filter)
+HOT_QUERIES = {
+    "api_homes_total": (f"SELECT COUNT(*) AS cnt FROM hestia.homes h WHERE {_API_HOMES_WHERE}", _api_homes_params()),
+    "api_homes_page": (
+        f"""
+        SELECT h.url, h.address, h.city, h.price, h.sqm, COALESCE(t.user_info->>'agency', h.agency) AS agency, h.date_added
+        FROM hestia.homes h
+        LEFT JOIN LATERAL (SELECT user_info FROM hestia.targets t2 WHERE t2.agency = h.agency LIMIT 1) t ON true
+        WHERE {_API_HOMES_WHERE}
+        ORDER BY h.date_added DESC, h.url DESC
+        LIMIT %s OFFSET %s
+        """,
+        _api_homes_params() + [21, 40],
+    ),
+    "api_homes_before_cursor": (
+        f"""
+        SELECT h.url, h.address, h.city, h.price, h.sqm, COALESCE(t.user_info->>'agency', h.agency) AS agency, h.date_added
+        FROM hestia.homes h
+        LEFT JOIN LATERAL (SELECT user_info FROM hestia.targets t2 WHERE t2.agency = h.agency LIMIT 1) t ON true
+        WHERE {_API_HOMES_WHERE} AND h.date_added <= %s AND (h.date_added, h.url) < (%s, %s)
+        ORDER BY h.date_added DESC, h.url DESC
+        LIMIT %s OFFSET %s
+        """,
+        _api_homes_params() + [datetime.now() - timedelta(days=7)] * 2 + ["https://example.com/", 21, 0],
+    ),
+    "homes_version": (
+        """
+        SELECT
+            (SELECT max(date_added) FROM hestia.homes WHERE date_added >= %(since)s) AS newest,
+            (SELECT min(date_added) FROM hestia.homes WHERE date_added >= %(since)s) AS oldest,
+            (SELECT version FROM hestia.meta WHERE id = 'default') AS meta_version
+        """,
+        {"since": datetime.now(timezone.utc) - timedelta(weeks=4)},
+    ),
+    "status_weekly_agency_count": (
+        "SELECT COUNT(*) FROM hestia.homes WHERE agency = %s AND date_added > now() - '1 week'::interval", ["agency3"]
+    ),
+}
+
+
+def _use_database():
+    """Point hestia_utils.db at the test database."""
+    import psycopg2
+    return patch.multiple(
+        'hestia_utils.db',
+        get_connection=lambda: psycopg2.connect(TEST_DATABASE_URL),
+        release_connection=lambda conn: conn.close(),
+    )
+
+
+def _seq_scanned_relations(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scanned_relations(child))
+    return found
+
+
+@pytest.fixture(scope="module")
+def database():
+    import psycopg2
+
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA IF EXISTS hestia CASCADE")
+        with open(DDL_PATH) as f:
+            cur.execute(f.read())
+        cur.execute(BASELINE_HOMES_DDL)
+        cur.execute(SEED_SQL, [SEED_HOMES])
+
+    with _use_database():
+        migrations.apply_pending()
+
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE hestia.homes")
+        cur.execute("ANALYZE hestia.targets")
+    yield conn
+    conn.close()
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="HESTIA_TEST_DATABASE_URL is not set")
+class TestHomesQueryPlans:
+    def _plan(self, conn, query, params):
+        with conn.cursor() as cur:
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    def _assert_no_seq_scan_on_homes(self, conn, query, params):
+        # Empty partitions (future months, the default one) are always seq scanned, and
+        # that reads nothing
+        scanned = _seq_scanned_relations(self._plan(conn, query, params))
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT relname FROM pg_class WHERE relname = ANY(%s) AND relname LIKE 'homes%%' AND relpages > 0",
+                [scanned],
+            )
+            assert cur.fetchall() == []
+
+    def test_migrations_are_recorded(self, database):
+        with database.cursor() as cur:
+            cur.execute("SELECT version FROM hestia.schema_migrations ORDER BY version")
+            assert [row[0] for row in cur.fetchall()] == [m.version for m in migrations.discover()]
+            cur.execute("SELECT COUNT(*) FROM hestia.homes WHERE id IS NULL")
+            assert cur.fetchone()[0] == 0
+
+    @pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+    def test_query_does_not_seq_scan_homes(self, database, name):
+        query, params = HOT_QUERIES[name]
+        self._assert_no_seq_scan_on_homes(database, query, params)
+
+    def test_targets_without_recent_homes_does_not_seq_scan_homes(self, database):
+        with patch('hestia_utils.db.fetch_all') as mock_fetch_all:
+            db.get_enabled_targets_without_recent_homes(default_days=7)
+        query, params = mock_fetch_all.call_args.args
+        self._assert_no_seq_scan_on_homes(database, query, params)
+
+    def test_recent_queries_only_touch_recent_partitions(self, database):
+        query, params = HOT_QUERIES["homes_version"]
+        with database.cursor() as cur:
+            cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query, params)
+            plan = cur.fetchone()[0][0]["Plan"]
+
+        def scanned(node):
+            found = [node["Relation Name"]] if "Relation Name" in node and node.get("Actual Loops") else []
+            for child in node.get("Plans", []):
+                found.extend(scanned(child))
+            return found
+
+        # Of three years of data, nothing before the previous month is read
+        last_month = (datetime.now().replace(day=1) - timedelta(days=1)).strftime("homes_y%Ym%m")
+        partitions = [name for name in scanned(plan) if name.startswith("homes_y")]
+        assert partitions and min(partitions) >= last_month
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="HESTIA_TEST_DATABASE_URL is not set")
+class TestPartitionedHomes:
+    def test_add_homes_skips_homes_seen_within_180_days(self, database):
+        from hestia_utils.parser import Home
+        now = datetime.now()
+        with database.cursor() as cur:
+            cur.execute(
+                "INSERT INTO hestia.home_dedup_keys VALUES ('oudestraat 1|city1', %s), ('nieuwestraat 1|city1', %s)",
+                [now - timedelta(days=200), now - timedelta(days=10)],
+            )
+        homes = [
+            Home(address="Oudestraat 1", city="City1", url="https://example.org/a", agency="agency1", price=1000),
+            Home(address="Nieuwestraat 1", city="City1", url="https://example.org/b", agency="agency1", price=1000),
+            Home(address="Anderestraat 1", city="City1", url="https://example.org/c", agency="agency1", price=1000),
+            Home(address="anderestraat 1", city="city1", url="https://example.org/c", agency="agency1", price=1000),
+        ]
+        with _use_database():
+            inserted = db.add_homes(homes, now.isoformat())
+
+        assert sorted(row["address"].lower() for row in inserted) == ["anderestraat 1", "oudestraat 1"]
+
+    def test_stats_triggers_match_refresh(self, database):
+        from hestia_utils.parser import Home
+
+        def stats():
+            with database.cursor() as cur:
+                cur.execute("SELECT kind, key, count FROM hestia.stats WHERE count <> 0 ORDER BY kind, key")
+                return cur.fetchall()
+
+        homes = [
+            Home(address=f"Statsstraat {i}", city=f"Statscity{i % 2}", url=f"https://example.org/s{i}", agency="agency1", price=900)
+            for i in range(3)
+        ]
+        with _use_database():
+            db.add_homes(homes, datetime.now(timezone.utc).replace(tzinfo=None).isoformat())
+        with database.cursor() as cur:
+            cur.execute("DELETE FROM hestia.homes WHERE url = 'https://example.org/s0'")
+        counted = stats()
+        assert ("homes_city", "Statscity1", 1) in counted
+
+        with _use_database():
+            db.refresh_stats()
+        assert stats() == counted
+
+    def test_cities_follow_homes(self, database):
+        from hestia_utils.parser import Home
+
+        def cities_and_version():
+            with database.cursor() as cur:
+                cur.execute("SELECT array_agg(city ORDER BY city) FROM hestia.cities WHERE city LIKE 'Citiescity%'")
+                cities = cur.fetchone()[0] or []
+                cur.execute("SELECT version FROM hestia.meta WHERE id = 'default'")
+                return cities, cur.fetchone()[0]
+
+        with database.cursor() as cur:
+            cur.execute("INSERT INTO hestia.meta (id, workdir) SELECT 'default', '/tmp' WHERE NOT EXISTS (SELECT 1 FROM hestia.meta)")
+        _, version = cities_and_version()
+        homes = [
+            Home(address=f"Citiesstraat {i}", city=f"Citiescity{i % 2}", url=f"https://example.org/c{i}", agency="agency1", price=900)
+            for i in range(3)
+        ]
+        with _use_database():
+            db.add_homes(homes, datetime.now(timezone.utc).replace(tzinfo=None).isoformat())
+        cities, added_version = cities_and_version()
+        assert cities == ["Citiescity0", "Citiescity1"]
+        assert added_version > version
+
+        # Known cities leave the version alone
+        with _use_database():
+            db.add_homes([Home(address="Citiesstraat 9", city="Citiescity0", url="https://example.org/c9", agency="agency1", price=900)],
+                         datetime.now(timezone.utc).replace(tzinfo=None).isoformat())
+        assert cities_and_version() == (cities, added_version)
+
+        with database.cursor() as cur:
+            cur.execute("DELETE FROM hestia.homes WHERE city = 'Citiescity1'")
+        with _use_database():
+            db.prune_cities()
+        cities, pruned_version = cities_and_version()
+        assert cities == ["Citiescity0"]
+        assert pruned_version > added_version
+
+    def test_inserted_homes_queue_preview_jobs(self, database):
+        from hestia_utils.parser import Home
+        homes = [
+            Home(address=f"Previewstraat {i}", city="City1", url=f"https://example.org/p{i}", agency="agency1", price=900)
+            for i in range(2)
+        ]
+        with _use_database():
+            db.add_homes(homes, datetime.now(timezone.utc).replace(tzinfo=None).isoformat())
+        with database.cursor() as cur:
+            cur.execute("SELECT url, attempts FROM hestia.preview_jobs WHERE url LIKE 'https://example.org/p%' ORDER BY url")
+            assert cur.fetchall() == [("https://example.org/p0", 0), ("https://example.org/p1", 0)]
+
+    def test_ensure_partitions_is_idempotent(self, database):
+        with _use_database():
+            db.ensure_homes_partitions(months_ahead=6)
+            assert db.ensure_homes_partitions(months_ahead=6) == []
+            partitions = db.get_homes_partitions()
+        assert partitions[-1][1] > datetime.now().date() + timedelta(days=5 * 30)
+
+    def test_archive_oldest_partition(self, database, tmp_path):
+        import csv
+        import gzip
+
+        with _use_database():
+            name, _ = db.get_homes_partitions()[0]
+            with database.cursor() as cur:
+                cur.execute(f"SELECT COUNT(*) FROM hestia.{name}")
+                rows = cur.fetchone()[0]
+
+            path = db.archive_homes_partition(name, str(tmp_path))
+            assert name not in [n for n, _ in db.get_homes_partitions()]
+
+        with gzip.open(path, "rt") as f:
+            assert len(list(csv.reader(f))) == rows + 1
+        with database.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s)", [f"hestia.{name}"])
+            assert cur.fetchone()[0] is None
+
+    def test_partition_takes_over_default_rows(self, database):
+        def stats():
+            with database.cursor() as cur:
+                cur.execute("SELECT kind, key, count FROM hestia.stats WHERE count <> 0 ORDER BY kind, key")
+                return cur.fetchall()
+
+        with database.cursor() as cur:
+            cur.execute(
+                "INSERT INTO hestia.homes (url, address, city, agency, date_added) "
+                "VALUES ('https://example.org/future', 'Toekomststraat 1', 'City1', 'agency1', '2099-05-17')"
+            )
+        counted = stats()
+        with _use_database():
+            db.ensure_homes_partitions(months_ahead=6)
+        with database.cursor() as cur:
+            cur.execute("SELECT hestia.create_homes_partition('2099-05-01')")
+            assert cur.fetchone()[0] is True
+            cur.execute("SELECT tableoid::regclass::text FROM hestia.homes WHERE url = 'https://example.org/future'")
+            assert cur.fetchone()[0] == "hestia.homes_y2099m05"
+            cur.execute("SELECT COUNT(*) FROM hestia.homes_default WHERE date_added >= '2099-05-01'")
+            assert cur.fetchone()[0] == 0
+            cur.execute("SELECT COUNT(*) FROM pg_indexes WHERE schemaname = 'hestia' AND tablename = 'homes_y2099m05'")
+            assert cur.fetchone()[0] == 6
+        assert stats() == counted
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="HESTIA_TEST_DATABASE_URL is not set")
+class TestNotificationOutboxLeases:
+    def test_lease_that_keeps_expiring_ends_failed(self, database):
+        from hestia_utils.delivery import Notification
+
+        with _use_database():
+            db.enqueue_notifications([Notification("telegram", 111, {"text": "hi"}, "lease-expiring")])
+            claims = 0
+            # Each claim stands for a dispatcher that died before finish_notifications
+            for _ in range(db.NOTIFICATION_MAX_ATTEMPTS + 2):
+                claimed = [row for row in db.claim_notifications(100, 0) if row["idempotency_key"] == "lease-expiring"]
+                claims += len(claimed)
+                with database.cursor() as cur:
+                    cur.execute("UPDATE hestia.notification_outbox SET locked_until = now() - interval '1 second' WHERE idempotency_key = 'lease-expiring' AND status = 'sending'")
+
+        assert claims == db.NOTIFICATION_MAX_ATTEMPTS
+        with database.cursor() as cur:
+            cur.execute("SELECT status, attempts FROM hestia.notification_outbox WHERE idempotency_key = 'lease-expiring'")
+            assert cur.fetchone() == ("failed", db.NOTIFICATION_MAX_ATTEMPTS)
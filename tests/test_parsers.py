@@ -1101,6 +1101,21 @@ class TestParseRoofz:
         results = HomeResults("roofz", r)
         assert len(results.homes) == 0
 
+    def test_page_urls(self, mock_response):
+        r = self._make_response(mock_response, [], meta={"last_page": 3})
+        assert HomeResults.page_urls("roofz", r) == [
+            "https://roofz.eu/api/ms/listing/properties?page=2",
+            "https://roofz.eu/api/ms/listing/properties?page=3",
+        ]
+        assert HomeResults.page_urls("rebo", r) == []
+
+    def test_merges_fetched_pages(self, mock_response):
+        r = self._make_response(mock_response, [self._listing()], meta={"last_page": 3})
+        page_2 = self._make_response(mock_response, [self._listing(street="Dorpsstraat", slug="dorpsstraat-1")])
+        failed = mock_response({}, status_code=500)
+        results = HomeResults("roofz", r, [page_2, failed])
+        assert [home.address for home in results.homes] == ["Kerkstraat 10", "Dorpsstraat 10"]
+
 
 class TestParseVanderLinden:
     def _make_listing_html(self, address="Kerkstraat 10", city="Leiden",
@@ -1,6 +1,8 @@
+import asyncio
+
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
-from datetime import datetime
+from datetime import datetime, date
 
 from hestia_utils.parser import Home
 
@@ -8,24 +10,22 @@ from hestia_utils.parser import Home
 class TestScrapeSite:
     @patch('scraper.broadcast', new_callable=AsyncMock)
     @patch('scraper.db')
-    @patch('scraper.requests')
-    def test_new_homes_written_and_broadcast(self, mock_requests, mock_db, mock_broadcast):
+    @patch('scraper.http_client')
+    def test_new_homes_written_and_broadcast(self, mock_http, mock_db, mock_broadcast):
         from scraper import scrape_site
 
         # Mock GET response
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_requests.get.return_value = mock_response
+        mock_http.CLIENT.get = AsyncMock(return_value=mock_response)
 
         # Mock HomeResults to return one home
         test_home = Home(address="Kerkstraat 10", city="Amsterdam", url="http://test.com", agency="rebo", price=1500)
         with patch('scraper.HomeResults') as mock_hr:
             mock_hr.return_value = [test_home]
 
-            # No previous homes in DB
-            mock_db.fetch_all.side_effect = [
-                [],  # previous homes query
-            ]
+            # Home was not seen before, so the insert returns it
+            mock_db.add_homes.return_value = [{"address": "Kerkstraat 10", "city": "Amsterdam"}]
 
             target = {
                 "id": 1,
@@ -39,7 +39,7 @@ class TestScrapeSite:
             import asyncio
             asyncio.get_event_loop().run_until_complete(scrape_site(target))
 
-            mock_db.add_home.assert_called_once()
+            mock_db.add_homes.assert_called_once()
             mock_broadcast.assert_called_once()
             broadcast_homes = mock_broadcast.call_args[0][0]
             assert len(broadcast_homes) == 1
@@ -47,13 +47,13 @@ class TestScrapeSite:
 
     @patch('scraper.broadcast', new_callable=AsyncMock)
     @patch('scraper.db')
-    @patch('scraper.requests')
-    def test_non_200_raises_connection_error(self, mock_requests, mock_db, mock_broadcast):
+    @patch('scraper.http_client')
+    def test_non_200_raises_connection_error(self, mock_http, mock_db, mock_broadcast):
         from scraper import scrape_site
 
         mock_response = MagicMock()
         mock_response.status_code = 403
-        mock_requests.get.return_value = mock_response
+        mock_http.CLIENT.get = AsyncMock(return_value=mock_response)
 
         target = {
             "id": 1, "agency": "rebo", "queryurl": "http://api.test.com",
@@ -66,13 +66,13 @@ class TestScrapeSite:
 
     @patch('scraper.broadcast', new_callable=AsyncMock)
     @patch('scraper.db')
-    @patch('scraper.requests')
-    def test_post_method(self, mock_requests, mock_db, mock_broadcast):
+    @patch('scraper.http_client')
+    def test_post_method(self, mock_http, mock_db, mock_broadcast):
         from scraper import scrape_site
 
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_requests.post.return_value = mock_response
+        mock_http.CLIENT.post = AsyncMock(return_value=mock_response)
 
         with patch('scraper.HomeResults') as mock_hr:
             mock_hr.return_value = []
@@ -87,7 +87,7 @@ class TestScrapeSite:
             import asyncio
             asyncio.get_event_loop().run_until_complete(scrape_site(target))
 
-            mock_requests.post.assert_called_once_with(
+            mock_http.CLIENT.post.assert_awaited_once_with(
                 "http://api.test.com",
                 json={"query": "test"},
                 headers={"Content-Type": "application/json"}
@@ -95,13 +95,13 @@ class TestScrapeSite:
 
     @patch('scraper.broadcast', new_callable=AsyncMock)
     @patch('scraper.db')
-    @patch('scraper.requests')
-    def test_post_ndjson_method(self, mock_requests, mock_db, mock_broadcast):
+    @patch('scraper.http_client')
+    def test_post_ndjson_method(self, mock_http, mock_db, mock_broadcast):
         from scraper import scrape_site
 
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_requests.post.return_value = mock_response
+        mock_http.CLIENT.post = AsyncMock(return_value=mock_response)
 
         with patch('scraper.HomeResults') as mock_hr:
             mock_hr.return_value = []
@@ -116,13 +116,13 @@ class TestScrapeSite:
             import asyncio
             asyncio.get_event_loop().run_until_complete(scrape_site(target))
 
-            call_args = mock_requests.post.call_args
-            assert call_args[1]["data"].count("\n") == 2  # Two NDJSON lines
+            call_args = mock_http.CLIENT.post.call_args
+            assert call_args[1]["content"].count("\n") == 2  # Two NDJSON lines
 
     @patch('scraper.broadcast', new_callable=AsyncMock)
     @patch('scraper.db')
-    @patch('scraper.requests')
-    def test_unknown_method_raises(self, mock_requests, mock_db, mock_broadcast):
+    @patch('scraper.http_client')
+    def test_unknown_method_raises(self, mock_http, mock_db, mock_broadcast):
         from scraper import scrape_site
 
         target = {
@@ -136,13 +136,13 @@ class TestScrapeSite:
 
     @patch('scraper.broadcast', new_callable=AsyncMock)
     @patch('scraper.db')
-    @patch('scraper.requests')
-    def test_deduplication(self, mock_requests, mock_db, mock_broadcast):
+    @patch('scraper.http_client')
+    def test_deduplication(self, mock_http, mock_db, mock_broadcast):
         from scraper import scrape_site
 
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_requests.get.return_value = mock_response
+        mock_http.CLIENT.get = AsyncMock(return_value=mock_response)
 
         existing_home = Home(address="Kerkstraat 10", city="Amsterdam")
         new_home = Home(address="Kerkstraat 10", city="Amsterdam", url="http://test.com", agency="rebo", price=1500)
@@ -150,9 +150,8 @@ class TestScrapeSite:
 
         with patch('scraper.HomeResults') as mock_hr:
             mock_hr.return_value = [new_home, brand_new]
-            mock_db.fetch_all.return_value = [
-                {"address": "Kerkstraat 10", "city": "Amsterdam"}
-            ]
+            # The existing home hits the dedup key, only brand_new is inserted
+            mock_db.add_homes.return_value = [{"address": "Dorpsweg 5", "city": "Rotterdam"}]
 
             target = {
                 "id": 1, "agency": "rebo", "queryurl": "http://api.test.com",
@@ -162,10 +161,30 @@ class TestScrapeSite:
             import asyncio
             asyncio.get_event_loop().run_until_complete(scrape_site(target))
 
-            # Only brand_new should be added
-            assert mock_db.add_home.call_count == 1
-            call_args = mock_db.add_home.call_args[0]
-            assert call_args[1] == "Dorpsweg 5"
+            # Both homes are sent to the database in one batch, only brand_new is broadcast
+            mock_db.add_homes.assert_called_once()
+            assert mock_db.add_homes.call_args[0][0] == [new_home, brand_new]
+            broadcast_homes = mock_broadcast.call_args[0][0]
+            assert [h.address for h in broadcast_homes] == ["Dorpsweg 5"]
+
+
+class TestStoreNewHomes:
+    @patch('scraper.db')
+    def test_returns_inserted_homes_once(self, mock_db):
+        from scraper import _store_new_homes
+
+        mock_db.add_homes.return_value = [{"address": "Dorpsweg 5", "city": "Rotterdam"}]
+        homes = [
+            Home(address="kerkstraat 10", city="amsterdam", agency="rebo"),
+            Home(address="Dorpsweg 5", city="Rotterdam", agency="rebo"),
+            Home(address="DORPSWEG 5", city="Rotterdam", agency="rebo"),
+        ]
+
+        new_homes = _store_new_homes(homes)
+
+        assert [h.address for h in new_homes] == ["Dorpsweg 5"]
+        mock_db.add_homes.assert_called_once()
+        mock_db.fetch_all.assert_not_called()
 
 
 class TestBroadcast:
@@ -257,11 +276,11 @@ class TestBroadcast:
 
     @pytest.mark.asyncio
     @patch("scraper.apns.build_home_notification_payload")
-    @patch("scraper.apns.APNsClient")
+    @patch("scraper.apns.CLIENT")
     @patch("scraper.meta")
     @patch("scraper.db")
     async def test_sends_apns_for_matching_subscriber(
-        self, mock_db, mock_meta, mock_apns_client_cls, mock_payload_builder
+        self, mock_db, mock_meta, client, mock_payload_builder
     ):
         from scraper import broadcast, SCRAPER_METRICS
         SCRAPER_METRICS.clear()
@@ -286,31 +305,31 @@ class TestBroadcast:
         ]
         mock_meta.BOT.send_message = AsyncMock()
 
-        client = MagicMock()
         client.enabled = True
-        client.send.return_value = MagicMock(ok=True, should_retry=False, permanent_invalid=False, reason="", status_code=200)
-        mock_apns_client_cls.return_value = client
+        client.send_batch = AsyncMock(return_value=[
+            MagicMock(ok=True, should_retry=False, permanent_invalid=False, reason="", status_code=200)
+        ])
         mock_payload_builder.return_value = {"aps": {"alert": {"title": "x", "body": "y"}}}
 
         home = Home(address="Straat 1", city="Amsterdam", url="http://a.com", agency="rebo", price=1200)
         await broadcast([home])
 
         mock_meta.BOT.send_message.assert_not_called()
-        client.send.assert_called_once()
+        client.send_batch.assert_awaited_once()
+        assert client.send_batch.call_args[0][0] == [("apns-token-1", b'{"aps": {"alert": {"title": "x", "body": "y"}}}')]
         mock_db.clear_apns_token.assert_not_called()
         assert SCRAPER_METRICS["apns:success"] == 1
         assert SCRAPER_METRICS["apns:failure"] == 0
 
     @pytest.mark.asyncio
-    @patch("scraper.sleep")
     @patch("scraper.apns.build_home_notification_payload")
-    @patch("scraper.apns.APNsClient")
+    @patch("scraper.apns.CLIENT")
     @patch("scraper.meta")
     @patch("scraper.db")
-    async def test_apns_retries_transient_errors(
-        self, mock_db, mock_meta, mock_apns_client_cls, mock_payload_builder, mock_sleep
+    async def test_apns_retry_settings_passed_to_client(
+        self, mock_db, mock_meta, client, mock_payload_builder
     ):
-        from scraper import broadcast, SCRAPER_METRICS
+        from scraper import broadcast, SCRAPER_METRICS, APNS_MAX_RETRIES
         SCRAPER_METRICS.clear()
 
         mock_db.get_dev_mode.return_value = False
@@ -333,30 +352,27 @@ class TestBroadcast:
         ]
         mock_meta.BOT.send_message = AsyncMock()
 
-        client = MagicMock()
         client.enabled = True
-        retry_result = MagicMock(ok=False, should_retry=True, permanent_invalid=False, reason="TooManyRequests", status_code=429)
         success_result = MagicMock(ok=True, should_retry=False, permanent_invalid=False, reason="", status_code=200)
-        client.send.side_effect = [retry_result, success_result]
-        mock_apns_client_cls.return_value = client
+        client.send_batch = AsyncMock(return_value=[success_result])
         mock_payload_builder.return_value = {"aps": {"alert": {"title": "x", "body": "y"}}}
 
         home = Home(address="Straat 1", city="Amsterdam", url="http://a.com", agency="rebo", price=1200)
         await broadcast([home])
 
-        assert client.send.call_count == 2
-        mock_sleep.assert_called_once()
+        # Retries with backoff happen inside the APNs client, see test_apns.py
+        assert client.send_batch.call_args.kwargs["max_retries"] == APNS_MAX_RETRIES
         mock_db.clear_apns_token.assert_not_called()
         assert SCRAPER_METRICS["apns:success"] == 1
         assert SCRAPER_METRICS["apns:failure"] == 0
 
     @pytest.mark.asyncio
     @patch("scraper.apns.build_home_notification_payload")
-    @patch("scraper.apns.APNsClient")
+    @patch("scraper.apns.CLIENT")
     @patch("scraper.meta")
     @patch("scraper.db")
     async def test_apns_invalid_token_is_cleared(
-        self, mock_db, mock_meta, mock_apns_client_cls, mock_payload_builder
+        self, mock_db, mock_meta, client, mock_payload_builder
     ):
         from scraper import broadcast, SCRAPER_METRICS
         SCRAPER_METRICS.clear()
@@ -381,7 +397,6 @@ class TestBroadcast:
         ]
         mock_meta.BOT.send_message = AsyncMock()
 
-        client = MagicMock()
         client.enabled = True
         invalid_result = MagicMock(
             ok=False,
@@ -390,8 +405,7 @@ class TestBroadcast:
             reason="Unregistered",
             status_code=410,
         )
-        client.send.return_value = invalid_result
-        mock_apns_client_cls.return_value = client
+        client.send_batch = AsyncMock(return_value=[invalid_result])
         mock_payload_builder.return_value = {"aps": {"alert": {"title": "x", "body": "y"}}}
 
         home = Home(address="Straat 1", city="Amsterdam", url="http://a.com", agency="rebo", price=1200)
@@ -400,3 +414,374 @@ class TestBroadcast:
         mock_db.clear_apns_token.assert_called_once_with(3)
         assert SCRAPER_METRICS["apns:success"] == 0
         assert SCRAPER_METRICS["apns:failure"] == 1
+
+
+class TestBuildNotifications:
+    @patch("scraper.apns.build_home_notification_payload")
+    @patch("scraper.apns.CLIENT")
+    @patch("scraper.meta")
+    @patch("scraper.db")
+    def test_renders_once_per_home(self, mock_db, mock_meta, mock_client, mock_payload_builder):
+        import scraper
+
+        subs = [
+            {"id": i, "telegram_id": 100 + i, "telegram_enabled": True, "apns_token": f"token-{i}", "filter_min_price": 0,
+             "filter_max_price": 9999, "filter_cities": ["amsterdam"], "filter_agencies": ["rebo"], "filter_min_sqm": 0}
+            for i in range(3)
+        ]
+        mock_db.get_dev_mode.return_value = False
+        mock_db.fetch_all.return_value = subs
+        mock_client.enabled = True
+        mock_payload_builder.return_value = {"aps": {}}
+
+        home = Home(address="Straat 1", city="Amsterdam", url="http://a.com", agency="rebo", price=1200)
+        with patch("scraper._render_home_message", wraps=scraper._render_home_message) as render:
+            notifications = scraper._build_notifications([home])
+
+        assert len(notifications) == 6
+        render.assert_called_once()
+        mock_payload_builder.assert_called_once()
+        telegram = [n for n in notifications if n.channel == "telegram"]
+        assert all(n.payload is telegram[0].payload for n in telegram)
+
+
+class TestFetchCandidateSubscribers:
+    @patch("scraper.db")
+    def test_prefilters_in_sql(self, mock_db):
+        from scraper import _fetch_candidate_subscribers
+
+        mock_db.get_dev_mode.return_value = False
+        homes = [
+            Home(address="A 1", city="Amsterdam", agency="rebo", price=1500),
+            Home(address="B 2", city="Utrecht", agency="vesteda", price=900),
+            Home(address="C 3", city="amsterdam", agency="rebo", price=2100),
+        ]
+        _fetch_candidate_subscribers(homes)
+
+        query, params = mock_db.fetch_all.call_args[0]
+        assert "SELECT *" not in query
+        assert "filter_cities ?| %s" in query and "filter_agencies ?| %s" in query
+        assert "user_level" not in query
+        assert params == [["amsterdam", "utrecht"], ["rebo", "vesteda"], 2100, 900]
+
+    @patch("scraper.db")
+    def test_dev_mode_limits_to_testers(self, mock_db):
+        from scraper import _fetch_candidate_subscribers
+
+        mock_db.get_dev_mode.return_value = True
+        _fetch_candidate_subscribers([Home(city="Amsterdam", agency="rebo", price=1000)])
+
+        assert "AND user_level > 1" in mock_db.fetch_all.call_args[0][0]
+
+
+class TestNotificationOutbox:
+    SUB = {"id": 7, "telegram_id": 111, "telegram_enabled": True, "apns_token": None, "filter_min_price": 0,
+           "filter_max_price": 9999, "filter_cities": ["amsterdam"], "filter_agencies": ["rebo"], "filter_min_sqm": 0}
+
+    @pytest.mark.asyncio
+    @patch('scraper.NOTIFICATION_OUTBOX', True)
+    @patch('scraper.meta')
+    @patch('scraper.db')
+    async def test_new_homes_queue_instead_of_sending(self, mock_db, mock_meta):
+        from scraper import store_and_broadcast
+
+        mock_db.get_dev_mode.return_value = False
+        mock_db.fetch_all.side_effect = lambda query, *args: (
+            [self.SUB] if "hestia.subscribers" in query else [{"agency": "rebo", "user_info": {"agency": "Rebo"}}]
+        )
+        mock_db.add_homes.return_value = [{"address": "Straat 1", "city": "Amsterdam"}]
+        mock_meta.BOT.send_message = AsyncMock()
+
+        home = Home(address="Straat 1", city="Amsterdam", url="http://a.com", agency="rebo", price=1200)
+        await store_and_broadcast([home])
+        await store_and_broadcast([home])
+
+        mock_meta.BOT.send_message.assert_not_called()
+        first, second = (c[0][0] for c in mock_db.enqueue_notifications.call_args_list)
+        assert [(n.channel, n.target, n.subscriber_id) for n in first] == [("telegram", 111, 7)]
+        # The same home for the same subscriber always gets the same idempotency key
+        assert first[0].idempotency_key == second[0].idempotency_key
+        # Homes and notifications are written in one transaction
+        conn = mock_db.transaction.return_value.__enter__.return_value
+        assert mock_db.add_homes.call_args[0][2] is conn
+        assert mock_db.enqueue_notifications.call_args[0][1] is conn
+
+    @pytest.mark.asyncio
+    @patch('scraper.NOTIFICATION_OUTBOX', True)
+    @patch('scraper.db')
+    async def test_failed_homes_write_raises(self, mock_db):
+        from scraper import store_and_broadcast
+
+        mock_db.add_homes.side_effect = Exception("write failed")
+
+        with pytest.raises(Exception, match="write failed"):
+            await store_and_broadcast([Home(address="Straat 1", city="Amsterdam", agency="rebo", price=1200)])
+        mock_db.enqueue_notifications.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('scraper.meta')
+    @patch('scraper.db')
+    async def test_dispatch_records_outcomes(self, mock_db, mock_meta):
+        from scraper import dispatch_once
+        from telegram.error import Forbidden
+
+        mock_db.claim_notifications.return_value = [
+            {"id": 1, "channel": "telegram", "target": "111", "payload": {"text": "a", "parse_mode": "MarkdownV2"},
+             "idempotency_key": "k1", "subscriber_id": 1, "device_id": None},
+            {"id": 2, "channel": "telegram", "target": "222", "payload": {"text": "b"},
+             "idempotency_key": "k2", "subscriber_id": 2, "device_id": None},
+            {"id": 3, "channel": "telegram", "target": "333", "payload": {"text": "c"},
+             "idempotency_key": "k3", "subscriber_id": 3, "device_id": None},
+        ]
+
+        async def send_message(chat_id, text, **kwargs):
+            if chat_id == "222":
+                raise Forbidden("Forbidden: bot was blocked by the user")
+            if chat_id == "333":
+                raise TimeoutError("slow")
+
+        mock_meta.BOT.send_message = AsyncMock(side_effect=send_message)
+
+        assert await dispatch_once() == 3
+
+        mock_meta.BOT.send_message.assert_any_await(chat_id="111", text="a", parse_mode="MarkdownV2")
+        mock_db.disable_user.assert_called_once_with("222")
+        outcomes = {id_: outcome for id_, outcome, _ in mock_db.finish_notifications.call_args[0][0]}
+        assert outcomes == {1: "sent", 2: "failed", 3: "retry"}
+
+    @pytest.mark.asyncio
+    @patch('scraper.meta')
+    @patch('scraper.db')
+    async def test_dispatch_retries_recording_outcomes(self, mock_db, mock_meta):
+        from scraper import dispatch_once
+
+        mock_db.claim_notifications.return_value = [
+            {"id": 1, "channel": "telegram", "target": "111", "payload": {"text": "a"},
+             "idempotency_key": "k1", "subscriber_id": 1, "device_id": None},
+        ]
+        mock_meta.BOT.send_message = AsyncMock()
+        mock_db.finish_notifications.side_effect = [Exception("connection lost"), None]
+
+        with patch('scraper.asyncio.sleep', new_callable=AsyncMock):
+            assert await dispatch_once() == 1
+        assert mock_db.finish_notifications.call_count == 2
+
+    @pytest.mark.asyncio
+    @patch('scraper.meta')
+    @patch('scraper.db')
+    async def test_dispatch_raises_when_outcomes_cannot_be_recorded(self, mock_db, mock_meta):
+        import scraper
+
+        mock_db.claim_notifications.return_value = [
+            {"id": 1, "channel": "telegram", "target": "111", "payload": {"text": "a"},
+             "idempotency_key": "k1", "subscriber_id": 1, "device_id": None},
+        ]
+        mock_meta.BOT.send_message = AsyncMock()
+        mock_db.finish_notifications.side_effect = Exception("connection lost")
+
+        with patch('scraper.asyncio.sleep', new_callable=AsyncMock), \
+                patch.object(scraper.logger, "error") as mock_error:
+            with pytest.raises(Exception, match="connection lost"):
+                await scraper.dispatch_once()
+        assert mock_db.finish_notifications.call_count == scraper.DISPATCH_FINISH_ATTEMPTS
+        assert "1 already sent" in mock_error.call_args[0][0]
+
+    @pytest.mark.asyncio
+    @patch('scraper.db')
+    async def test_dispatch_with_empty_outbox(self, mock_db):
+        from scraper import dispatch_once
+
+        mock_db.claim_notifications.return_value = []
+        assert await dispatch_once() == 0
+        mock_db.finish_notifications.assert_not_called()
+
+
+class TestDaemon:
+    @patch('scraper.db')
+    def test_load_targets_skips_excluded_agencies(self, mock_db):
+        import scraper
+
+        mock_db.fetch_all_or_raise.return_value = [
+            {"id": 1, "agency": "rebo"},
+            {"id": 2, "agency": "ikwilhuren"},
+        ]
+        with patch.object(scraper, "HESTIA_TARGET", ""), patch.object(scraper, "DAEMON_EXCLUDED_AGENCIES", {"ikwilhuren"}):
+            targets = scraper._load_daemon_targets()
+
+        assert list(targets) == [1]
+        assert "agency = ANY" not in mock_db.fetch_all_or_raise.call_args[0][0]
+
+    @patch('scraper.db')
+    def test_load_targets_restricted_to_listed_agencies(self, mock_db):
+        import scraper
+
+        mock_db.fetch_all_or_raise.return_value = [{"id": 3, "agency": "funda"}]
+        with patch.object(scraper, "HESTIA_TARGET", "funda,rebo"):
+            scraper._load_daemon_targets()
+
+        assert mock_db.fetch_all_or_raise.call_args[0][1] == [["funda", "rebo"]]
+
+    def test_target_interval_override(self):
+        import scraper
+
+        assert scraper._target_interval({"scrape_interval_seconds": 600}) == 600
+        assert scraper._target_interval({"scrape_interval_seconds": None}) == scraper.DAEMON_DEFAULT_INTERVAL_SECONDS
+
+    @pytest.mark.asyncio
+    @patch('scraper.asyncio.sleep', new_callable=AsyncMock)
+    @patch('scraper.scrape_site', new_callable=AsyncMock)
+    @patch('scraper.db')
+    async def test_target_schedule_stops_when_target_removed(self, mock_db, mock_scrape_site, mock_sleep):
+        import scraper
+
+        target = {"id": 7, "agency": "rebo", "scrape_interval_seconds": 60}
+        scraper._DAEMON_TARGETS.clear()
+        scraper._DAEMON_TARGETS[7] = target
+        mock_db.get_scraper_halted.return_value = False
+
+        async def remove_after_first_run(seconds):
+            if mock_scrape_site.await_count:
+                scraper._DAEMON_TARGETS.pop(7, None)
+        mock_sleep.side_effect = remove_after_first_run
+
+        await scraper._run_target_schedule(7)
+
+        mock_scrape_site.assert_awaited_once_with(target)
+        assert mock_sleep.await_args_list[-1][0][0] == 60
+
+    @pytest.mark.asyncio
+    @patch('scraper.asyncio.sleep', new_callable=AsyncMock)
+    @patch('scraper.scrape_site', new_callable=AsyncMock)
+    @patch('scraper.db')
+    async def test_target_schedule_survives_halted_flag_errors(self, mock_db, mock_scrape_site, mock_sleep):
+        import scraper
+
+        scraper._DAEMON_TARGETS.clear()
+        scraper._DAEMON_TARGETS[7] = {"id": 7, "agency": "rebo", "scrape_interval_seconds": 60}
+        mock_db.get_scraper_halted.side_effect = [Exception("connection lost"), False]
+
+        async def remove_after_first_run(seconds):
+            if mock_scrape_site.await_count:
+                scraper._DAEMON_TARGETS.pop(7, None)
+        mock_sleep.side_effect = remove_after_first_run
+
+        await scraper._run_target_schedule(7)
+
+        mock_scrape_site.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch('scraper._record_target_error', new_callable=AsyncMock)
+    @patch('scraper.scrape_site', new_callable=AsyncMock, side_effect=asyncio.CancelledError)
+    async def test_cancelled_scrape_is_not_a_target_error(self, _mock_scrape_site, mock_record):
+        import scraper
+
+        with pytest.raises(asyncio.CancelledError):
+            await scraper._scrape_target({"id": 7, "agency": "rebo"})
+        mock_record.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @patch('scraper.run_maintenance', new_callable=AsyncMock, side_effect=asyncio.CancelledError)
+    async def test_cancelled_maintenance_loop_stops(self, _mock_run_maintenance):
+        import scraper
+
+        with pytest.raises(asyncio.CancelledError):
+            await scraper._run_maintenance_schedule()
+
+    @pytest.mark.asyncio
+    @patch('scraper.meta')
+    @patch('scraper.db')
+    async def test_maintenance_runs_only_with_a_claimed_slot(self, mock_db, mock_meta):
+        import scraper
+
+        mock_db.claim_maintenance_slot.return_value = False
+        with patch('scraper.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(2026, 1, 2, 19, 1)
+            await scraper.run_maintenance()
+
+        mock_db.claim_maintenance_slot.assert_called_once_with("daily", "2026-01-02")
+        mock_db.refresh_stats.assert_not_called()
+        mock_meta.BOT.send_message.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('scraper.apns')
+    @patch('scraper.http_client')
+    @patch('scraper._run_target_schedule', new_callable=AsyncMock)
+    @patch('scraper._load_daemon_targets')
+    async def test_failed_reload_keeps_targets(self, mock_load, mock_schedule, mock_http_client, mock_apns):
+        import scraper
+
+        target = {"id": 7, "agency": "rebo"}
+        mock_load.side_effect = [{7: target}, Exception("connection lost")]
+        mock_http_client.CLIENT.aclose = AsyncMock()
+        mock_apns.CLIENT.aclose = AsyncMock()
+        scraper._DAEMON_TARGETS.clear()
+        # The daemon swallows reload errors, so stop it from the sleep after the failed reload
+        with patch.object(scraper, "HESTIA_TARGET", "rebo"), \
+                patch('scraper.asyncio.sleep', new_callable=AsyncMock, side_effect=[None, asyncio.CancelledError()]), \
+                patch('scraper._run_maintenance_schedule', new_callable=AsyncMock) as mock_maintenance:
+            with pytest.raises(asyncio.CancelledError):
+                await scraper.run_daemon()
+
+        assert mock_load.call_count == 2
+        assert scraper._DAEMON_TARGETS == {7: target}
+        mock_schedule.assert_called_once_with(7)
+        # Daemons restricted to some agencies leave maintenance to others
+        mock_maintenance.assert_not_called()
+
+
+class TestHomesPartitions:
+    def _months_ago(self, months):
+        today = datetime.now().date()
+        index = today.year * 12 + today.month - 1 - months
+        return date(index // 12, index % 12 + 1, 1)
+
+    @patch('scraper.db')
+    def test_retention_archives_whole_months_only(self, mock_db):
+        import scraper
+
+        mock_db.ensure_homes_partitions.return_value = []
+        mock_db.get_homes_partitions.return_value = [
+            (f"p{months}", self._months_ago(months)) for months in (14, 13, 12, 11)
+        ]
+        with patch.object(scraper, "HOMES_RETENTION_MONTHS", 12), patch.object(scraper, "HOMES_ARCHIVE_DIR", "/archive"):
+            assert scraper._maintain_homes_partitions() == ""
+
+        archived = [c[0][0] for c in mock_db.archive_homes_partition.call_args_list]
+        assert archived == ["p14", "p13"]
+        mock_db.prune_home_dedup_keys.assert_called_once()
+
+    @patch('scraper.db')
+    def test_retention_disabled_by_default(self, mock_db):
+        import scraper
+
+        mock_db.ensure_homes_partitions.return_value = ["2026-12"]
+        with patch.object(scraper, "HOMES_RETENTION_MONTHS", 0):
+            scraper._maintain_homes_partitions()
+
+        mock_db.ensure_homes_partitions.assert_called_once_with(months_ahead=scraper.HOMES_PARTITIONS_AHEAD)
+        mock_db.archive_homes_partition.assert_not_called()
+
+    @patch('scraper.db')
+    def test_create_failure_is_reported(self, mock_db):
+        import scraper
+
+        mock_db.ensure_homes_partitions.side_effect = Exception("permission denied")
+        with patch.object(scraper, "HOMES_RETENTION_MONTHS", 0):
+            message = scraper._maintain_homes_partitions()
+
+        assert "Creating homes partitions failed" in message and "permission denied" in message
+        mock_db.prune_home_dedup_keys.assert_called_once()
+
+    @patch('scraper.db')
+    def test_archive_failure_is_reported_and_stops(self, mock_db):
+        import scraper
+
+        mock_db.ensure_homes_partitions.return_value = []
+        mock_db.get_homes_partitions.return_value = [("p14", self._months_ago(14)), ("p13", self._months_ago(13))]
+        mock_db.archive_homes_partition.side_effect = OSError("disk full")
+        with patch.object(scraper, "HOMES_RETENTION_MONTHS", 12):
+            message = scraper._maintain_homes_partitions()
+
+        assert "p14" in message and "disk full" in message
+        assert mock_db.archive_homes_partition.call_count == 1
+
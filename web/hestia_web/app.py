@@ -3,6 +3,7 @@ import string
 import secrets
 import re
 import functools
+import io
 import uuid
 import atexit
 import http.client
@@ -12,8 +13,14 @@ import sys
 import ipaddress
 import socket
 import time
-from collections import Counter
-from threading import Lock
+import json
+import hashlib
+import queue
+import select
+import tempfile
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import BoundedSemaphore, Event, Lock, Thread
 from html.parser import HTMLParser
 import urllib.error
 import urllib.request
@@ -24,14 +31,17 @@ from datetime import datetime, timedelta, timezone
 import psycopg2
 import psycopg2.extras
 import psycopg2.pool
+from gevent import get_hub, monkey
+from psycogreen.gevent import patch_psycopg
 from flask import (
     Flask, request, redirect, url_for, make_response, render_template,
-    send_from_directory, jsonify, render_template_string, g,
+    send_from_directory, send_file, jsonify, render_template_string, g, Response,
 )
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from PIL import Image, ImageOps, features as image_features
 from dotenv import load_dotenv
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
@@ -57,6 +67,98 @@ PREVIEW_CACHE_OK_TTL = timedelta(days=30)
 PREVIEW_CACHE_EMPTY_TTL = timedelta(days=7)
 PREVIEW_CACHE_ERROR_TTL = timedelta(hours=1)
 PREVIEW_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+# Preview images are stored on disk under their sha256, hestia.preview_cache only keeps
+# the metadata. Files no row refers to are collected at most once per interval.
+PREVIEW_BLOB_DIR = os.environ.get("PREVIEW_BLOB_DIR", "/data/previews")
+PREVIEW_BLOB_MAX_AGE = timedelta(days=7)
+PREVIEW_BLOB_GC_INTERVAL_SECONDS = 3600
+# Younger files are kept, their row may not be committed yet
+PREVIEW_BLOB_GC_GRACE_SECONDS = 3600
+PREVIEW_BLOB_GC = {"next_run": 0.0}
+PREVIEW_BLOB_GC_LOCK = Lock()
+# Rows of hestia.preview_cache are kept in memory for up to PREVIEW_MEMORY_TTL_SECONDS,
+# least recently used first out beyond PREVIEW_MEMORY_MAX_BYTES. Shorter than the grace
+# of the blob collection, so a remembered digest outlives its file by no more than that.
+PREVIEW_MEMORY_MAX_BYTES = 16 * 1024 * 1024
+PREVIEW_MEMORY_TTL_SECONDS = 300
+# Previews are stored as renditions at twice the 144x108 dashboard card, the original is
+# only kept when it can't be decoded. Served by Accept, in this order of preference; the
+# JPEG one is what clients get that name neither format.
+PREVIEW_THUMB_SIZE = (288, 216)
+PREVIEW_THUMB_ENCODINGS = [
+    (content_type, pil_format, options)
+    for content_type, pil_format, options in (
+        ("image/avif", "AVIF", {"quality": 50, "speed": 8}),
+        ("image/webp", "WEBP", {"quality": 75, "method": 4}),
+        ("image/jpeg", "JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+    )
+    if pil_format == "JPEG" or image_features.check(pil_format.lower())
+]
+# Larger images are served as they are rather than decoded
+PREVIEW_IMAGE_MAX_PIXELS = 40_000_000
+# Image candidates of a listing page are probed concurrently, the whole round within the
+# deadline. Hosts that could not be reached PREVIEW_HOST_FAILURE_LIMIT times in a row are
+# not probed again for PREVIEW_HOST_BLOCK_SECONDS.
+PREVIEW_PROBE_DEADLINE_SECONDS = 5
+PREVIEW_PROBE_MAX_CANDIDATES = 8
+PREVIEW_PROBE_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="preview-probe")
+PREVIEW_HOST_FAILURE_LIMIT = 3
+PREVIEW_HOST_BLOCK_SECONDS = 3600
+PREVIEW_HOST_FAILURES = {}  # host -> (consecutive failures, blocked until)
+PREVIEW_HOST_FAILURES_MAX_ENTRIES = 10000
+PREVIEW_HOST_FAILURES_LOCK = Lock()
+# POST /api/preview-images resolves up to this many listing pages per request; misses
+# still resolving at the deadline come back as null for the client to ask again, and
+# those that had not started by then are dropped from the pool
+PREVIEW_BATCH_MAX_URLS = 30
+PREVIEW_BATCH_DEADLINE_SECONDS = 12
+# Separate from the probe pool, resolving waits on probes
+PREVIEW_RESOLVE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="preview-resolve")
+# One fetch per url at a time: requests in this process wait for the running one, other
+# processes see its 'pending' preview_cache row and poll until it is replaced
+PREVIEW_FLIGHTS = {}  # (kind, url) -> _PreviewFlight
+PREVIEW_FLIGHTS_LOCK = Lock()
+PREVIEW_FLIGHT_LEASE = timedelta(seconds=20)
+PREVIEW_FLIGHT_POLL_SECONDS = 0.25
+# Previews of new homes are warmed from hestia.preview_jobs by their own process
+# (python -m hestia_web.warmer), so the web workers never wait on listing sites for it.
+# PREVIEW_WARM_ENABLED=1 runs a warmer thread in every web worker instead. Jobs the
+# warmers did not get to within a day are dropped, the listing is old news by then.
+PREVIEW_WARM_ENABLED = os.environ.get("PREVIEW_WARM_ENABLED", "0") == "1"
+PREVIEW_WARM_BATCH = 10
+# Renewed before every url of a batch, so it only has to cover warming one (~50 s at worst)
+PREVIEW_WARM_LEASE_SECONDS = 300
+PREVIEW_WARM_MAX_ATTEMPTS = 3
+PREVIEW_WARM_MAX_AGE = timedelta(days=1)
+PREVIEW_WARM_POLL_SECONDS = 60
+
+HOMES_WINDOW = timedelta(weeks=4)
+# Totals of /api/homes are cached per filter set; within the TTL a new listing may be
+# missing from the count, never from the list itself.
+HOMES_TOTAL_CACHE_TTL_SECONDS = 60
+HOMES_TOTAL_CACHE = {}
+HOMES_TOTAL_CACHE_MAX_ENTRIES = 10000
+HOMES_TOTAL_CACHE_LOCK = Lock()
+
+STATISTICS_CACHE_TTL_SECONDS = 60
+STATISTICS_CACHE = {}
+STATISTICS_CACHE_LOCK = Lock()
+
+# Filter options by meta version: triggers bump it when a city appears or disappears and
+# on every change to targets, so a cached catalog is valid for as long as the version holds.
+FILTER_CATALOG_CACHE = {}
+FILTER_CATALOG_CACHE_LOCK = Lock()
+
+# Live feed of /api/homes/stream. gunicorn's gevent workers (see the Dockerfile) serve
+# every open stream as a greenlet waiting on its queue, so streams are not capped.
+HOMES_CHANNEL = "hestia_homes"
+HOMES_STREAM_KEEPALIVE_SECONDS = 20
+# Streams end after a while and the browser reconnects, which spreads them over the workers
+HOMES_STREAM_MAX_SECONDS = 15 * 60
+HOMES_STREAM_RETRY_MS = 5000
+HOMES_STREAM_QUEUE_SIZE = 100
+# Scrapers pick date_added before they insert, so a batch can commit after a newer one
+HOMES_FEED_LOOKBACK = timedelta(minutes=5)
 
 RECENT_LOGIN_WINDOW_SECONDS = 10
 RECENT_LOGIN_REQUESTS = {}
@@ -148,7 +250,27 @@ limiter = Limiter(
 # Database connection pool
 # ---------------------------------------------------------------------------
 
-# Connection pool is lazily initialized on first use
+# gevent workers patch the standard library, but psycopg2 talks to libpq directly; this
+# makes its queries wait on the event loop instead of blocking the whole worker
+if monkey.is_module_patched("socket"):
+    patch_psycopg()
+
+
+def _off_hub(func, *args):
+    """Run func(*args) in a native thread when gevent has patched threading.
+
+    A gevent worker runs all its requests and open streams on one hub, so image encoding
+    or a walk over the blob directory there would stall every one of them.
+    """
+    if monkey.is_module_patched("threading"):
+        return get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+# Connection pool is lazily initialized on first use. Requests beyond DB_POOL_MAX_CONNECTIONS
+# wait up to DB_POOL_WAIT_SECONDS for a connection, the pool itself would fail right away.
+DB_POOL_MAX_CONNECTIONS = 10
+DB_POOL_WAIT_SECONDS = 10
+DB_POOL_SLOTS = BoundedSemaphore(DB_POOL_MAX_CONNECTIONS)
 db_pool = None
 
 def _get_pool():
@@ -157,7 +279,7 @@ def _get_pool():
     if db_pool is None:
         db_pool = psycopg2.pool.ThreadedConnectionPool(
             minconn=2,
-            maxconn=10,
+            maxconn=DB_POOL_MAX_CONNECTIONS,
             dsn=app.config["DATABASE_URL"],
             options="-c timezone=UTC",
         )
@@ -176,7 +298,13 @@ class PooledConnection:
 
     def __enter__(self):
         self.pool = _get_pool()
-        self.conn = self.pool.getconn()
+        if not DB_POOL_SLOTS.acquire(timeout=DB_POOL_WAIT_SECONDS):
+            raise psycopg2.pool.PoolError("connection pool exhausted")
+        try:
+            self.conn = self.pool.getconn()
+        except Exception:
+            DB_POOL_SLOTS.release()
+            raise
         self.conn.autocommit = self.autocommit
         return self.conn
 
@@ -200,6 +328,7 @@ class PooledConnection:
             finally:
                 # Always return connection to pool, even if commit/rollback fails
                 self.pool.putconn(self.conn)
+                DB_POOL_SLOTS.release()
         return False
 
 # ---------------------------------------------------------------------------
@@ -216,6 +345,98 @@ def get_db(autocommit=False):
     return PooledConnection(autocommit=autocommit)
 
 
+# The web image doesn't ship hestia/migrations, the bot and scrapers apply them on startup.
+# Until hestia.schema_migrations has every migration this code relies on, requests get a
+# 503 rather than failing on missing tables and columns. Raise along with the migrations.
+SCHEMA_VERSION = 12
+SCHEMA_CHECK_ENABLED = os.environ.get("SCHEMA_CHECK_ENABLED", "1") == "1"
+SCHEMA_CHECK_INTERVAL_SECONDS = 5
+SCHEMA_STATE = {"ready": not SCHEMA_CHECK_ENABLED, "next_check": 0.0}
+SCHEMA_STATE_LOCK = Lock()
+
+
+def _schema_ready():
+    """Whether the database schema is at SCHEMA_VERSION, checked at most once per interval
+    until it is."""
+    if SCHEMA_STATE["ready"]:
+        return True
+    # Held over the query, so requests arriving meanwhile wait for its answer rather
+    # than read the stale one
+    with SCHEMA_STATE_LOCK:
+        now = time.monotonic()
+        if SCHEMA_STATE["ready"] or now < SCHEMA_STATE["next_check"]:
+            return SCHEMA_STATE["ready"]
+        SCHEMA_STATE["next_check"] = now + SCHEMA_CHECK_INTERVAL_SECONDS
+        try:
+            with get_db() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT CASE WHEN to_regclass('hestia.schema_migrations') IS NULL THEN 0
+                                    ELSE (SELECT COALESCE(max(version), 0) FROM hestia.schema_migrations) END
+                        """
+                    )
+                    version = cur.fetchone()[0]
+        except psycopg2.Error:
+            logger.exception("Schema version check failed")
+            return False
+        if version < SCHEMA_VERSION:
+            logger.warning("Database schema is behind", extra={"version": version, "required": SCHEMA_VERSION})
+            return False
+        SCHEMA_STATE["ready"] = True
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Conditional GET
+# ---------------------------------------------------------------------------
+
+def _etag(*markers):
+    """Strong ETag over the version markers a response is derived from."""
+    return hashlib.sha256(json.dumps(markers, default=str, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _not_modified(etag, private=True):
+    """A 304 response when the client already has this ETag, otherwise None."""
+    if not request.if_none_match.contains(etag):
+        return None
+    return _with_etag(make_response("", 304), etag, private)
+
+
+def _with_etag(response, etag, private=True):
+    response = make_response(response)
+    response.set_etag(etag)
+    # Clients may keep the body but have to revalidate before every use
+    response.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+    return response
+
+
+def _meta_version(cur):
+    """Bumped by triggers on every change to meta, targets and affiliate links."""
+    cur.execute("SELECT version FROM hestia.meta WHERE id = 'default'")
+    row = cur.fetchone()
+    return row["version"] if row else None
+
+
+def _homes_version(cur, since=datetime.min):
+    """Version markers of responses derived from hestia.homes, all answered from an index.
+
+    Inserts move the newest date_added, homes leaving the window since `since` (or archived
+    partitions) the oldest one, and agency names come from targets, so meta's version.
+    """
+    cur.execute(
+        """
+        SELECT
+            (SELECT max(date_added) FROM hestia.homes WHERE date_added >= %(since)s) AS newest,
+            (SELECT min(date_added) FROM hestia.homes WHERE date_added >= %(since)s) AS oldest,
+            (SELECT version FROM hestia.meta WHERE id = 'default') AS meta_version
+        """,
+        {"since": since},
+    )
+    row = cur.fetchone()
+    return row["newest"], row["oldest"], row["meta_version"]
+
+
 # ---------------------------------------------------------------------------
 # Auth helpers
 # ---------------------------------------------------------------------------
@@ -363,9 +584,20 @@ def device_auth_required(f):
     return decorated
 
 
-def _load_available_cities_and_agencies(cur):
-    """Load available filter options shared by dashboard and API endpoints."""
-    cur.execute("SELECT DISTINCT city FROM hestia.homes")
+def _load_available_cities_and_agencies(cur, version=None):
+    """Load available filter options shared by dashboard and API endpoints.
+
+    Cached per process under meta's version; pass it when the caller already read it.
+    """
+    if version is None:
+        version = _meta_version(cur)
+    if version is not None:
+        with FILTER_CATALOG_CACHE_LOCK:
+            cached = FILTER_CATALOG_CACHE.get("catalog")
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+    cur.execute("SELECT city FROM hestia.cities")
     raw_cities = [row["city"] for row in cur.fetchall() if row["city"]]
     city_map = {}
     for city in raw_cities:
@@ -400,6 +632,9 @@ def _load_available_cities_and_agencies(cur):
         ],
         key=lambda a: a["name"],
     )
+    if version is not None:
+        with FILTER_CATALOG_CACHE_LOCK:
+            FILTER_CATALOG_CACHE["catalog"] = (version, available_cities, available_agencies)
     return available_cities, available_agencies
 
 
@@ -650,6 +885,14 @@ def inject_version():
 # Security Headers
 # ---------------------------------------------------------------------------
 
+@app.before_request
+def require_schema():
+    """Answer 503 until the database schema has caught up with this code, see SCHEMA_VERSION."""
+    if request.endpoint in {"health", "static"} or _schema_ready():
+        return None
+    return jsonify({"error": "The database is being upgraded, try again shortly"}), 503
+
+
 @app.before_request
 def generate_csp_nonce():
     """Generate a nonce for inline scripts (CSP)."""
@@ -1180,17 +1423,95 @@ def update_filters():
     return redirect(url_for("dashboard"))
 
 
+def _parse_homes_cursor(value):
+    """Parse a "<date_added>,<url>" cursor into (naive UTC datetime, url), or None."""
+    date_part, sep, url = value.partition(",")
+    if not sep or not url:
+        return None
+    try:
+        dt = datetime.fromisoformat(date_part)
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt, url
+
+
+def _serialize_home(home):
+    """A homes row as returned by the API, the row itself is left untouched."""
+    home = dict(home)
+    # Strip internal dedup suffixes (e.g. " [€1500]") from addresses
+    home["address"] = re.sub(r"\s*\[€\d+\]$", "", home.get("address", ""))
+
+    # Serialize date_added to ISO string in UTC
+    if home.get("date_added") and hasattr(home["date_added"], "isoformat"):
+        dt = home["date_added"]
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        else:
+            dt = dt.astimezone(timezone.utc)
+        home["date_added"] = dt.isoformat()
+    return home
+
+
+def _homes_cursor(home):
+    """Cursor of a serialized home, i.e. after the date_added ISO conversion."""
+    return f"{home['date_added']},{home['url']}"
+
+
+def _cached_homes_total(cur, cache_key, where, params):
+    now = time.monotonic()
+    with HOMES_TOTAL_CACHE_LOCK:
+        cached = HOMES_TOTAL_CACHE.get(cache_key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    cur.execute(f"SELECT COUNT(*) AS cnt FROM hestia.homes h WHERE {where}", params)
+    total = cur.fetchone()["cnt"]
+
+    with HOMES_TOTAL_CACHE_LOCK:
+        if len(HOMES_TOTAL_CACHE) >= HOMES_TOTAL_CACHE_MAX_ENTRIES:
+            for key in [k for k, (expires_at, _) in HOMES_TOTAL_CACHE.items() if expires_at <= now]:
+                HOMES_TOTAL_CACHE.pop(key, None)
+            if len(HOMES_TOTAL_CACHE) >= HOMES_TOTAL_CACHE_MAX_ENTRIES:
+                HOMES_TOTAL_CACHE.clear()
+        HOMES_TOTAL_CACHE[cache_key] = (now + HOMES_TOTAL_CACHE_TTL_SECONDS, total)
+    return total
+
+
 @app.route("/api/homes")
 @limiter.limit("150 per hour")
 @api_subscriber_required
 def api_homes():
-    """Return homes matching the authenticated device's filters, with pagination."""
+    """Return homes matching the authenticated device's filters, newest first.
+
+    Three ways to page through them:
+    - ?page=N: offset pagination, kept for existing clients
+    - ?before=<cursor>: the homes after the one the cursor points at, found by seeking
+      the index instead of skipping rows, so deep pages cost the same as the first
+    - ?since=<cursor>: only homes newer than the cursor, for refreshing a list; when
+      has_more is true there were more new homes than fit in one page
+
+    A cursor is "<date_added>,<url>" of a home, next_cursor and newest_cursor in the
+    response are ready to use. Responses carry an ETag, a matching If-None-Match gets a 304
+    before the total and page queries run.
+    """
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 20, type=int)
     page = max(1, page)
     per_page = max(1, min(per_page, 100))
     offset = (page - 1) * per_page
 
+    before = since = None
+    if request.args.get("before"):
+        before = _parse_homes_cursor(request.args["before"])
+        if before is None:
+            return jsonify({"error": "Invalid before cursor"}), 400
+    if request.args.get("since"):
+        since = _parse_homes_cursor(request.args["since"])
+        if since is None:
+            return jsonify({"error": "Invalid since cursor"}), 400
+
     try:
         sub = request.subscriber
         min_price = sub["filter_min_price"]
@@ -1200,12 +1521,15 @@ def api_homes():
         agencies = sub["filter_agencies"] or []
 
         if not cities or not agencies:
-            return jsonify({"homes": [], "total": 0, "page": page, "per_page": per_page})
+            return jsonify({
+                "homes": [], "total": 0, "page": page, "per_page": per_page,
+                "next_cursor": None, "newest_cursor": None, "has_more": False,
+            })
 
         with get_db() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
                 conditions = ["h.price >= %s", "h.price <= %s", "h.date_added >= %s"]
-                params = [min_price, max_price, datetime.now(timezone.utc) - timedelta(weeks=4)]
+                params = [min_price, max_price, datetime.now(timezone.utc) - HOMES_WINDOW]
 
                 conditions.append("LOWER(h.city) = ANY(%s)")
                 params.append([c.lower() for c in cities])
@@ -1219,13 +1543,30 @@ def api_homes():
                     params.append(min_sqm)
 
                 where = " AND ".join(conditions)
+                total_key = (min_price, max_price, min_sqm, tuple(sorted(c.lower() for c in cities)), tuple(sorted(agencies)))
 
-                cur.execute(
-                    f"SELECT COUNT(*) AS cnt FROM hestia.homes h WHERE {where}",
-                    params,
+                etag = _etag(
+                    "homes", _homes_version(cur, params[2]), total_key,
+                    page, per_page, request.args.get("before"), request.args.get("since"),
                 )
-                total = cur.fetchone()["cnt"]
-
+                not_modified = _not_modified(etag)
+                if not_modified is not None:
+                    return not_modified
+
+                total = _cached_homes_total(cur, total_key, where, params)
+
+                # The plain date_added bound lets the planner use it as an index condition
+                page_conditions, page_params = [], []
+                if before is not None:
+                    page_conditions.append("h.date_added <= %s AND (h.date_added, h.url) < (%s, %s)")
+                    page_params += [before[0], before[0], before[1]]
+                if since is not None:
+                    page_conditions.append("h.date_added >= %s AND (h.date_added, h.url) > (%s, %s)")
+                    page_params += [since[0], since[0], since[1]]
+                page_where = " AND ".join([where] + page_conditions)
+                page_offset = offset if before is None and since is None else 0
+
+                # One extra row tells whether there is more after this page
                 cur.execute(
                     f"""
                     SELECT
@@ -1241,34 +1582,30 @@ def api_homes():
                         SELECT user_info FROM hestia.targets t2
                         WHERE t2.agency = h.agency LIMIT 1
                     ) t ON true
-                    WHERE {where}
-                    ORDER BY h.date_added DESC
+                    WHERE {page_where}
+                    ORDER BY h.date_added DESC, h.url DESC
                     LIMIT %s OFFSET %s
                     """,
-                    params + [per_page, offset],
+                    params + page_params + [per_page + 1, page_offset],
                 )
                 homes = cur.fetchall()
 
-        # Strip internal dedup suffixes (e.g. " [€1500]") from addresses
-        for h in homes:
-            h["address"] = re.sub(r"\s*\[€\d+\]$", "", h.get("address", ""))
-
-        # Serialize date_added to ISO string in UTC
-        for h in homes:
-            if h.get("date_added") and hasattr(h["date_added"], "isoformat"):
-                dt = h["date_added"]
-                if dt.tzinfo is None:
-                    dt = dt.replace(tzinfo=timezone.utc)
-                else:
-                    dt = dt.astimezone(timezone.utc)
-                h["date_added"] = dt.isoformat()
-
-        return jsonify({
+        has_more = len(homes) > per_page
+        homes = [_serialize_home(h) for h in homes[:per_page]]
+
+        if homes:
+            newest_cursor = _homes_cursor(homes[0]) if before is None else None
+        else:
+            newest_cursor = request.args.get("since") or None
+        return _with_etag(jsonify({
             "homes": homes,
             "total": total,
             "page": page,
             "per_page": per_page,
-        })
+            "next_cursor": _homes_cursor(homes[-1]) if homes and since is None and has_more else None,
+            "newest_cursor": newest_cursor,
+            "has_more": has_more,
+        }), etag)
     except psycopg2.Error as e:
         logger.error(
             "Database error fetching homes",
@@ -1282,6 +1619,196 @@ def api_homes():
         return jsonify({"error": "Database error"}), 500
 
 
+class HomesFeed:
+    """Fans new homes out to the open /api/homes/stream responses of this process.
+
+    A single background thread LISTENs on HOMES_CHANNEL, which a trigger on hestia.homes
+    notifies after every insert, and fetches the new rows once for all streams. The thread
+    starts with the first stream and stops shortly after the last one closed.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.queues = set()
+        self.thread = None
+        self.seen = {}  # url -> date_added of homes already published, within the lookback
+        self.watermark = None
+
+    def subscribe(self):
+        """A queue receiving lists of new homes."""
+        q = queue.Queue(maxsize=HOMES_STREAM_QUEUE_SIZE)
+        with self.lock:
+            self.queues.add(q)
+            self._ensure_listener()
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.queues.discard(q)
+
+    def is_subscribed(self, q):
+        with self.lock:
+            return q in self.queues
+
+    def publish(self, homes):
+        with self.lock:
+            queues = list(self.queues)
+        for q in queues:
+            try:
+                q.put_nowait(homes)
+            except queue.Full:
+                # A client that stopped reading; its stream ends and the browser reconnects
+                self.unsubscribe(q)
+
+    def _ensure_listener(self):
+        # Called with self.lock held
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = Thread(target=self._run, name="homes-feed", daemon=True)
+            self.thread.start()
+
+    def _idle(self):
+        with self.lock:
+            if self.queues:
+                return False
+            self.thread = None
+            return True
+
+    def _run(self):
+        backoff = 1
+        while not self._idle():
+            try:
+                self._listen()
+                backoff = 1
+            except Exception as e:
+                # Not only database errors: select on a closed connection or a failing
+                # publish would otherwise end the thread and stall every open stream
+                logger.error(
+                    "Homes feed listener failed",
+                    extra={"error": str(e), "error_type": type(e).__name__, "retry_in": backoff},
+                )
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def _listen(self):
+        conn = psycopg2.connect(app.config["DATABASE_URL"], options="-c timezone=UTC")
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {HOMES_CHANNEL}")
+            # Catch up on what was inserted while not listening, or start from now
+            self.poll(conn, publish=self.watermark is not None)
+            while True:
+                with self.lock:
+                    if not self.queues:
+                        return
+                if select.select([conn], [], [], HOMES_STREAM_KEEPALIVE_SECONDS) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    self.poll(conn)
+        finally:
+            conn.close()
+
+    def poll(self, conn, publish=True):
+        """Fetch the homes added since the last poll and publish the unseen ones."""
+        if self.watermark is None:
+            self.watermark = datetime.now(timezone.utc).replace(tzinfo=None)
+        since = self.watermark - HOMES_FEED_LOOKBACK
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT
+                    h.url,
+                    h.address,
+                    h.city,
+                    h.price,
+                    h.sqm,
+                    h.agency AS agency_id,
+                    COALESCE(t.user_info->>'agency', h.agency) AS agency,
+                    h.date_added
+                FROM hestia.homes h
+                LEFT JOIN LATERAL (
+                    SELECT user_info FROM hestia.targets t2
+                    WHERE t2.agency = h.agency LIMIT 1
+                ) t ON true
+                WHERE h.date_added > %s
+                ORDER BY h.date_added DESC, h.url DESC
+                LIMIT 500
+                """,
+                [since],
+            )
+            rows = cur.fetchall()
+
+        new = [row for row in rows if row["url"] not in self.seen]
+        for row in new:
+            self.seen[row["url"]] = row["date_added"]
+            self.watermark = max(self.watermark, row["date_added"])
+        since = self.watermark - HOMES_FEED_LOOKBACK
+        self.seen = {url: added for url, added in self.seen.items() if added > since}
+
+        if new and publish:
+            self.publish(new)
+        return new
+
+
+homes_feed = HomesFeed()
+
+
+def _home_matches_filters(home, sub):
+    """Whether a home from the feed passes the filters api_homes applies in SQL."""
+    min_sqm = sub.get("filter_min_sqm", 0) or 0
+    cities = {c.lower() for c in sub["filter_cities"] or []}
+    return (
+        sub["filter_min_price"] <= home["price"] <= sub["filter_max_price"]
+        and home["city"].lower() in cities
+        and home["agency_id"] in (sub["filter_agencies"] or [])
+        and (min_sqm <= 0 or home["sqm"] == -1 or home["sqm"] >= min_sqm)
+    )
+
+
+@app.route("/api/homes/stream")
+@limiter.limit("60 per hour")
+@api_subscriber_required
+def api_homes_stream():
+    """Server-Sent Events stream of new homes matching the subscriber's filters.
+
+    Each "homes" event carries {"homes": [...], "newest_cursor": ...} in the format of
+    /api/homes, newest first. Filters are read when the stream opens, so clients reconnect
+    after changing them.
+    """
+    sub = dict(request.subscriber)
+    q = homes_feed.subscribe()
+
+    def events():
+        try:
+            yield f"retry: {HOMES_STREAM_RETRY_MS}\n\n"
+            deadline = time.monotonic() + HOMES_STREAM_MAX_SECONDS
+            while time.monotonic() < deadline and homes_feed.is_subscribed(q):
+                try:
+                    homes = q.get(timeout=HOMES_STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                matching = []
+                for home in homes:
+                    if _home_matches_filters(home, sub):
+                        home = _serialize_home(home)
+                        del home["agency_id"]
+                        matching.append(home)
+                if matching:
+                    data = json.dumps({"homes": matching, "newest_cursor": _homes_cursor(matching[0])})
+                    yield f"event: homes\ndata: {data}\n\n"
+        finally:
+            homes_feed.unsubscribe(q)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        # No buffering by a reverse proxy, events must reach the client right away
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/api/register-device", methods=["POST"])
 @limiter.limit("10 per hour")
 def api_register_device():
@@ -1365,7 +1892,20 @@ def api_filters():
         try:
             with get_db() as conn:
                 with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                    available_cities, available_agencies_raw = _load_available_cities_and_agencies(cur)
+                    # Cities and agencies both move meta's version
+                    version = _meta_version(cur)
+                    etag = _etag(
+                        "filters", version,
+                        [sub.get(key) for key in (
+                            "filter_min_price", "filter_max_price", "filter_min_sqm", "filter_cities",
+                            "filter_agencies", "email_address",
+                        )],
+                        bool(sub.get("telegram_id")), bool(sub.get("apns_token")),
+                    )
+                    not_modified = _not_modified(etag)
+                    if not_modified is not None:
+                        return not_modified
+                    available_cities, available_agencies_raw = _load_available_cities_and_agencies(cur, version)
         except psycopg2.Error as e:
             logger.error(
                 "Database error loading api filters",
@@ -1397,7 +1937,7 @@ def api_filters():
                 "subscriber_id": request.subscriber_id,
             },
         )
-        return jsonify(
+        return _with_etag(jsonify(
             {
                 "filters": {
                     "min_price": sub["filter_min_price"],
@@ -1412,7 +1952,7 @@ def api_filters():
                 "telegram_linked": bool(sub.get("telegram_id")),
                 "notifications_enabled": bool(sub.get("apns_token")),
             }
-        )
+        ), etag)
 
     payload = request.get_json(silent=True)
     if payload is None:
@@ -1712,7 +2252,9 @@ def _cleanup_recent_logins(now):
             RECENT_LOGIN_REQUESTS.pop(email, None)
 
 
-def _is_image_url(url):
+def _is_image_url(url, timeout=5):
+    """Whether url serves an image. Connection errors and timeouts are raised as OSError,
+    any other failure counts as not an image."""
     if _looks_like_image_url(url):
         return True
     parsed = urlparse(url)
@@ -1725,13 +2267,90 @@ def _is_image_url(url):
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
             "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
         }
-        with _safe_urlopen(url, headers, method="HEAD", timeout=5) as resp:
+        with _safe_urlopen(url, headers, method="HEAD", timeout=timeout) as resp:
             content_type = resp.headers.get("Content-Type", "")
             return content_type.startswith("image/")
+    except urllib.error.HTTPError:
+        # The host answered, just not with an image
+        return False
+    except OSError:
+        raise
     except Exception:
         return False
 
 
+def _probe_image_candidate(url, timeout, deadline=None):
+    """_is_image_url, or None when url was not probed: its host keeps failing to connect
+    or the probe only started after the deadline of its round.
+
+    Only connection errors and timeouts count towards blocking a host, and urls that
+    look like images are never blocked.
+    """
+    if _looks_like_image_url(url):
+        return True
+    host = (urlparse(url).hostname or "").lower()
+    now = time.monotonic()
+    if deadline is not None and now >= deadline:
+        # Waited out the round in a busy pool, the host is not to blame
+        return None
+    with PREVIEW_HOST_FAILURES_LOCK:
+        failures, blocked_until = PREVIEW_HOST_FAILURES.get(host, (0, 0.0))
+    if blocked_until > now:
+        return None
+
+    try:
+        ok = _is_image_url(url, timeout)
+    except OSError:
+        ok = None
+    with PREVIEW_HOST_FAILURES_LOCK:
+        if ok is not None:
+            PREVIEW_HOST_FAILURES.pop(host, None)
+            return ok
+        failures, _ = PREVIEW_HOST_FAILURES.get(host, (0, 0.0))
+        failures += 1
+        blocked_until = now + PREVIEW_HOST_BLOCK_SECONDS if failures >= PREVIEW_HOST_FAILURE_LIMIT else 0.0
+        if host not in PREVIEW_HOST_FAILURES and len(PREVIEW_HOST_FAILURES) >= PREVIEW_HOST_FAILURES_MAX_ENTRIES:
+            # Forget the host seen longest ago (dicts keep insertion order)
+            PREVIEW_HOST_FAILURES.pop(next(iter(PREVIEW_HOST_FAILURES)))
+        PREVIEW_HOST_FAILURES[host] = (failures, blocked_until)
+    return False
+
+
+def _first_image_candidate(candidates):
+    """The first of candidates (in priority order) that is an image, "" when none is, or
+    None when that is not known: the deadline passed first or a candidate was skipped.
+
+    All candidates are probed at once and the round ends at PREVIEW_PROBE_DEADLINE_SECONDS,
+    so a page full of bad candidates costs one probe's time instead of one per candidate.
+    Probes still running at the deadline finish in the pool and only update the host counts.
+    """
+    deadline = time.monotonic() + PREVIEW_PROBE_DEADLINE_SECONDS
+    futures = [
+        PREVIEW_PROBE_POOL.submit(_probe_image_candidate, candidate, PREVIEW_PROBE_DEADLINE_SECONDS, deadline)
+        for candidate in candidates[:PREVIEW_PROBE_MAX_CANDIDATES]
+    ]
+    skipped = False
+    try:
+        for candidate, future in zip(candidates, futures):
+            try:
+                result = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                # Settle for a lower priority candidate that did validate in time
+                for later_candidate, later in zip(candidates, futures):
+                    if later.done() and not later.cancelled() and later.exception() is None and later.result():
+                        return later_candidate
+                return None
+            except Exception:
+                continue
+            if result:
+                return candidate
+            skipped = skipped or result is None
+        return None if skipped else ""
+    finally:
+        for future in futures:
+            future.cancel()
+
+
 def _is_public_host(hostname):
     if not hostname:
         return False
@@ -1749,32 +2368,137 @@ def _is_public_host(hostname):
             return False
 
 
-def _preview_cache_get(url):
+class _PreviewMemoryCache:
+    """LRU of preview_cache rows by url, in front of the table.
+
+    Rows are weighed by their JSON size and kept until the row expires or for ttl seconds,
+    whichever comes first. 'pending' rows are claims on a fetch and never kept.
+    """
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # url -> (expires monotonic, size, row)
+        self.size = 0
+        self.lock = Lock()
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._pop(url)
+                return None
+            self.entries.move_to_end(url)
+            return entry[2]
+
+    def put(self, row):
+        row = dict(row)
+        remaining = (row["expires_at"] - datetime.now(timezone.utc)).total_seconds()
+        if row["status"] == "pending" or remaining <= 0:
+            self.discard(row["url"])
+            return
+        size = len(json.dumps(row, default=str))
+        with self.lock:
+            self._pop(row["url"])
+            if size > self.max_bytes:
+                return
+            self.entries[row["url"]] = (time.monotonic() + min(self.ttl, remaining), size, row)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+
+    def discard(self, url):
+        with self.lock:
+            self._pop(url)
+
+    def sweep(self):
+        """Drop the expired rows, returns how many."""
+        now = time.monotonic()
+        with self.lock:
+            expired = [url for url, entry in self.entries.items() if entry[0] <= now]
+            for url in expired:
+                self._pop(url)
+        return len(expired)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _pop(self, url):
+        entry = self.entries.pop(url, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+PREVIEW_MEMORY_CACHE = _PreviewMemoryCache(PREVIEW_MEMORY_MAX_BYTES, PREVIEW_MEMORY_TTL_SECONDS)
+
+
+def _preview_cache_get(url, fresh=False):
+    """The cached row of url, None when there is none or it expired.
+
+    Served from PREVIEW_MEMORY_CACHE when it has the row, unless fresh asks for the one in
+    the table. Expired rows are left to _collect_preview_blobs to delete.
+    """
+    if not fresh:
+        row = PREVIEW_MEMORY_CACHE.get(url)
+        if row is not None:
+            return row
     now = datetime.now(timezone.utc)
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
                 cur.execute(
                     """
-                    SELECT url, status, image_url, image_bytes, content_type, expires_at
+                    SELECT url, status, image_url, image_sha256, content_type, thumbnails, fetched_at, expires_at
                     FROM hestia.preview_cache
-                    WHERE url = %s
+                    WHERE url = %s AND expires_at > %s
                     """,
-                    (url,),
+                    (url, now),
                 )
                 row = cur.fetchone()
-                if not row:
-                    return None
-                if row["expires_at"] and row["expires_at"] <= now:
-                    cur.execute("DELETE FROM hestia.preview_cache WHERE url = %s", (url,))
-                    return None
-                return row
     except psycopg2.Error:
         logger.exception("Preview cache lookup failed", extra={"url": url})
         return None
+    if not row:
+        PREVIEW_MEMORY_CACHE.discard(url)
+        return None
+    PREVIEW_MEMORY_CACHE.put(row)
+    return row
+
+
+def _preview_cache_get_many(urls):
+    """Cached rows of urls by url, those not in PREVIEW_MEMORY_CACHE in one query."""
+    rows = {}
+    for url in urls:
+        row = PREVIEW_MEMORY_CACHE.get(url)
+        if row is not None:
+            rows[url] = row
+    urls = [url for url in urls if url not in rows]
+    if not urls:
+        return rows
+    now = datetime.now(timezone.utc)
+    try:
+        with get_db() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    SELECT url, status, image_url, image_sha256, content_type, thumbnails, fetched_at, expires_at
+                    FROM hestia.preview_cache
+                    WHERE url = ANY(%s) AND expires_at > %s
+                    """,
+                    (urls, now),
+                )
+                for row in cur.fetchall():
+                    PREVIEW_MEMORY_CACHE.put(row)
+                    rows[row["url"]] = row
+    except psycopg2.Error:
+        logger.exception("Preview cache lookup failed", extra={"urls": len(urls)})
+    return rows
 
 
-def _preview_cache_set(url, status, ttl, image_url=None, image_bytes=None, content_type=None):
+def _preview_cache_set(url, status, ttl, image_url=None, image_sha256=None, content_type=None, thumbnails=None):
     now = datetime.now(timezone.utc)
     expires_at = now + ttl
     try:
@@ -1783,38 +2507,196 @@ def _preview_cache_set(url, status, ttl, image_url=None, image_bytes=None, conte
                 cur.execute(
                     """
                     INSERT INTO hestia.preview_cache
-                        (url, status, image_url, image_bytes, content_type, fetched_at, expires_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        (url, status, image_url, image_sha256, content_type, thumbnails, fetched_at, expires_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                     ON CONFLICT (url) DO UPDATE
                     SET status = EXCLUDED.status,
                         image_url = EXCLUDED.image_url,
-                        image_bytes = EXCLUDED.image_bytes,
+                        image_sha256 = EXCLUDED.image_sha256,
                         content_type = EXCLUDED.content_type,
+                        thumbnails = EXCLUDED.thumbnails,
                         fetched_at = EXCLUDED.fetched_at,
                         expires_at = EXCLUDED.expires_at
                     """,
-                    (url, status, image_url, image_bytes, content_type, now, expires_at),
+                    (
+                        url, status, image_url, image_sha256, content_type,
+                        psycopg2.extras.Json(thumbnails) if thumbnails is not None else None, now, expires_at,
+                    ),
                 )
     except psycopg2.Error:
         logger.exception("Preview cache write failed", extra={"url": url, "status": status})
+        PREVIEW_MEMORY_CACHE.discard(url)
+        return
+    PREVIEW_MEMORY_CACHE.put({
+        "url": url, "status": status, "image_url": image_url, "image_sha256": image_sha256,
+        "content_type": content_type, "thumbnails": thumbnails, "fetched_at": now, "expires_at": expires_at,
+    })
 
 
-@app.route("/api/preview-image")
-@preview_api_subscriber_required(raw=False)
-@limiter.limit("50 per minute; 250 per hour")
-def api_preview_image():
-    url = request.args.get("url", "")
-    parsed = urlparse(url)
-    if parsed.scheme not in {"http", "https"}:
-        return jsonify({"image_url": ""})
-    if not _is_public_host(parsed.hostname):
-        return jsonify({"image_url": ""}), 400
-    cached = _preview_cache_get(url)
-    if cached:
-        if cached["status"] == "ok" and cached.get("image_url"):
-            return jsonify({"image_url": cached["image_url"]})
-        return jsonify({"image_url": ""})
+def _preview_blob_path(digest):
+    return os.path.join(PREVIEW_BLOB_DIR, digest[:2], digest)
+
 
+def _preview_blob_put(data):
+    """Store data under its sha256 and return the digest, None when it could not be written."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _preview_blob_path(digest)
+    try:
+        if os.path.exists(path):
+            # Restarts the grace period, so the collector leaves it to the new row
+            os.utime(path)
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        logger.exception("Preview blob write failed", extra={"digest": digest})
+        return None
+    return digest
+
+
+def _preview_thumbnails(data):
+    """Card sized renditions of an image by content type, empty when it can't be decoded."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width * image.height > PREVIEW_IMAGE_MAX_PIXELS:
+                return {}
+            # JPEGs are decoded at the smallest DCT scale that still covers the card
+            image.draft("RGB", PREVIEW_THUMB_SIZE)
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+                image = image.convert("RGBA")
+            else:
+                image = image.convert("RGB")
+            if image.width > PREVIEW_THUMB_SIZE[0] and image.height > PREVIEW_THUMB_SIZE[1]:
+                image = ImageOps.cover(image, PREVIEW_THUMB_SIZE, Image.Resampling.LANCZOS)
+
+            renditions = {}
+            for content_type, pil_format, options in PREVIEW_THUMB_ENCODINGS:
+                frame = image
+                if pil_format == "JPEG" and image.mode == "RGBA":
+                    frame = Image.new("RGB", image.size, "white")
+                    frame.paste(image, mask=image.getchannel("A"))
+                out = io.BytesIO()
+                frame.save(out, pil_format, **options)
+                renditions[content_type] = out.getvalue()
+            return renditions
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return {}
+
+
+def _preview_variant(image_sha256, content_type, thumbnails):
+    """(sha256, content type) of the stored rendition that suits the request's Accept header.
+
+    Only formats the client names count, a bare */* gets the JPEG (or original) one.
+    """
+    best = None
+    for candidate, _, _ in PREVIEW_THUMB_ENCODINGS:
+        if candidate not in (thumbnails or {}):
+            continue
+        quality = max((q for value, q in request.accept_mimetypes if value == candidate), default=0)
+        if quality > 0 and (best is None or quality > best[0]):
+            best = (quality, candidate)
+    if best is None:
+        return image_sha256, content_type
+    return thumbnails[best[1]], best[1]
+
+
+def _send_preview_blob(digest, content_type, fetched_at):
+    """Serve a stored blob, or None when its file is gone.
+
+    send_file hands the open file to the server's file wrapper, so gunicorn sends it with
+    sendfile(2), and answers If-None-Match/If-Modified-Since with 304.
+    """
+    try:
+        response = send_file(
+            _preview_blob_path(digest),
+            mimetype=content_type,
+            etag=digest,
+            last_modified=fetched_at,
+            max_age=int(PREVIEW_BLOB_MAX_AGE.total_seconds()),
+            conditional=True,
+        )
+    except FileNotFoundError:
+        return None
+    response.cache_control.public = True
+    response.vary.add("Accept")
+    return response
+
+
+def _collect_preview_blobs():
+    """Delete expired preview_cache rows and the blobs no row refers to anymore.
+
+    Returns the number of files removed. One worker at a time deletes rows, the others
+    skip. The lock and the connection go back before the blob directory is walked, blobs
+    written since are younger than the grace period.
+    """
+    cutoff = time.time() - PREVIEW_BLOB_GC_GRACE_SECONDS
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock(hashtext('preview_blob_gc'))")
+            if not cur.fetchone()[0]:
+                return 0
+            cur.execute("DELETE FROM hestia.preview_cache WHERE expires_at <= now()")
+            cur.execute(
+                """
+                SELECT image_sha256 FROM hestia.preview_cache WHERE image_sha256 IS NOT NULL
+                UNION
+                SELECT value FROM hestia.preview_cache, jsonb_each_text(thumbnails)
+                """
+            )
+            live = {row[0] for row in cur.fetchall()}
+    return _off_hub(_remove_preview_blobs, live, cutoff)
+
+
+def _remove_preview_blobs(live, cutoff):
+    """Unlink the blobs not in live that were last written before cutoff."""
+    removed = 0
+    for dirpath, _, filenames in os.walk(PREVIEW_BLOB_DIR):
+        for filename in filenames:
+            if filename in live:
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def _maybe_collect_preview_blobs():
+    """Sweep PREVIEW_MEMORY_CACHE and start _collect_preview_blobs in the background when
+    the interval has passed."""
+    now = time.monotonic()
+    with PREVIEW_BLOB_GC_LOCK:
+        if now < PREVIEW_BLOB_GC["next_run"]:
+            return
+        PREVIEW_BLOB_GC["next_run"] = now + PREVIEW_BLOB_GC_INTERVAL_SECONDS
+
+    def run():
+        PREVIEW_MEMORY_CACHE.sweep()
+        try:
+            removed = _collect_preview_blobs()
+        except (psycopg2.Error, OSError):
+            logger.exception("Preview blob collection failed")
+            return
+        if removed:
+            logger.info("Collected preview blobs", extra={"removed": removed})
+
+    Thread(target=run, name="preview-blob-gc", daemon=True).start()
+
+
+def _resolve_preview_image(url):
+    """Find the preview image of a listing page and cache the outcome; "" when there is none."""
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
@@ -1825,52 +2707,41 @@ def api_preview_image():
             content_type = resp.headers.get("Content-Type", "")
             if content_type.startswith("image/"):
                 _preview_cache_set(url, "ok", PREVIEW_CACHE_OK_TTL, image_url=url)
-                return jsonify({"image_url": url})
+                return url
             if "text/html" not in content_type:
                 _preview_cache_set(url, "empty", PREVIEW_CACHE_EMPTY_TTL)
-                return jsonify({"image_url": ""})
+                return ""
             html = resp.read(1024 * 1024).decode("utf-8", "ignore")
     except Exception:
         _preview_cache_set(url, "error", PREVIEW_CACHE_ERROR_TTL)
-        return jsonify({"image_url": ""})
+        return ""
 
     parser = PreviewImageParser(url)
     try:
         parser.feed(html)
     except Exception:
         _preview_cache_set(url, "error", PREVIEW_CACHE_ERROR_TTL)
-        return jsonify({"image_url": ""})
-
-    for candidate in parser.ordered_candidates():
-        if _is_image_url(candidate):
-            _preview_cache_set(url, "ok", PREVIEW_CACHE_OK_TTL, image_url=candidate)
-            return jsonify({"image_url": candidate})
+        return ""
+
+    candidate = _first_image_candidate(parser.ordered_candidates())
+    if candidate:
+        _preview_cache_set(url, "ok", PREVIEW_CACHE_OK_TTL, image_url=candidate)
+        return candidate
+    if candidate is None:
+        # Slow or skipped image hosts are worth another try after the short error TTL
+        _preview_cache_set(url, "error", PREVIEW_CACHE_ERROR_TTL)
+        return ""
     _preview_cache_set(url, "empty", PREVIEW_CACHE_EMPTY_TTL)
-    return jsonify({"image_url": ""})
+    return ""
 
 
-@app.route("/api/preview-image-raw")
-@preview_api_subscriber_required(raw=True)
-@limiter.limit("50 per minute; 250 per hour")
-def api_preview_image_raw():
-    url = request.args.get("url", "")
-    parsed = urlparse(url)
-    if parsed.scheme not in {"http", "https"}:
-        return ("", 400)
-    if not _is_public_host(parsed.hostname):
-        return ("", 400)
-    cached = _preview_cache_get(url)
-    if cached:
-        if cached["status"] == "ok" and cached.get("image_bytes") and cached.get("content_type"):
-            # Convert memoryview to bytes if needed (PostgreSQL bytea returns memoryview)
-            image_data = bytes(cached["image_bytes"]) if isinstance(cached["image_bytes"], memoryview) else cached["image_bytes"]
-            response = make_response(image_data)
-            response.headers["Content-Type"] = cached["content_type"]
-            response.headers["Cache-Control"] = "public, max-age=3600"
-            return response
-        if cached["status"] in {"empty", "error"}:
-            return ("", 404)
+def _fill_preview_image(url):
+    """Download an image, store its renditions and cache them.
 
+    Returns (sha256, content type, thumbnails, bytes) of what was stored, sha256 None when
+    the disk write failed, or None when the image could not be fetched.
+    """
+    parsed = urlparse(url)
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
@@ -1883,17 +2754,377 @@ def api_preview_image_raw():
             data = resp.read(PREVIEW_IMAGE_MAX_BYTES)
     except Exception:
         _preview_cache_set(url, "error", PREVIEW_CACHE_ERROR_TTL)
-        return ("", 502)
+        return None
 
     if not content_type.startswith("image/"):
         _preview_cache_set(url, "error", PREVIEW_CACHE_ERROR_TTL)
-        return ("", 502)
+        return None
+
+    renditions = _off_hub(_preview_thumbnails, data)
+    if "image/jpeg" in renditions:
+        content_type, data = "image/jpeg", renditions.pop("image/jpeg")
+    digest = _off_hub(_preview_blob_put, data)
+    thumbnails = {candidate: _off_hub(_preview_blob_put, rendition) for candidate, rendition in renditions.items()}
+    if digest is None or None in thumbnails.values():
+        return None, content_type, {}, data
+
+    _preview_cache_set(
+        url, "ok", PREVIEW_CACHE_OK_TTL,
+        image_url=url, image_sha256=digest, content_type=content_type, thumbnails=thumbnails,
+    )
+    _maybe_collect_preview_blobs()
+    return digest, content_type, thumbnails, data
+
+
+class _PreviewFlight:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+
+
+def _single_flight(key, work):
+    """Run work() once per key at a time in this process, concurrent callers get its result.
+
+    Callers that joined a flight get None when it failed or outlasted the lease.
+    """
+    with PREVIEW_FLIGHTS_LOCK:
+        flight = PREVIEW_FLIGHTS.get(key)
+        leader = flight is None
+        if leader:
+            flight = PREVIEW_FLIGHTS[key] = _PreviewFlight()
+    if not leader:
+        flight.done.wait(2 * PREVIEW_FLIGHT_LEASE.total_seconds())
+        return flight.result
+    try:
+        flight.result = work()
+        return flight.result
+    finally:
+        with PREVIEW_FLIGHTS_LOCK:
+            PREVIEW_FLIGHTS.pop(key, None)
+        flight.done.set()
+
+
+def _preview_cache_claim(url, stale=None):
+    """Mark url as being fetched by this process, False when another one got there first.
+
+    Takes over a missing or expired row, or the row fetched at stale that the caller wants
+    replaced. Any other row was written since the caller looked, or is another's claim.
+    """
+    # Whoever wins, the remembered row is about to be replaced
+    PREVIEW_MEMORY_CACHE.discard(url)
+    now = datetime.now(timezone.utc)
+    try:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO hestia.preview_cache (url, status, fetched_at, expires_at)
+                    VALUES (%(url)s, 'pending', %(now)s, %(lease)s)
+                    ON CONFLICT (url) DO UPDATE
+                    SET status = 'pending', fetched_at = EXCLUDED.fetched_at, expires_at = EXCLUDED.expires_at
+                    WHERE hestia.preview_cache.expires_at <= %(now)s OR hestia.preview_cache.fetched_at = %(stale)s
+                    RETURNING url
+                    """,
+                    {"url": url, "now": now, "lease": now + PREVIEW_FLIGHT_LEASE, "stale": stale},
+                )
+                return cur.fetchone() is not None
+    except psycopg2.Error:
+        # Without the database to coordinate on, every process fetches for itself
+        logger.exception("Preview cache claim failed", extra={"url": url})
+        return True
+
+
+def _preview_cache_wait(url):
+    """The row another process' fetch of url left behind, None when it did not finish in time."""
+    deadline = time.monotonic() + PREVIEW_FLIGHT_LEASE.total_seconds()
+    while time.monotonic() < deadline:
+        time.sleep(PREVIEW_FLIGHT_POLL_SECONDS)
+        row = _preview_cache_get(url, fresh=True)
+        if row is not None and row["status"] != "pending":
+            return row
+    return None
+
+
+def _resolve_preview_image_once(url):
+    """_resolve_preview_image, run once for all requests resolving url at the same time."""
+    def work():
+        if _preview_cache_claim(url):
+            return _resolve_preview_image(url)
+        row = _preview_cache_wait(url)
+        if row is None:
+            return _resolve_preview_image(url)
+        return row["image_url"] if row["status"] == "ok" and row.get("image_url") else ""
+    return _single_flight(("resolve", url), work) or ""
+
+
+def _fill_preview_image_once(url, stale=None):
+    """_fill_preview_image, run once for all requests filling url at the same time.
+
+    stale is the fetched_at of the cached row being replaced, if any. A fill done by another
+    process comes back without the image bytes.
+    """
+    def work():
+        if _preview_cache_claim(url, stale):
+            return _fill_preview_image(url)
+        row = _preview_cache_wait(url)
+        if row is None:
+            return _fill_preview_image(url)
+        if row["status"] == "ok" and row.get("image_sha256"):
+            return row["image_sha256"], row["content_type"], row.get("thumbnails") or {}, None
+        if row["status"] in {"empty", "error"}:
+            return None
+        return _fill_preview_image(url)
+    return _single_flight(("fill", url), work)
+
+
+def _warm_preview(url):
+    """Resolve and fill the preview of one listing page, skipping what is cached already."""
+    cached = _preview_cache_get(url)
+    if cached is None:
+        image_url = _resolve_preview_image_once(url)
+    else:
+        image_url = cached["image_url"] if cached["status"] == "ok" else ""
+    if not image_url:
+        return
+    cached = _preview_cache_get(image_url)
+    if cached is None:
+        _fill_preview_image_once(image_url)
+    elif cached["status"] == "ok" and not cached.get("image_sha256"):
+        _fill_preview_image_once(image_url, stale=cached["fetched_at"])
+
+
+def _claim_preview_jobs(limit):
+    """Lease up to limit queued listing urls to this process, dropping stale and failing jobs.
+
+    A job is only deleted once it was warmed, so one whose process died becomes due again
+    when its lease ran out, up to PREVIEW_WARM_MAX_ATTEMPTS times.
+    """
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM hestia.preview_jobs WHERE created_at < %s OR (attempts >= %s AND locked_until < now())",
+                (datetime.now(timezone.utc) - PREVIEW_WARM_MAX_AGE, PREVIEW_WARM_MAX_ATTEMPTS),
+            )
+            cur.execute(
+                """
+                WITH due AS (
+                    SELECT url FROM hestia.preview_jobs
+                    WHERE (locked_until IS NULL OR locked_until < now()) AND attempts < %s
+                    ORDER BY created_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE hestia.preview_jobs j
+                SET attempts = j.attempts + 1, locked_until = now() + %s * interval '1 second'
+                FROM due
+                WHERE j.url = due.url
+                RETURNING j.url
+                """,
+                (PREVIEW_WARM_MAX_ATTEMPTS, limit, PREVIEW_WARM_LEASE_SECONDS),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+
+def _renew_preview_jobs(urls):
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE hestia.preview_jobs SET locked_until = now() + %s * interval '1 second' WHERE url = ANY(%s)",
+                (PREVIEW_WARM_LEASE_SECONDS, list(urls)),
+            )
+
+
+def _finish_preview_jobs(urls):
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM hestia.preview_jobs WHERE url = ANY(%s)", (list(urls),))
+
+
+class PreviewWarmer:
+    """Fills hestia.preview_cache for new homes before anyone scrolls to them.
+
+    A trigger on hestia.homes queues every inserted home in hestia.preview_jobs. The
+    warmer wakes up on HOMES_CHANNEL (or every PREVIEW_WARM_POLL_SECONDS) and works
+    through the queue; warmers lease disjoint batches, so each listing is fetched once.
+    run() blocks, for the warmer process, start() runs it in a background thread.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.thread = None
+        self.backoff = 1
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self.run, name="preview-warmer", daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except psycopg2.Error as e:
+                logger.error(
+                    "Preview warmer failed",
+                    extra={"error": str(e), "error_type": type(e).__name__, "retry_in": self.backoff},
+                )
+                time.sleep(self.backoff)
+                self.backoff = min(self.backoff * 2, 60)
+
+    def _listen(self):
+        conn = psycopg2.connect(app.config["DATABASE_URL"])
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {HOMES_CHANNEL}")
+            self.backoff = 1
+            while True:
+                # Also picks up what was queued while not listening
+                while self.work():
+                    pass
+                if select.select([conn], [], [], PREVIEW_WARM_POLL_SECONDS) != ([], [], []):
+                    conn.poll()
+                    conn.notifies.clear()
+                # Expired preview_cache rows are only deleted here, reads skip them
+                _maybe_collect_preview_blobs()
+        finally:
+            conn.close()
+
+    def work(self):
+        """Warm one batch of queued previews, False when there was nothing to do."""
+        urls = _claim_preview_jobs(PREVIEW_WARM_BATCH)
+        for i, url in enumerate(urls):
+            if i:
+                # Keeps the rest of the batch from going to another warmer meanwhile
+                _renew_preview_jobs(urls[i:])
+            try:
+                _warm_preview(url)
+            except Exception:
+                logger.exception("Preview warming failed", extra={"url": url})
+        if urls:
+            _finish_preview_jobs(urls)
+        return bool(urls)
 
-    _preview_cache_set(url, "ok", PREVIEW_CACHE_OK_TTL, image_url=url, image_bytes=data, content_type=content_type)
+
+preview_warmer = PreviewWarmer()
+
+
+@app.route("/api/preview-image")
+@preview_api_subscriber_required(raw=False)
+@limiter.limit("50 per minute; 250 per hour")
+def api_preview_image():
+    url = request.args.get("url", "")
+    parsed = urlparse(url)
+    if parsed.scheme not in {"http", "https"}:
+        return jsonify({"image_url": ""})
+    if not _is_public_host(parsed.hostname):
+        return jsonify({"image_url": ""}), 400
+    cached = _preview_cache_get(url)
+    if cached and cached["status"] != "pending":
+        if cached["status"] == "ok" and cached.get("image_url"):
+            return jsonify({"image_url": cached["image_url"]})
+        return jsonify({"image_url": ""})
+
+    return jsonify({"image_url": _resolve_preview_image_once(url)})
+
+
+def _resolve_public_preview_image(url):
+    if not _is_public_host(urlparse(url).hostname):
+        return ""
+    return _resolve_preview_image_once(url)
+
+
+@app.route("/api/preview-images", methods=["POST"])
+@preview_api_subscriber_required(raw=False)
+@limiter.limit("20 per minute; 200 per hour")
+def api_preview_images():
+    """Preview images of several listing pages: {"urls": [...]} -> {"images": {url: image_url}}.
+
+    Cached pages cost one query together and the misses are resolved concurrently. An
+    image_url is "" when the page has none, or null when it was still being resolved at
+    the deadline; /api/preview-image answers those one by one.
+    """
+    payload = request.get_json(silent=True)
+    urls = payload.get("urls") if isinstance(payload, dict) else None
+    if (
+        not isinstance(urls, list)
+        or len(urls) > PREVIEW_BATCH_MAX_URLS
+        or not all(isinstance(url, str) for url in urls)
+    ):
+        return jsonify({"error": f"Expected up to {PREVIEW_BATCH_MAX_URLS} urls"}), 400
+
+    images = {}
+    lookup = []
+    for url in dict.fromkeys(urls):
+        if urlparse(url).scheme in {"http", "https"}:
+            lookup.append(url)
+        else:
+            images[url] = ""
+
+    cached = _preview_cache_get_many(lookup) if lookup else {}
+    misses = []
+    for url in lookup:
+        row = cached.get(url)
+        if row is None or row["status"] == "pending":
+            misses.append(url)
+        else:
+            images[url] = row["image_url"] if row["status"] == "ok" and row.get("image_url") else ""
+
+    if misses:
+        deadline = time.monotonic() + PREVIEW_BATCH_DEADLINE_SECONDS
+        futures = {url: PREVIEW_RESOLVE_POOL.submit(_resolve_public_preview_image, url) for url in misses}
+        for url, future in futures.items():
+            try:
+                images[url] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                # A running resolve lands in the cache for the client's retry, one still
+                # queued would only hold up the pool for other requests
+                future.cancel()
+                images[url] = None
+            except Exception:
+                logger.exception("Preview resolution failed", extra={"url": url})
+                images[url] = ""
+
+    return jsonify({"images": images})
+
+
+@app.route("/api/preview-image-raw")
+@preview_api_subscriber_required(raw=True)
+@limiter.limit("50 per minute; 250 per hour")
+def api_preview_image_raw():
+    url = request.args.get("url", "")
+    parsed = urlparse(url)
+    if parsed.scheme not in {"http", "https"}:
+        return ("", 400)
+    if not _is_public_host(parsed.hostname):
+        return ("", 400)
+    cached = _preview_cache_get(url)
+    if cached:
+        if cached["status"] == "ok" and cached.get("image_sha256") and cached.get("content_type"):
+            digest, content_type = _preview_variant(cached["image_sha256"], cached["content_type"], cached.get("thumbnails"))
+            response = _send_preview_blob(digest, content_type, cached["fetched_at"])
+            if response is not None:
+                return response
+            # The file is gone (new volume, collected early), fetch it again
+        elif cached["status"] in {"empty", "error"}:
+            return ("", 404)
+
+    stale = cached["fetched_at"] if cached and cached["status"] != "pending" else None
+    filled = _fill_preview_image_once(url, stale)
+    if filled is None:
+        return ("", 502)
+    digest, content_type, thumbnails, data = filled
+    if digest is not None:
+        response = _send_preview_blob(*_preview_variant(digest, content_type, thumbnails), datetime.now(timezone.utc))
+        if response is not None:
+            return response
+    if data is None:
+        return ("", 502)
 
     response = make_response(data)
     response.headers["Content-Type"] = content_type
     response.headers["Cache-Control"] = "public, max-age=3600"
+    response.vary.add("Accept")
     return response
 
 
@@ -1903,6 +3134,38 @@ def avatar():
     return send_from_directory(app.static_folder, "hestia.jpeg")
 
 
+def _load_statistics():
+    """The /api/statistics body, from the counters in hestia.stats."""
+    now = datetime.now(timezone.utc)
+    with get_db() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                "SELECT kind, key, count FROM hestia.stats WHERE kind <> 'homes_hour' OR key >= %s",
+                # Whole hours, so "today" may include up to an hour more
+                [(now - timedelta(hours=24)).strftime("%Y-%m-%dT%H")],
+            )
+            rows = cur.fetchall()
+
+    counts = {}
+    for row in rows:
+        counts.setdefault(row["kind"], {})[row["key"]] = row["count"]
+
+    def top(kind):
+        return sorted(
+            ((key, count) for key, count in counts.get(kind, {}).items() if count > 0),
+            key=lambda item: (-item[1], item[0]),
+        )[:5]
+
+    return {
+        "total_homes": counts.get("homes", {}).get("", 0),
+        "homes_today": sum(counts.get("homes_hour", {}).values()),
+        "top_cities": [{"city": city, "count": count} for city, count in top("homes_city")],
+        "top_agencies": [{"agency": agency, "count": count} for agency, count in top("homes_agency")],
+        "total_subscribers": counts.get("subscribers", {}).get("", 0),
+        "subscribers_this_month": counts.get("subscribers_month", {}).get(now.strftime("%Y-%m"), 0),
+    }
+
+
 @app.route("/api/statistics")
 @limiter.limit("30 per minute")
 def api_statistics():
@@ -1910,51 +3173,32 @@ def api_statistics():
 
     Public (no auth) so the landing page can show aggregate trust numbers.
     Only exposes non-sensitive counts, never any per-user data.
-    """
-    try:
-        with get_db() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                cur.execute("SELECT COUNT(*) AS cnt FROM hestia.homes")
-                total_homes = cur.fetchone()["cnt"]
-
-                cur.execute(
-                    "SELECT COUNT(*) AS cnt FROM hestia.homes WHERE date_added >= NOW() - INTERVAL '24 hours'"
-                )
-                homes_today = cur.fetchone()["cnt"]
-
-                cur.execute(
-                    "SELECT city, COUNT(*) AS count FROM hestia.homes GROUP BY city ORDER BY count DESC LIMIT 5"
-                )
-                top_cities = [{"city": r["city"], "count": r["count"]} for r in cur.fetchall()]
-
-                cur.execute(
-                    "SELECT agency, COUNT(*) AS count FROM hestia.homes WHERE agency IS NOT NULL GROUP BY agency ORDER BY count DESC LIMIT 5"
-                )
-                top_agencies = [{"agency": r["agency"], "count": r["count"]} for r in cur.fetchall()]
 
-                cur.execute("SELECT COUNT(*) AS cnt FROM hestia.subscribers")
-                total_subscribers = cur.fetchone()["cnt"]
+    Served from a per-process cache of the counters in hestia.stats, so landing page
+    traffic never reaches hestia.homes.
+    """
+    now = time.monotonic()
+    with STATISTICS_CACHE_LOCK:
+        cached = STATISTICS_CACHE.get("statistics")
+    if cached is None or cached[0] <= now:
+        try:
+            body = _load_statistics()
+        except psycopg2.Error as e:
+            logger.error(
+                "Database error fetching statistics",
+                extra={"error": str(e), "error_type": type(e).__name__},
+                exc_info=True,
+            )
+            return jsonify({"error": "Database error"}), 500
+        cached = (now + STATISTICS_CACHE_TTL_SECONDS, body, _etag("statistics", body))
+        with STATISTICS_CACHE_LOCK:
+            STATISTICS_CACHE["statistics"] = cached
 
-                cur.execute(
-                    "SELECT COUNT(*) AS cnt FROM hestia.subscribers WHERE date_added >= date_trunc('month', CURRENT_DATE)"
-                )
-                subscribers_this_month = cur.fetchone()["cnt"]
-
-        return jsonify({
-            "total_homes": total_homes,
-            "homes_today": homes_today,
-            "top_cities": top_cities,
-            "top_agencies": top_agencies,
-            "total_subscribers": total_subscribers,
-            "subscribers_this_month": subscribers_this_month,
-        })
-    except psycopg2.Error as e:
-        logger.error(
-            "Database error fetching statistics",
-            extra={"error": str(e), "error_type": type(e).__name__},
-            exc_info=True,
-        )
-        return jsonify({"error": "Database error"}), 500
+    _, body, etag = cached
+    not_modified = _not_modified(etag, private=False)
+    if not_modified is not None:
+        return not_modified
+    return _with_etag(jsonify(body), etag, private=False)
 
 
 @app.route("/api/donation-link")
@@ -1967,14 +3211,18 @@ def donation_link():
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                cur.execute("SELECT donation_link FROM hestia.meta WHERE id = 'default'")
+                cur.execute("SELECT donation_link, version FROM hestia.meta WHERE id = 'default'")
                 row = cur.fetchone()
+        etag = _etag("donation-link", row["version"] if row else None)
+        not_modified = _not_modified(etag, private=False)
+        if not_modified is not None:
+            return not_modified
         url = row["donation_link"] if row else None
         if url:
             parsed = urlparse(url)
             if parsed.scheme not in {"http", "https"}:
                 url = None
-        return jsonify({"url": url})
+        return _with_etag(jsonify({"url": url}), etag, private=False)
     except psycopg2.Error as e:
         logger.error(
             "Database error fetching donation link",
@@ -1995,6 +3243,10 @@ def affiliate_links():
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                etag = _etag("affiliate-links", _meta_version(cur), lang, base_url)
+                not_modified = _not_modified(etag)
+                if not_modified is not None:
+                    return not_modified
                 cur.execute(
                     "SELECT id, slug, name_en, name_nl, icon FROM hestia.affiliate_categories WHERE enabled = true ORDER BY sort_order, id"
                 )
@@ -2046,7 +3298,7 @@ def affiliate_links():
             "provider": comparison_row["provider"],
             "go_url": f"{base_url}/go/{comparison_row['id']}",
         }
-    return jsonify({"categories": result, "comparison": comparison})
+    return _with_etag(jsonify({"categories": result, "comparison": comparison}), etag)
 
 
 @app.route("/go/<int:link_id>")
@@ -2114,6 +3366,14 @@ def test_image_loading():
         return f.read()
 
 
+# ---------------------------------------------------------------------------
+# Background workers
+# ---------------------------------------------------------------------------
+
+if PREVIEW_WARM_ENABLED:
+    preview_warmer.start()
+
+
 # ---------------------------------------------------------------------------
 # Cleanup
 # ---------------------------------------------------------------------------
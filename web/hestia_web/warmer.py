@@ -0,0 +1,11 @@
+"""Preview warmer process, started with python -m hestia_web.warmer.
+
+Fills hestia.preview_cache for new homes apart from the gunicorn workers, which leave
+PREVIEW_WARM_ENABLED off. It shares their database and preview blob volume.
+"""
+from hestia_web.app import logger, preview_warmer
+
+
+if __name__ == "__main__":
+    logger.info("Starting Hestia preview warmer")
+    preview_warmer.run()
@@ -934,7 +934,9 @@ function loadAffiliateLinks() {
 // =====================================================================
 
 var _currentPage = 1;
-var _totalPages = 1;
+var _hasMore = false;
+var _nextCursor = null;   // "before" cursor of the next page
+var _newestCursor = null; // "since" cursor for the background refresh
 var _isLoading = false;
 var _lastLoadAt = 0;
 var _pendingFetch = null;
@@ -973,11 +975,16 @@ function fetchHomes(page, resetList) {
     }
     empty.style.display = 'none';
 
-    fetch('/api/homes?page=' + page + '&per_page=10')
+    // Later pages seek from the last loaded home instead of skipping rows
+    var url = '/api/homes?per_page=10';
+    if (page > 1 && _nextCursor) url += '&before=' + encodeURIComponent(_nextCursor);
+    fetch(url)
         .then(function(r) { return r.json(); })
         .then(function(data) {
-            _currentPage = data.page;
-            _totalPages = Math.ceil(data.total / data.per_page);
+            _currentPage = page;
+            _hasMore = data.has_more;
+            _nextCursor = data.next_cursor;
+            if (resetList) _newestCursor = data.newest_cursor;
 
             if (resetList) {
                 list.innerHTML = '';
@@ -1011,7 +1018,7 @@ function fetchHomes(page, resetList) {
             }
             var endMsg = document.getElementById('homes-end-msg');
             if (endMsg) {
-                endMsg.style.display = (_currentPage >= _totalPages && _totalPages > 0) ? '' : 'none';
+                endMsg.style.display = _hasMore ? 'none' : '';
             }
             _isLoading = false;
             if (_pendingFetch) {
@@ -1172,13 +1179,10 @@ function loadPreviewImage(url, imgEl, placeholderEl, mediaEl) {
 
     // home.url is always a listing page URL, never a direct image
     // Step 1: Parse listing page HTML to find image URL
-    fetch('/api/preview-image?url=' + encodeURIComponent(url)).then(function(r) {
-        if (!r.ok) throw new Error('preview fetch failed');
-        return r.json();
-    }).then(function(data) {
-        if (data.image_url) {
+    requestPreviewImage(url).then(function(imageUrl) {
+        if (imageUrl) {
             // Step 2: Proxy the discovered image through our server
-            showImage(data.image_url);
+            showImage(imageUrl);
         }
     }).catch(function() {
         imgEl.style.display = 'none';
@@ -1186,8 +1190,70 @@ function loadPreviewImage(url, imgEl, placeholderEl, mediaEl) {
     });
 }
 
+// Cards rendered in the same tick share one /api/preview-images request
+var PREVIEW_BATCH_MAX_URLS = 30;
+var _previewBatch = null;
+
+function requestPreviewImage(url) {
+    if (!_previewBatch) {
+        _previewBatch = {};
+        setTimeout(flushPreviewBatch, 0);
+    }
+    if (!_previewBatch[url]) {
+        var entry = {};
+        entry.promise = new Promise(function(resolve, reject) {
+            entry.resolve = resolve;
+            entry.reject = reject;
+        });
+        _previewBatch[url] = entry;
+    }
+    return _previewBatch[url].promise;
+}
+
+function fetchPreviewImage(url) {
+    return fetch('/api/preview-image?url=' + encodeURIComponent(url)).then(function(r) {
+        if (!r.ok) throw new Error('preview fetch failed');
+        return r.json();
+    }).then(function(data) {
+        return data.image_url;
+    });
+}
+
+function flushPreviewBatch() {
+    var batch = _previewBatch;
+    _previewBatch = null;
+    var urls = Object.keys(batch);
+    for (var i = 0; i < urls.length; i += PREVIEW_BATCH_MAX_URLS) {
+        fetchPreviewImages(batch, urls.slice(i, i + PREVIEW_BATCH_MAX_URLS));
+    }
+}
+
+function fetchPreviewImages(batch, urls) {
+    fetch('/api/preview-images', {
+        method: 'POST',
+        headers: { 'Accept': 'application/json', 'Content-Type': 'application/json' },
+        body: JSON.stringify({ urls: urls }),
+    }).then(function(r) {
+        if (!r.ok) throw new Error('preview fetch failed');
+        return r.json();
+    }).then(function(data) {
+        urls.forEach(function(url) {
+            var imageUrl = data.images[url];
+            // null: still resolving at the deadline, ask for this one alone
+            if (imageUrl === null || imageUrl === undefined) {
+                fetchPreviewImage(url).then(batch[url].resolve, batch[url].reject);
+            } else {
+                batch[url].resolve(imageUrl);
+            }
+        });
+    }).catch(function(err) {
+        urls.forEach(function(url) { batch[url].reject(err); });
+    });
+}
+
 // Two-step image loading process (both cached for 30 days):
-//   1. /api/preview-image - Parse listing HTML to find og:image URL
+//   1. /api/preview-images - Parse listing HTML to find og:image URLs, batched per render
+//      (/api/preview-image for a single page)
 //   2. /api/preview-image-raw - Proxy the image to avoid CORS/privacy issues
 
 // Fetch homes on page load
@@ -1196,7 +1262,7 @@ fetchHomes(1, true);
 // Infinite scroll
 window.addEventListener('scroll', function() {
     if (_isLoading) return;
-    if (_currentPage >= _totalPages && _totalPages > 0) {
+    if (!_hasMore) {
         var endMsg = document.getElementById('homes-end-msg');
         if (endMsg) endMsg.style.display = '';
         return;
@@ -1312,10 +1378,12 @@ function sendBrowserNotification(newCount) {
 })();
 
 // =====================================================================
-// Live auto-refresh (every 60s with retry on failure)
+// Live updates: pushed over /api/homes/stream, polled every 60s (with
+// retry on failure) when the browser or server can't keep a stream open
 // =====================================================================
 
 var _autoRefreshTimer = null;
+var _homesStream = null; // EventSource of /api/homes/stream
 
 (function() {
     var REFRESH_INTERVAL = 60000;
@@ -1358,11 +1426,77 @@ var _autoRefreshTimer = null;
         return urls;
     }
 
+    function prependNewHomes(homes) {
+        var list = document.getElementById('homes-list');
+        if (!list) return;
+        var newHomes = [];
+
+        // Find homes we haven't seen before
+        homes.forEach(function(home) {
+            if (home.url && !_knownHomeUrls[home.url]) {
+                newHomes.push(home);
+            }
+            if (home.url) _knownHomeUrls[home.url] = true;
+        });
+
+        // Prepend new homes to the top of the list
+        if (newHomes.length > 0) {
+            var empty = document.getElementById('homes-empty');
+            if (empty) empty.style.display = 'none';
+            var fragment = document.createDocumentFragment();
+            newHomes.reverse().forEach(function(home) {
+                var card = renderHomeCard(home);
+                card.classList.add('home-card-new');
+                card.addEventListener('click', function() {
+                    card.classList.remove('home-card-new');
+                }, { once: true });
+                fragment.appendChild(card);
+            });
+            list.insertBefore(fragment, list.firstChild);
+
+            if (typeof lucide !== 'undefined') lucide.createIcons();
+
+            // Send notification for new homes
+            sendBrowserNotification(newHomes.length);
+        }
+    }
+
+    function streamOpen() {
+        return _homesStream !== null && _homesStream.readyState === EventSource.OPEN;
+    }
+
+    function openStream() {
+        if (!window.EventSource) return;
+        if (_homesStream) _homesStream.close();
+        var stream = new EventSource('/api/homes/stream');
+        _homesStream = stream;
+        stream.addEventListener('open', function() {
+            // Pushed homes replace polling; catch up on what was missed while disconnected
+            if (_autoRefreshTimer) clearTimeout(_autoRefreshTimer);
+            doRefresh(0);
+        });
+        stream.addEventListener('homes', function(e) {
+            var data = JSON.parse(e.data);
+            if (data.newest_cursor) _newestCursor = data.newest_cursor;
+            prependNewHomes(data.homes);
+        });
+        stream.addEventListener('error', function() {
+            // EventSource reconnects by itself, unless the server refused the stream
+            if (stream.readyState === EventSource.CLOSED && _homesStream === stream) {
+                _homesStream = null;
+                scheduleRefresh();
+            }
+        });
+    }
+
     function doRefresh(retryIndex) {
         // Create abort controller for this refresh
         _autoRefreshController = new AbortController();
 
-        fetch('/api/homes?page=1&per_page=10', { signal: _autoRefreshController.signal })
+        // Only ask for homes newer than the newest one shown
+        var url = '/api/homes?per_page=10';
+        if (_newestCursor) url += '&since=' + encodeURIComponent(_newestCursor);
+        fetch(url, { signal: _autoRefreshController.signal })
             .then(function(r) {
                 if (!r.ok) throw new Error('HTTP ' + r.status);
                 return r.json();
@@ -1374,19 +1508,19 @@ var _autoRefreshTimer = null;
                 var empty = document.getElementById('homes-empty');
                 if (!list) return;
 
-                // Update total pages but don't reset _currentPage — that
-                // tracks how far the user has scrolled via infinite scroll.
-                _totalPages = Math.ceil(data.total / data.per_page);
-
-                var newHomes = [];
-
-                // Find homes we haven't seen before
-                data.homes.forEach(function(home) {
-                    if (home.url && !_knownHomeUrls[home.url]) {
-                        newHomes.push(home);
-                    }
-                    if (home.url) _knownHomeUrls[home.url] = true;
-                });
+                // More new homes than fit in one response: reload the list
+                // instead of leaving a gap between the new and the shown homes.
+                if (_newestCursor && data.has_more) {
+                    fetchHomes(1, true);
+                    showLive();
+                    scheduleRefresh();
+                    return;
+                }
+                _newestCursor = data.newest_cursor;
+                if (!_nextCursor) {
+                    _hasMore = data.has_more;
+                    _nextCursor = data.next_cursor;
+                }
 
                 // Handle empty state
                 if (data.homes.length === 0 && list.children.length === 0) {
@@ -1395,24 +1529,7 @@ var _autoRefreshTimer = null;
                     if (empty) empty.style.display = 'none';
                 }
 
-                // Prepend new homes to the top of the list
-                if (newHomes.length > 0) {
-                    var fragment = document.createDocumentFragment();
-                    newHomes.reverse().forEach(function(home) {
-                        var card = renderHomeCard(home);
-                        card.classList.add('home-card-new');
-                        card.addEventListener('click', function() {
-                            card.classList.remove('home-card-new');
-                        }, { once: true });
-                        fragment.appendChild(card);
-                    });
-                    list.insertBefore(fragment, list.firstChild);
-
-                    if (typeof lucide !== 'undefined') lucide.createIcons();
-
-                    // Send notification for new homes
-                    sendBrowserNotification(newHomes.length);
-                }
+                prependNewHomes(data.homes);
 
                 // Reset to healthy state and schedule next refresh
                 showLive();
@@ -1439,6 +1556,7 @@ var _autoRefreshTimer = null;
     function scheduleRefresh() {
         if (dead) return;
         if (_autoRefreshTimer) clearTimeout(_autoRefreshTimer);
+        if (streamOpen()) return;
         _autoRefreshTimer = setTimeout(function() {
             doRefresh(0);
         }, REFRESH_INTERVAL);
@@ -1450,12 +1568,19 @@ var _autoRefreshTimer = null;
             _autoRefreshController.abort();
             _autoRefreshController = null;
         }
+        // The stream filters on the filters it was opened with
+        if (_homesStream) {
+            _homesStream.close();
+            _homesStream = null;
+            openStream();
+        }
         scheduleRefresh();
     };
 
     // Start the cycle
     showLive();
     scheduleRefresh();
+    openStream();
 })();
 
 // =====================================================================